@@ -32,51 +32,55 @@ module "bastion" {
 }
 
 module "scale_instances" {
-  source                                   = "../sub_modules/instance_template"
-  vpc_region                               = var.vpc_region
-  vpc_availability_zones                   = var.vpc_availability_zones
-  resource_prefix                          = var.resource_prefix
-  vpc_id                                   = module.vpc.vpc_id
-  vpc_storage_cluster_private_subnets      = module.vpc.vpc_storage_cluster_private_subnets
-  vpc_compute_cluster_private_subnets      = module.vpc.vpc_compute_cluster_private_subnets
-  total_compute_cluster_instances          = var.total_compute_cluster_instances
-  compute_cluster_key_pair                 = var.compute_cluster_key_pair
-  compute_cluster_image_id                 = var.compute_cluster_image_id
-  compute_cluster_instance_type            = var.compute_cluster_instance_type
-  compute_cluster_root_volume_type         = var.compute_cluster_root_volume_type
-  compute_cluster_volume_tags              = var.compute_cluster_volume_tags
-  compute_cluster_gui_username             = var.compute_cluster_gui_username
-  compute_cluster_gui_password             = var.compute_cluster_gui_password
-  compute_cluster_tags                     = var.compute_cluster_tags
-  total_storage_cluster_instances          = var.total_storage_cluster_instances
-  storage_cluster_key_pair                 = var.storage_cluster_key_pair
-  storage_cluster_image_id                 = var.storage_cluster_image_id
-  storage_cluster_instance_type            = var.storage_cluster_instance_type
-  storage_cluster_tags                     = var.storage_cluster_tags
-  storage_cluster_tiebreaker_instance_type = var.storage_cluster_tiebreaker_instance_type
-  storage_cluster_root_volume_type         = var.storage_cluster_root_volume_type
-  storage_cluster_volume_tags              = var.storage_cluster_volume_tags
-  storage_cluster_gui_username             = var.storage_cluster_gui_username
-  storage_cluster_gui_password             = var.storage_cluster_gui_password
-  using_packer_image                       = var.using_packer_image
-  using_rest_api_remote_mount              = var.using_rest_api_remote_mount
-  ebs_block_devices_per_storage_instance   = var.ebs_block_devices_per_storage_instance
-  ebs_block_device_delete_on_termination   = var.ebs_block_device_delete_on_termination
-  ebs_block_device_encrypted               = var.ebs_block_device_encrypted
-  ebs_block_device_iops                    = var.ebs_block_device_iops
-  ebs_block_device_throughput              = var.ebs_block_device_throughput
-  ebs_block_device_kms_key_id              = var.ebs_block_device_kms_key_id
-  ebs_block_device_volume_size             = var.ebs_block_device_volume_size
-  ebs_block_device_volume_type             = var.ebs_block_device_volume_type
-  scale_ansible_repo_clone_path            = var.scale_ansible_repo_clone_path
-  spectrumscale_rpms_path                  = var.spectrumscale_rpms_path
-  operator_email                           = var.operator_email
-  storage_cluster_filesystem_mountpoint    = var.storage_cluster_filesystem_mountpoint
-  compute_cluster_filesystem_mountpoint    = var.compute_cluster_filesystem_mountpoint
-  filesystem_block_size                    = var.filesystem_block_size
-  create_separate_namespaces               = var.create_separate_namespaces
-  bastion_instance_id                      = module.bastion.bastion_instance_id[0]
-  bastion_instance_public_ip               = module.bastion.bastion_instance_public_ip[0]
-  bastion_security_group_id                = module.bastion.bastion_security_group_id
-  bastion_ssh_private_key                  = var.bastion_ssh_private_key
+  source                                     = "../sub_modules/instance_template"
+  vpc_region                                 = var.vpc_region
+  vpc_availability_zones                     = var.vpc_availability_zones
+  resource_prefix                            = var.resource_prefix
+  vpc_id                                     = module.vpc.vpc_id
+  vpc_storage_cluster_private_subnets        = module.vpc.vpc_storage_cluster_private_subnets
+  vpc_compute_cluster_private_subnets        = module.vpc.vpc_compute_cluster_private_subnets
+  total_compute_cluster_instances            = var.total_compute_cluster_instances
+  compute_cluster_key_pair                   = var.compute_cluster_key_pair
+  compute_cluster_image_id                   = var.compute_cluster_image_id
+  compute_cluster_instance_type              = var.compute_cluster_instance_type
+  compute_cluster_root_volume_type           = var.compute_cluster_root_volume_type
+  compute_cluster_volume_tags                = var.compute_cluster_volume_tags
+  compute_cluster_gui_username               = var.compute_cluster_gui_username
+  compute_cluster_gui_password               = var.compute_cluster_gui_password
+  compute_cluster_tags                       = var.compute_cluster_tags
+  total_storage_cluster_instances            = var.total_storage_cluster_instances
+  storage_cluster_key_pair                   = var.storage_cluster_key_pair
+  storage_cluster_image_id                   = var.storage_cluster_image_id
+  storage_cluster_instance_type              = var.storage_cluster_instance_type
+  storage_cluster_tags                       = var.storage_cluster_tags
+  storage_cluster_tiebreaker_instance_type   = var.storage_cluster_tiebreaker_instance_type
+  storage_cluster_root_volume_type           = var.storage_cluster_root_volume_type
+  storage_cluster_volume_tags                = var.storage_cluster_volume_tags
+  storage_cluster_gui_username               = var.storage_cluster_gui_username
+  storage_cluster_gui_password               = var.storage_cluster_gui_password
+  using_packer_image                         = var.using_packer_image
+  compute_cluster_image_manifest_path        = var.compute_cluster_image_manifest_path
+  storage_cluster_image_manifest_path        = var.storage_cluster_image_manifest_path
+  using_rest_api_remote_mount                = var.using_rest_api_remote_mount
+  ebs_block_devices_per_storage_instance     = var.ebs_block_devices_per_storage_instance
+  ebs_block_device_delete_on_termination     = var.ebs_block_device_delete_on_termination
+  ebs_block_device_encrypted                 = var.ebs_block_device_encrypted
+  ebs_block_device_iops                      = var.ebs_block_device_iops
+  ebs_block_device_throughput                = var.ebs_block_device_throughput
+  ebs_block_device_kms_key_id                = var.ebs_block_device_kms_key_id
+  ebs_block_device_volume_size               = var.ebs_block_device_volume_size
+  ebs_block_device_volume_type               = var.ebs_block_device_volume_type
+  scale_ansible_repo_clone_path              = var.scale_ansible_repo_clone_path
+  spectrumscale_rpms_path                    = var.spectrumscale_rpms_path
+  operator_email                             = var.operator_email
+  storage_cluster_filesystem_mountpoint      = var.storage_cluster_filesystem_mountpoint
+  storage_cluster_filesystems                = var.storage_cluster_filesystems
+  storage_cluster_shared_data_volume_mapping = var.storage_cluster_shared_data_volume_mapping
+  compute_cluster_filesystem_mountpoint      = var.compute_cluster_filesystem_mountpoint
+  filesystem_block_size                      = var.filesystem_block_size
+  create_separate_namespaces                 = var.create_separate_namespaces
+  bastion_instance_id                        = module.bastion.bastion_instance_id[0]
+  bastion_instance_public_ip                 = module.bastion.bastion_instance_public_ip[0]
+  bastion_security_group_id                  = module.bastion.bastion_security_group_id
+  bastion_ssh_private_key                    = var.bastion_ssh_private_key
 }
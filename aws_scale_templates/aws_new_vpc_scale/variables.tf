@@ -209,6 +209,18 @@ variable "using_packer_image" {
   description = "If true, gpfs rpm copy step will be skipped during the configuration."
 }
 
+variable "compute_cluster_image_manifest_path" {
+  type        = string
+  default     = null
+  description = "Local path of the scale_image_manifest.json downloaded by the packer build of the compute cluster image. Compute nodes whose image already has the Scale version installed skip package installation."
+}
+
+variable "storage_cluster_image_manifest_path" {
+  type        = string
+  default     = null
+  description = "Local path of the scale_image_manifest.json downloaded by the packer build of the storage cluster image. Storage nodes whose image already has the Scale version installed skip package installation."
+}
+
 variable "ebs_block_devices_per_storage_instance" {
   type        = number
   default     = 1
@@ -281,6 +293,18 @@ variable "storage_cluster_filesystem_mountpoint" {
   description = "Storage cluster (owningCluster) Filesystem mount point."
 }
 
+variable "storage_cluster_filesystems" {
+  type        = any
+  default     = []
+  description = "Storage cluster filesystems, each with a mountpoint and optional block_size, workload, data_replicas, metadata_replicas and devices or servers selection. The tiebreaker gets one descriptor volume per filesystem. Empty creates a single filesystem at storage_cluster_filesystem_mountpoint."
+}
+
+variable "storage_cluster_shared_data_volume_mapping" {
+  type        = any
+  default     = {}
+  description = "Volumes attached to several storage instances (AWS io2 Multi-Attach, GCP multi-writer or Azure shared disks), created and attached outside this template. Map of volume id to {device, servers, size in bytes}, each volume becomes one NSD served by its servers."
+}
+
 variable "compute_cluster_filesystem_mountpoint" {
   type        = string
   default     = "/gpfs/fs1"
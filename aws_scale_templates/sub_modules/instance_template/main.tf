@@ -460,6 +460,7 @@ module "compute_cluster_instances" {
   meta_public_key        = var.create_remote_mount_cluster == true ? module.generate_compute_cluster_keys.public_key_content : module.generate_storage_cluster_keys.public_key_content
   volume_tags            = var.compute_cluster_volume_tags
   tags                   = var.compute_cluster_tags
+  secondary_subnet_ids   = var.vpc_compute_cluster_secondary_subnets
 }
 
 data "aws_ec2_instance_type" "storage_profile" {
@@ -496,6 +497,7 @@ module "storage_cluster_instances" {
   is_nitro_instance                      = try(data.aws_ec2_instance_type.storage_profile[0].hypervisor, null) == "nitro" ? true : false
   nvme_block_device_count                = var.enable_instance_store_block_device == true ? tolist(try(data.aws_ec2_instance_type.storage_profile[0].instance_disks, null))[0].count : 0
   tags                                   = var.storage_cluster_tags
+  secondary_subnet_ids                   = var.vpc_storage_cluster_secondary_subnets != null ? (length(var.vpc_storage_cluster_secondary_subnets) > 1 ? slice(var.vpc_storage_cluster_secondary_subnets, 0, 2) : var.vpc_storage_cluster_secondary_subnets) : null
 }
 
 module "storage_cluster_tie_breaker_instance" {
@@ -514,7 +516,7 @@ module "storage_cluster_tie_breaker_instance" {
   meta_public_key                        = module.generate_storage_cluster_keys.public_key_content
   volume_tags                            = var.storage_cluster_volume_tags
   ebs_optimized                          = try(data.aws_ec2_instance_type.storage_profile[0].ebs_optimized_support, null) == "unsupported" ? false : true
-  ebs_block_devices                      = 1
+  ebs_block_devices                      = max(length(var.storage_cluster_filesystems), 1)
   ebs_block_device_names                 = local.ebs_device_names
   ebs_block_device_delete_on_termination = var.block_device_delete_on_termination
   ebs_block_device_encrypted             = var.block_device_encrypted
@@ -567,6 +569,11 @@ module "prepare_ansible_configuration" {
   clone_path = var.scale_ansible_repo_clone_path
 }
 
+locals {
+  use_compute_cluster_image_manifest = var.using_packer_image == true && var.compute_cluster_image_manifest_path != null
+  use_storage_cluster_image_manifest = var.using_packer_image == true && var.storage_cluster_image_manifest_path != null
+}
+
 # Write the compute cluster related inventory.
 module "write_compute_cluster_inventory" {
   source                                           = "../../../resources/common/write_inventory"
@@ -595,6 +602,10 @@ module "write_compute_cluster_inventory" {
   storage_cluster_desc_instance_private_ips        = jsonencode([])
   storage_cluster_desc_data_volume_mapping         = jsonencode({})
   storage_cluster_desc_instance_private_dns_ip_map = jsonencode({})
+  compute_cluster_instance_az_map                  = jsonencode(module.compute_cluster_instances.instance_private_ip_az_map)
+  compute_cluster_image_manifest_map               = local.use_compute_cluster_image_manifest ? jsonencode({ for each_ip in module.compute_cluster_instances.instance_private_ips : each_ip => var.compute_cluster_image_manifest_path }) : jsonencode({})
+  compute_cluster_instance_type_map                = jsonencode({ for each_ip in module.compute_cluster_instances.instance_private_ips : each_ip => var.compute_cluster_instance_type })
+  compute_cluster_secondary_interface_map          = jsonencode(module.compute_cluster_instances.instance_private_ip_secondary_interface_map)
 }
 
 # Write the storage cluster related inventory.
@@ -617,6 +628,8 @@ module "write_storage_cluster_inventory" {
   compute_cluster_instance_private_ips             = jsonencode([])
   compute_cluster_instance_private_dns_ip_map      = jsonencode({})
   storage_cluster_filesystem_mountpoint            = jsonencode(var.storage_cluster_filesystem_mountpoint)
+  storage_cluster_filesystems                      = jsonencode(var.storage_cluster_filesystems)
+  storage_cluster_shared_data_volume_mapping       = jsonencode(var.storage_cluster_shared_data_volume_mapping)
   storage_cluster_instance_ids                     = jsonencode(module.storage_cluster_instances.instance_ids)
   storage_cluster_instance_private_ips             = jsonencode(module.storage_cluster_instances.instance_private_ips)
   storage_cluster_with_data_volume_mapping         = jsonencode(module.storage_cluster_instances.instance_ips_with_ebs_mapping)
@@ -625,6 +638,10 @@ module "write_storage_cluster_inventory" {
   storage_cluster_desc_instance_private_ips        = jsonencode(module.storage_cluster_tie_breaker_instance.instance_private_ips)
   storage_cluster_desc_data_volume_mapping         = jsonencode(module.storage_cluster_tie_breaker_instance.instance_ips_with_ebs_mapping)
   storage_cluster_desc_instance_private_dns_ip_map = jsonencode(module.storage_cluster_tie_breaker_instance.instance_private_dns_ip_map)
+  storage_cluster_instance_az_map                  = jsonencode(merge(module.storage_cluster_instances.instance_private_ip_az_map, module.storage_cluster_tie_breaker_instance.instance_private_ip_az_map))
+  storage_cluster_image_manifest_map               = local.use_storage_cluster_image_manifest ? jsonencode({ for each_ip in concat(tolist(module.storage_cluster_instances.instance_private_ips), tolist(module.storage_cluster_tie_breaker_instance.instance_private_ips)) : each_ip => var.storage_cluster_image_manifest_path }) : jsonencode({})
+  storage_cluster_instance_type_map                = jsonencode(merge({ for each_ip in module.storage_cluster_instances.instance_private_ips : each_ip => var.storage_cluster_instance_type }, { for each_ip in module.storage_cluster_tie_breaker_instance.instance_private_ips : each_ip => var.storage_cluster_tiebreaker_instance_type }))
+  storage_cluster_secondary_interface_map          = jsonencode(module.storage_cluster_instances.instance_private_ip_secondary_interface_map)
 }
 
 # Write combined cluster related inventory.
@@ -647,6 +664,8 @@ module "write_cluster_inventory" {
   compute_cluster_instance_private_ips             = jsonencode(module.compute_cluster_instances.instance_private_ips)
   compute_cluster_instance_private_dns_ip_map      = jsonencode(module.compute_cluster_instances.instance_private_dns_ip_map)
   storage_cluster_filesystem_mountpoint            = jsonencode(var.storage_cluster_filesystem_mountpoint)
+  storage_cluster_filesystems                      = jsonencode(var.storage_cluster_filesystems)
+  storage_cluster_shared_data_volume_mapping       = jsonencode(var.storage_cluster_shared_data_volume_mapping)
   storage_cluster_instance_ids                     = jsonencode(module.storage_cluster_instances.instance_ids)
   storage_cluster_instance_private_ips             = jsonencode(module.storage_cluster_instances.instance_private_ips)
   storage_cluster_with_data_volume_mapping         = jsonencode(module.storage_cluster_instances.instance_ips_with_ebs_mapping)
@@ -655,6 +674,14 @@ module "write_cluster_inventory" {
   storage_cluster_desc_instance_private_ips        = length(var.vpc_availability_zones) > 1 ? jsonencode(module.storage_cluster_tie_breaker_instance.instance_private_ips) : jsonencode([])
   storage_cluster_desc_data_volume_mapping         = length(var.vpc_availability_zones) > 1 ? jsonencode(module.storage_cluster_tie_breaker_instance.instance_ips_with_ebs_mapping) : jsonencode({})
   storage_cluster_desc_instance_private_dns_ip_map = length(var.vpc_availability_zones) > 1 ? jsonencode(module.storage_cluster_tie_breaker_instance.instance_private_dns_ip_map) : jsonencode({})
+  compute_cluster_instance_az_map                  = jsonencode(module.compute_cluster_instances.instance_private_ip_az_map)
+  storage_cluster_instance_az_map                  = jsonencode(merge(module.storage_cluster_instances.instance_private_ip_az_map, module.storage_cluster_tie_breaker_instance.instance_private_ip_az_map))
+  compute_cluster_image_manifest_map               = local.use_compute_cluster_image_manifest ? jsonencode({ for each_ip in module.compute_cluster_instances.instance_private_ips : each_ip => var.compute_cluster_image_manifest_path }) : jsonencode({})
+  storage_cluster_image_manifest_map               = local.use_storage_cluster_image_manifest ? jsonencode({ for each_ip in concat(tolist(module.storage_cluster_instances.instance_private_ips), tolist(module.storage_cluster_tie_breaker_instance.instance_private_ips)) : each_ip => var.storage_cluster_image_manifest_path }) : jsonencode({})
+  compute_cluster_instance_type_map                = jsonencode({ for each_ip in module.compute_cluster_instances.instance_private_ips : each_ip => var.compute_cluster_instance_type })
+  storage_cluster_instance_type_map                = jsonencode(merge({ for each_ip in module.storage_cluster_instances.instance_private_ips : each_ip => var.storage_cluster_instance_type }, { for each_ip in module.storage_cluster_tie_breaker_instance.instance_private_ips : each_ip => var.storage_cluster_tiebreaker_instance_type }))
+  compute_cluster_secondary_interface_map          = jsonencode(module.compute_cluster_instances.instance_private_ip_secondary_interface_map)
+  storage_cluster_secondary_interface_map          = jsonencode(module.storage_cluster_instances.instance_private_ip_secondary_interface_map)
 
 }
 
@@ -681,6 +708,7 @@ module "compute_cluster_configuration" {
   meta_private_key             = module.generate_compute_cluster_keys.private_key_content
   scale_version                = local.scale_version
   spectrumscale_rpms_path      = var.spectrumscale_rpms_path
+  node_count                   = length(module.compute_cluster_instances.instance_private_ips)
 }
 
 # Configure the storage cluster using ansible based on the create_scale_cluster input.
@@ -707,6 +735,7 @@ module "storage_cluster_configuration" {
   meta_private_key             = module.generate_storage_cluster_keys.private_key_content
   scale_version                = local.scale_version
   spectrumscale_rpms_path      = var.spectrumscale_rpms_path
+  node_count                   = length(module.storage_cluster_instances.instance_private_ips) + length(module.storage_cluster_tie_breaker_instance.instance_private_ips)
 }
 
 # Configure the combined cluster using ansible based on the create_scale_cluster input.
@@ -730,6 +759,7 @@ module "combined_cluster_configuration" {
   meta_private_key             = module.generate_storage_cluster_keys.private_key_content
   scale_version                = local.scale_version
   spectrumscale_rpms_path      = var.spectrumscale_rpms_path
+  node_count                   = length(module.compute_cluster_instances.instance_private_ips) + length(module.storage_cluster_instances.instance_private_ips) + (length(var.vpc_availability_zones) > 1 ? length(module.storage_cluster_tie_breaker_instance.instance_private_ips) : 0)
 }
 
 # Configure the remote mount relationship between the created compute & storage cluster.
@@ -754,4 +784,5 @@ module "remote_mount_configuration" {
   clone_complete                  = module.prepare_ansible_configuration.clone_complete
   compute_cluster_create_complete = module.compute_cluster_configuration.compute_cluster_create_complete
   storage_cluster_create_complete = module.storage_cluster_configuration.storage_cluster_create_complete
+  remote_mount_pairs              = var.remote_mount_pairs
 }
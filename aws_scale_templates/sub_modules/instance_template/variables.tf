@@ -37,6 +37,13 @@ variable "vpc_storage_cluster_private_subnets" {
   description = "List of IDs of storage cluster private subnets."
 }
 
+variable "vpc_storage_cluster_secondary_subnets" {
+  type        = list(string)
+  nullable    = true
+  default     = null
+  description = "List of IDs of storage cluster subnets, one per storage cluster private subnet and in the same availability zone, each instance getting a secondary interface in the subnet of its index. Scale daemon (data) traffic uses the secondary interfaces, the image must bring them up (ex: ec2-net-utils)."
+}
+
 variable "vpc_compute_cluster_private_subnets" {
   type        = list(string)
   nullable    = true
@@ -44,6 +51,13 @@ variable "vpc_compute_cluster_private_subnets" {
   description = "List of IDs of compute cluster private subnets."
 }
 
+variable "vpc_compute_cluster_secondary_subnets" {
+  type        = list(string)
+  nullable    = true
+  default     = null
+  description = "List of IDs of compute cluster subnets, one per compute cluster private subnet and in the same availability zone, each instance getting a secondary interface in the subnet of its index. Scale daemon (data) traffic uses the secondary interfaces, the image must bring them up (ex: ec2-net-utils)."
+}
+
 variable "total_compute_cluster_instances" {
   type        = number
   nullable    = true
@@ -216,6 +230,13 @@ variable "using_rest_api_remote_mount" {
   description = "If false, skips GUI initialization on compute cluster for remote mount configuration."
 }
 
+variable "remote_mount_pairs" {
+  type        = any
+  nullable    = false
+  default     = []
+  description = "Compute/storage cluster pairs to remote mount in one run, each with compute_tf_inv_path, compute_gui_inv_path, storage_tf_inv_path and storage_gui_inv_path, and an optional name, filesystems and GUI credentials. The pairs are configured concurrently. When empty, the compute and storage clusters of this template are paired."
+}
+
 variable "using_packer_image" {
   type        = bool
   nullable    = true
@@ -223,6 +244,20 @@ variable "using_packer_image" {
   description = "If true, gpfs rpm copy step will be skipped during the configuration."
 }
 
+variable "compute_cluster_image_manifest_path" {
+  type        = string
+  nullable    = true
+  default     = null
+  description = "Local path of the scale_image_manifest.json downloaded by the packer build of the compute cluster image. Compute nodes whose image already has the Scale version installed skip package installation."
+}
+
+variable "storage_cluster_image_manifest_path" {
+  type        = string
+  nullable    = true
+  default     = null
+  description = "Local path of the scale_image_manifest.json downloaded by the packer build of the storage cluster image. Storage nodes whose image already has the Scale version installed skip package installation."
+}
+
 variable "enable_placement_group" {
   type        = bool
   nullable    = true
@@ -322,6 +357,18 @@ variable "storage_cluster_filesystem_mountpoint" {
   description = "Storage cluster (owningCluster) Filesystem mount point."
 }
 
+variable "storage_cluster_filesystems" {
+  type        = any
+  default     = []
+  description = "Storage cluster filesystems, each with a mountpoint and optional block_size, workload, data_replicas, metadata_replicas and devices or servers selection. The tiebreaker gets one descriptor volume per filesystem. Empty creates a single filesystem at storage_cluster_filesystem_mountpoint."
+}
+
+variable "storage_cluster_shared_data_volume_mapping" {
+  type        = any
+  default     = {}
+  description = "Volumes attached to several storage instances (AWS io2 Multi-Attach, GCP multi-writer or Azure shared disks), created and attached outside this template. Map of volume id to {device, servers, size in bytes}, each volume becomes one NSD served by its servers."
+}
+
 variable "compute_cluster_filesystem_mountpoint" {
   type        = string
   nullable    = true
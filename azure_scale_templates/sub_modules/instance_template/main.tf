@@ -102,7 +102,7 @@ module "storage_cluster_tie_breaker_instance" {
   os_diff_disk                    = var.os_diff_disk
   os_disk_caching                 = var.storage_cluster_os_disk_caching
   os_storage_account_type         = var.storage_cluster_os_storage_account_type
-  data_disks_per_storage_instance = 1
+  data_disks_per_storage_instance = max(length(var.storage_cluster_filesystems), 1)
   data_disk_device_names          = local.data_disk_device_names
   data_disk_size                  = 5
   data_disk_storage_account_type  = var.data_disk_storage_account_type
@@ -122,6 +122,11 @@ module "prepare_ansible_configuration" {
   clone_path = var.scale_ansible_repo_clone_path
 }
 
+locals {
+  use_compute_cluster_image_manifest = var.using_packer_image == true && var.compute_cluster_image_manifest_path != null
+  use_storage_cluster_image_manifest = var.using_packer_image == true && var.storage_cluster_image_manifest_path != null
+}
+
 module "write_compute_cluster_inventory" {
   source                                           = "../../../resources/common/write_inventory"
   write_inventory                                  = (var.create_separate_namespaces == true && var.total_compute_cluster_instances > 0) ? 1 : 0
@@ -149,6 +154,8 @@ module "write_compute_cluster_inventory" {
   storage_cluster_desc_instance_private_dns_ip_map = jsonencode([])
   storage_cluster_instance_private_dns_ip_map      = jsonencode([])
   bastion_user                                     = var.bastion_user == null ? jsonencode("None") : jsonencode(var.bastion_user)
+  compute_cluster_image_manifest_map               = local.use_compute_cluster_image_manifest ? jsonencode({ for each_ip in module.compute_cluster_instances.instance_private_ips : each_ip => var.compute_cluster_image_manifest_path }) : jsonencode({})
+  compute_cluster_instance_type_map                = jsonencode({ for each_ip in module.compute_cluster_instances.instance_private_ips : each_ip => var.compute_cluster_vm_size })
 }
 
 module "write_storage_cluster_inventory" {
@@ -168,6 +175,8 @@ module "write_storage_cluster_inventory" {
   compute_cluster_instance_ids                     = jsonencode([])
   compute_cluster_instance_private_ips             = jsonencode([])
   storage_cluster_filesystem_mountpoint            = jsonencode(var.storage_cluster_filesystem_mountpoint)
+  storage_cluster_filesystems                      = jsonencode(var.storage_cluster_filesystems)
+  storage_cluster_shared_data_volume_mapping       = jsonencode(var.storage_cluster_shared_data_volume_mapping)
   storage_cluster_instance_ids                     = jsonencode(module.storage_cluster_instances.instance_ids)
   storage_cluster_instance_private_ips             = jsonencode(module.storage_cluster_instances.instance_private_ips)
   storage_cluster_with_data_volume_mapping         = jsonencode(module.storage_cluster_instances.instance_ips_with_data_mapping)
@@ -178,6 +187,8 @@ module "write_storage_cluster_inventory" {
   storage_cluster_desc_instance_private_dns_ip_map = jsonencode([])
   storage_cluster_instance_private_dns_ip_map      = jsonencode([])
   bastion_user                                     = var.bastion_user == null ? jsonencode("None") : jsonencode(var.bastion_user)
+  storage_cluster_image_manifest_map               = local.use_storage_cluster_image_manifest ? jsonencode({ for each_ip in concat(tolist(module.storage_cluster_instances.instance_private_ips), tolist(module.storage_cluster_tie_breaker_instance.instance_private_ips)) : each_ip => var.storage_cluster_image_manifest_path }) : jsonencode({})
+  storage_cluster_instance_type_map                = jsonencode({ for each_ip in concat(tolist(module.storage_cluster_instances.instance_private_ips), tolist(module.storage_cluster_tie_breaker_instance.instance_private_ips)) : each_ip => var.storage_cluster_vm_size })
 }
 
 module "write_cluster_inventory" {
@@ -197,6 +208,8 @@ module "write_cluster_inventory" {
   compute_cluster_instance_ids                     = jsonencode(module.compute_cluster_instances.instance_ids)
   compute_cluster_instance_private_ips             = jsonencode(module.compute_cluster_instances.instance_private_ips)
   storage_cluster_filesystem_mountpoint            = jsonencode(var.storage_cluster_filesystem_mountpoint)
+  storage_cluster_filesystems                      = jsonencode(var.storage_cluster_filesystems)
+  storage_cluster_shared_data_volume_mapping       = jsonencode(var.storage_cluster_shared_data_volume_mapping)
   storage_cluster_instance_ids                     = jsonencode(module.storage_cluster_instances.instance_ids)
   storage_cluster_instance_private_ips             = jsonencode(module.storage_cluster_instances.instance_private_ips)
   storage_cluster_with_data_volume_mapping         = jsonencode(module.storage_cluster_instances.instance_ips_with_data_mapping)
@@ -207,6 +220,10 @@ module "write_cluster_inventory" {
   storage_cluster_desc_instance_private_dns_ip_map = jsonencode([])
   compute_cluster_instance_private_dns_ip_map      = jsonencode([])
   bastion_user                                     = var.bastion_user == null ? jsonencode("None") : jsonencode(var.bastion_user)
+  compute_cluster_image_manifest_map               = local.use_compute_cluster_image_manifest ? jsonencode({ for each_ip in module.compute_cluster_instances.instance_private_ips : each_ip => var.compute_cluster_image_manifest_path }) : jsonencode({})
+  storage_cluster_image_manifest_map               = local.use_storage_cluster_image_manifest ? jsonencode({ for each_ip in concat(tolist(module.storage_cluster_instances.instance_private_ips), tolist(module.storage_cluster_tie_breaker_instance.instance_private_ips)) : each_ip => var.storage_cluster_image_manifest_path }) : jsonencode({})
+  compute_cluster_instance_type_map                = jsonencode({ for each_ip in module.compute_cluster_instances.instance_private_ips : each_ip => var.compute_cluster_vm_size })
+  storage_cluster_instance_type_map                = jsonencode({ for each_ip in concat(tolist(module.storage_cluster_instances.instance_private_ips), tolist(module.storage_cluster_tie_breaker_instance.instance_private_ips)) : each_ip => var.storage_cluster_vm_size })
 }
 
 module "compute_cluster_configuration" {
@@ -227,6 +244,7 @@ module "compute_cluster_configuration" {
   meta_private_key             = module.generate_compute_cluster_keys.private_key_content
   scale_version                = local.scale_version
   spectrumscale_rpms_path      = var.spectrumscale_rpms_path
+  node_count                   = length(module.compute_cluster_instances.instance_private_ips)
   inventory_format             = var.inventory_format
   create_scale_cluster         = var.create_scale_cluster
   max_pagepool_gb              = 4
@@ -251,6 +269,7 @@ module "storage_cluster_configuration" {
   meta_private_key             = module.generate_storage_cluster_keys.private_key_content
   scale_version                = local.scale_version
   spectrumscale_rpms_path      = var.spectrumscale_rpms_path
+  node_count                   = length(module.storage_cluster_instances.instance_private_ips) + length(module.storage_cluster_tie_breaker_instance.instance_private_ips)
   inventory_format             = var.inventory_format
   max_pagepool_gb              = 16
   vcpu_count                   = 2
@@ -275,6 +294,7 @@ module "combined_cluster_configuration" {
   meta_private_key             = module.generate_storage_cluster_keys.private_key_content
   scale_version                = local.scale_version
   spectrumscale_rpms_path      = var.spectrumscale_rpms_path
+  node_count                   = length(module.compute_cluster_instances.instance_private_ips) + length(module.storage_cluster_instances.instance_private_ips) + (length(var.vnet_availability_zones) > 1 ? length(module.storage_cluster_tie_breaker_instance.instance_private_ips) : 0)
   inventory_format             = var.inventory_format
   create_scale_cluster         = var.create_scale_cluster
   bastion_user                 = var.bastion_user == null ? jsonencode("None") : jsonencode(var.bastion_user)
@@ -301,4 +321,5 @@ module "remote_mount_configuration" {
   storage_cluster_create_complete = module.storage_cluster_configuration.storage_cluster_create_complete
   create_scale_cluster            = var.create_scale_cluster
   bastion_user                    = var.bastion_user == null ? jsonencode("None") : jsonencode(var.bastion_user)
+  remote_mount_pairs              = var.remote_mount_pairs
 }
@@ -99,6 +99,12 @@ variable "using_rest_api_remote_mount" {
   description = "If false, skips GUI initialization on compute cluster for remote mount configuration."
 }
 
+variable "remote_mount_pairs" {
+  type        = any
+  default     = []
+  description = "Compute/storage cluster pairs to remote mount in one run, each with compute_tf_inv_path, compute_gui_inv_path, storage_tf_inv_path and storage_gui_inv_path, and an optional name, filesystems and GUI credentials. The pairs are configured concurrently. When empty, the compute and storage clusters of this template are paired."
+}
+
 variable "storage_cluster_vm_size" {
   type        = string
   default     = "Standard_A2_v2"
@@ -255,6 +261,18 @@ variable "storage_cluster_filesystem_mountpoint" {
   description = "Storage cluster (owningCluster) Filesystem mount point."
 }
 
+variable "storage_cluster_filesystems" {
+  type        = any
+  default     = []
+  description = "Storage cluster filesystems, each with a mountpoint and optional block_size, workload, data_replicas, metadata_replicas and devices or servers selection. The tiebreaker gets one descriptor volume per filesystem. Empty creates a single filesystem at storage_cluster_filesystem_mountpoint."
+}
+
+variable "storage_cluster_shared_data_volume_mapping" {
+  type        = any
+  default     = {}
+  description = "Volumes attached to several storage instances (AWS io2 Multi-Attach, GCP multi-writer or Azure shared disks), created and attached outside this template. Map of volume id to {device, servers, size in bytes}, each volume becomes one NSD served by its servers."
+}
+
 variable "filesystem_block_size" {
   type        = string
   default     = "4M"
@@ -273,6 +291,18 @@ variable "using_packer_image" {
   description = "If true, gpfs rpm copy step will be skipped during the configuration."
 }
 
+variable "compute_cluster_image_manifest_path" {
+  type        = string
+  default     = null
+  description = "Local path of the scale_image_manifest.json downloaded by the packer build of the compute cluster image. Compute nodes whose image already has the Scale version installed skip package installation."
+}
+
+variable "storage_cluster_image_manifest_path" {
+  type        = string
+  default     = null
+  description = "Local path of the scale_image_manifest.json downloaded by the packer build of the storage cluster image. Storage nodes whose image already has the Scale version installed skip package installation."
+}
+
 variable "ansible_jump_host_public_ip" {
   type        = string
   default     = null
@@ -267,7 +267,7 @@ module "storage_cluster_tie_breaker_instance" {
   ssh_key_path                  = var.storage_cluster_public_key_path
   ssh_user_name                 = var.instances_ssh_user_name
   total_cluster_instances       = var.vpc_storage_cluster_private_subnets != null ? ((length(var.vpc_storage_cluster_private_subnets) > 2 && (local.cluster_type == "storage" || local.cluster_type == "combined")) ? 1 : 0) : 0
-  total_persistent_disks        = 1
+  total_persistent_disks        = max(length(var.storage_cluster_filesystems), 1)
   total_local_ssd_disks         = 0
   physical_block_size_bytes     = var.physical_block_size_bytes
   data_disk_description         = format("This data disk is created by IBM Storage Scale and is used by %s.", var.resource_prefix)
@@ -326,6 +326,11 @@ module "prepare_ansible_configuration" {
   clone_path = var.scale_ansible_repo_clone_path
 }
 
+locals {
+  use_compute_cluster_image_manifest = var.using_packer_image == true && var.compute_cluster_image_manifest_path != null
+  use_storage_cluster_image_manifest = var.using_packer_image == true && var.storage_cluster_image_manifest_path != null
+}
+
 # Write the compute cluster related inventory.
 module "write_compute_cluster_inventory" {
   source                                           = "../../../resources/common/write_inventory"
@@ -354,6 +359,8 @@ module "write_compute_cluster_inventory" {
   storage_cluster_desc_instance_private_ips        = jsonencode([])
   storage_cluster_desc_data_volume_mapping         = jsonencode({})
   storage_cluster_desc_instance_private_dns_ip_map = jsonencode({})
+  compute_cluster_image_manifest_map               = local.use_compute_cluster_image_manifest ? jsonencode({ for each_ip in flatten(module.compute_cluster_instances[*].instance_ips) : each_ip => var.compute_cluster_image_manifest_path }) : jsonencode({})
+  compute_cluster_instance_type_map                = jsonencode({ for each_ip in flatten(module.compute_cluster_instances[*].instance_ips) : each_ip => var.compute_cluster_instance_type })
 }
 
 # Write the storage cluster related inventory.
@@ -376,6 +383,8 @@ module "write_storage_cluster_inventory" {
   compute_cluster_instance_private_ips             = jsonencode([])
   compute_cluster_instance_private_dns_ip_map      = jsonencode({})
   storage_cluster_filesystem_mountpoint            = jsonencode(var.storage_cluster_filesystem_mountpoint)
+  storage_cluster_filesystems                      = jsonencode(var.storage_cluster_filesystems)
+  storage_cluster_shared_data_volume_mapping       = jsonencode(var.storage_cluster_shared_data_volume_mapping)
   storage_cluster_instance_ids                     = jsonencode(flatten(module.storage_cluster_instances[*].instance_selflink))
   storage_cluster_instance_private_ips             = jsonencode(flatten(module.storage_cluster_instances[*].instance_ips))
   storage_cluster_with_data_volume_mapping         = length(module.storage_cluster_instances) > 0 ? jsonencode((module.storage_cluster_instances[*].disk_device_mapping)[0]) : jsonencode({})
@@ -384,6 +393,8 @@ module "write_storage_cluster_inventory" {
   storage_cluster_desc_instance_private_ips        = jsonencode(flatten(module.storage_cluster_tie_breaker_instance[*].instance_ips))
   storage_cluster_desc_data_volume_mapping         = length(module.storage_cluster_tie_breaker_instance) > 0 ? jsonencode((flatten(module.storage_cluster_tie_breaker_instance[*].disk_device_mapping))[0]) : jsonencode({})
   storage_cluster_desc_instance_private_dns_ip_map = length(module.storage_cluster_tie_breaker_instance) > 0 ? jsonencode((flatten(module.storage_cluster_tie_breaker_instance[*].dns_hostname))[0]) : jsonencode({})
+  storage_cluster_image_manifest_map               = local.use_storage_cluster_image_manifest ? jsonencode({ for each_ip in concat(flatten(module.storage_cluster_instances[*].instance_ips), flatten(module.storage_cluster_tie_breaker_instance[*].instance_ips)) : each_ip => var.storage_cluster_image_manifest_path }) : jsonencode({})
+  storage_cluster_instance_type_map                = jsonencode({ for each_ip in concat(flatten(module.storage_cluster_instances[*].instance_ips), flatten(module.storage_cluster_tie_breaker_instance[*].instance_ips)) : each_ip => var.storage_cluster_instance_type })
 }
 
 # Write combined cluster related inventory.
@@ -406,6 +417,8 @@ module "write_cluster_inventory" {
   compute_cluster_instance_private_ips             = jsonencode(flatten(module.compute_cluster_instances[*].instance_ips))
   compute_cluster_instance_private_dns_ip_map      = jsonencode({})
   storage_cluster_filesystem_mountpoint            = jsonencode(var.storage_cluster_filesystem_mountpoint)
+  storage_cluster_filesystems                      = jsonencode(var.storage_cluster_filesystems)
+  storage_cluster_shared_data_volume_mapping       = jsonencode(var.storage_cluster_shared_data_volume_mapping)
   storage_cluster_instance_ids                     = jsonencode(flatten(module.storage_cluster_instances[*].instance_selflink))
   storage_cluster_instance_private_ips             = jsonencode(flatten(module.storage_cluster_instances[*].instance_ips))
   storage_cluster_with_data_volume_mapping         = length(module.storage_cluster_instances) > 0 ? jsonencode((module.storage_cluster_instances[*].disk_device_mapping)[0]) : jsonencode({})
@@ -414,6 +427,10 @@ module "write_cluster_inventory" {
   storage_cluster_desc_instance_private_ips        = jsonencode(flatten(module.storage_cluster_tie_breaker_instance[*].instance_ips))
   storage_cluster_desc_data_volume_mapping         = length(module.storage_cluster_tie_breaker_instance) > 0 ? jsonencode((flatten(module.storage_cluster_tie_breaker_instance[*].disk_device_mapping))[0]) : jsonencode({})
   storage_cluster_desc_instance_private_dns_ip_map = length(module.storage_cluster_tie_breaker_instance) > 0 ? jsonencode((flatten(module.storage_cluster_tie_breaker_instance[*].dns_hostname))[0]) : jsonencode({})
+  compute_cluster_image_manifest_map               = local.use_compute_cluster_image_manifest ? jsonencode({ for each_ip in flatten(module.compute_cluster_instances[*].instance_ips) : each_ip => var.compute_cluster_image_manifest_path }) : jsonencode({})
+  storage_cluster_image_manifest_map               = local.use_storage_cluster_image_manifest ? jsonencode({ for each_ip in concat(flatten(module.storage_cluster_instances[*].instance_ips), flatten(module.storage_cluster_tie_breaker_instance[*].instance_ips)) : each_ip => var.storage_cluster_image_manifest_path }) : jsonencode({})
+  compute_cluster_instance_type_map                = jsonencode({ for each_ip in flatten(module.compute_cluster_instances[*].instance_ips) : each_ip => var.compute_cluster_instance_type })
+  storage_cluster_instance_type_map                = jsonencode({ for each_ip in concat(flatten(module.storage_cluster_instances[*].instance_ips), flatten(module.storage_cluster_tie_breaker_instance[*].instance_ips)) : each_ip => var.storage_cluster_instance_type })
 }
 
 # Configure the compute cluster using ansible based on the create_scale_cluster input.
@@ -439,6 +456,7 @@ module "compute_cluster_configuration" {
   meta_private_key             = module.generate_compute_cluster_keys.private_key_content
   scale_version                = local.scale_version
   spectrumscale_rpms_path      = var.spectrumscale_rpms_path
+  node_count                   = length(flatten(module.compute_cluster_instances[*].instance_ips))
 }
 
 # Configure the storage cluster using ansible based on the create_scale_cluster input.
@@ -465,6 +483,7 @@ module "storage_cluster_configuration" {
   meta_private_key             = module.generate_storage_cluster_keys.private_key_content
   scale_version                = local.scale_version
   spectrumscale_rpms_path      = var.spectrumscale_rpms_path
+  node_count                   = length(flatten(module.storage_cluster_instances[*].instance_ips)) + length(flatten(module.storage_cluster_tie_breaker_instance[*].instance_ips))
   depends_on                   = [module.storage_cluster_instances]
 }
 
@@ -489,4 +508,5 @@ module "combined_cluster_configuration" {
   meta_private_key             = module.generate_storage_cluster_keys.private_key_content
   scale_version                = local.scale_version
   spectrumscale_rpms_path      = var.spectrumscale_rpms_path
+  node_count                   = length(flatten(module.compute_cluster_instances[*].instance_ips)) + length(flatten(module.storage_cluster_instances[*].instance_ips)) + length(flatten(module.storage_cluster_tie_breaker_instance[*].instance_ips))
 }
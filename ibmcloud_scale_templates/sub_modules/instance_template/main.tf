@@ -385,6 +385,7 @@ module "compute_cluster_configuration" {
   meta_private_key             = module.generate_compute_cluster_keys.private_key_content
   scale_version                = local.scale_version
   spectrumscale_rpms_path      = var.spectrumscale_rpms_path
+  node_count                   = length(module.compute_cluster_instances.instance_private_ips)
 }
 
 module "storage_cluster_configuration" {
@@ -410,6 +411,7 @@ module "storage_cluster_configuration" {
   meta_private_key             = module.generate_storage_cluster_keys.private_key_content
   scale_version                = local.scale_version
   spectrumscale_rpms_path      = var.spectrumscale_rpms_path
+  node_count                   = length(var.storage_type == "persistent" ? one(module.storage_cluster_bare_metal_server[*].instance_private_ips) : one(module.storage_cluster_instances[*].instance_private_ips)) + length(module.storage_cluster_tie_breaker_instance.instance_private_ips)
 }
 
 module "combined_cluster_configuration" {
@@ -432,6 +434,7 @@ module "combined_cluster_configuration" {
   meta_private_key             = module.generate_storage_cluster_keys.private_key_content
   scale_version                = local.scale_version
   spectrumscale_rpms_path      = var.spectrumscale_rpms_path
+  node_count                   = length(module.compute_cluster_instances.instance_private_ips) + length(var.storage_type == "persistent" ? one(module.storage_cluster_bare_metal_server[*].instance_private_ips) : one(module.storage_cluster_instances[*].instance_private_ips)) + (length(var.vpc_availability_zones) > 1 ? length(module.storage_cluster_tie_breaker_instance.instance_private_ips) : 0)
 }
 
 module "remote_mount_configuration" {
@@ -455,4 +458,5 @@ module "remote_mount_configuration" {
   clone_complete                  = module.prepare_ansible_configuration.clone_complete
   compute_cluster_create_complete = module.compute_cluster_configuration.compute_cluster_create_complete
   storage_cluster_create_complete = module.storage_cluster_configuration.storage_cluster_create_complete
+  remote_mount_pairs              = var.remote_mount_pairs
 }
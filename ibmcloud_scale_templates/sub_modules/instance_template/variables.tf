@@ -63,6 +63,12 @@ variable "using_rest_api_remote_mount" {
   description = "If false, skips GUI initialization on compute cluster for remote mount configuration."
 }
 
+variable "remote_mount_pairs" {
+  type        = any
+  default     = []
+  description = "Compute/storage cluster pairs to remote mount in one run, each with compute_tf_inv_path, compute_gui_inv_path, storage_tf_inv_path and storage_gui_inv_path, and an optional name, filesystems and GUI credentials. The pairs are configured concurrently. When empty, the compute and storage clusters of this template are paired."
+}
+
 variable "compute_cluster_gui_username" {
   type        = string
   sensitive   = true
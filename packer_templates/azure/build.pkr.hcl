@@ -1,6 +1,11 @@
 build {
   sources = ["source.azure-arm.itself"]
 
+  provisioner "file" {
+    source      = "${path.root}/../scripts/write_image_manifest.sh"
+    destination = "/tmp/write_image_manifest.sh"
+  }
+
   provisioner "shell" {
     execute_command = "chmod +x {{ .Path }}; {{ .Vars }} sudo -E sh '{{ .Path }}'"
     inline = [
@@ -21,6 +26,22 @@ build {
       "dnf install *.rpm -y",
       "rm -rf *.rpm *.gpg",
       "/usr/lpp/mmfs/bin/mmbuildgpl",
+      "sh /tmp/write_image_manifest.sh",
+      "rm -f /tmp/write_image_manifest.sh"
+    ]
+    inline_shebang = "/bin/sh -x"
+  }
+
+  # Downloaded before the deprovision step removes the SSH user
+  provisioner "file" {
+    direction   = "download"
+    source      = "/etc/scale_image_manifest.json"
+    destination = "${local.manifest_path}/scale_image_manifest.json"
+  }
+
+  provisioner "shell" {
+    execute_command = "chmod +x {{ .Path }}; {{ .Vars }} sudo -E sh '{{ .Path }}'"
+    inline = [
       "sh -c \"echo 'export PATH=$PATH:$HOME/bin:/usr/lpp/mmfs/bin' >> /root/.bashrc\"",
       "rm -rf /root/.ssh/authorized_keys",
       "rm -rf /home/\"${var.ssh_username}\"/authorized_keys",
@@ -96,3 +96,12 @@ variable "ssh_username" {
   default     = "azureuser"
   description = "The username to connect to SSH with."
 }
+
+variable "manifest_path" {
+  type    = string
+  default = ""
+}
+
+locals {
+  manifest_path = var.manifest_path != "" ? var.manifest_path : path.root
+}
@@ -1,6 +1,11 @@
 build {
   sources = ["source.googlecompute.itself"]
 
+  provisioner "file" {
+    source      = "${path.root}/../scripts/write_image_manifest.sh"
+    destination = "/tmp/write_image_manifest.sh"
+  }
+
   provisioner "shell" {
     inline = [
       "sleep 30",
@@ -26,6 +31,8 @@ build {
       "sudo sh -c \"echo 'gpgcheck=0' >> /etc/yum.repos.d/scale.repo\"",
       "sudo dnf install -y gpfs*",
       "sudo /usr/lpp/mmfs/bin/mmbuildgpl",
+      "sudo sh /tmp/write_image_manifest.sh",
+      "rm -f /tmp/write_image_manifest.sh",
       "sudo sh -c \"echo 'export PATH=$PATH:$HOME/bin:/usr/lpp/mmfs/bin' >> /root/.bashrc\"",
       "sudo rm -rf /etc/yum.repos.d/scale.repo",
       "sudo rm -rf /root/.bash_history",
@@ -33,6 +40,12 @@ build {
     ]
   }
 
+  provisioner "file" {
+    direction   = "download"
+    source      = "/etc/scale_image_manifest.json"
+    destination = "${local.manifest_path}/scale_image_manifest.json"
+  }
+
   post-processor "manifest" {
     output     = "${local.manifest_path}/manifest.json"
     strip_path = true
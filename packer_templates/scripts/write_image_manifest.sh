@@ -0,0 +1,31 @@
+#!/bin/sh
+# Writes the Spectrum Scale image manifest (installed packages, kernel and
+# GPL build state). The inventory generators read it per node, from the
+# terraform inventory, to skip package installation on baked images.
+MANIFEST_PATH=${MANIFEST_PATH:-/etc/scale_image_manifest.json}
+KERNEL=$(uname -r)
+# Ex: gpfs.base 5.1.5-0 is Scale 5.1.5.0, empty when gpfs.base is not installed
+# (rpm then prints "package gpfs.base is not installed" on stdout)
+if [ -z "$SCALE_VERSION" ] && GPFS_BASE=$(rpm -q gpfs.base --qf '%{VERSION}.%{RELEASE}' 2>/dev/null); then
+    SCALE_VERSION=$(echo "$GPFS_BASE" | sed 's/-/./')
+fi
+if [ -e "/lib/modules/$KERNEL/extra/mmfs26.ko" ]; then
+    GPL_BUILT=true
+else
+    GPL_BUILT=false
+fi
+PACKAGES=$(rpm -qa 'gpfs.*' --qf '    "%{NAME}": "%{VERSION}-%{RELEASE}",\n' | sort | sed '$ s/,$//')
+
+cat > "$MANIFEST_PATH" <<EOF
+{
+  "manifest_version": 1,
+  "scale_version": "$SCALE_VERSION",
+  "kernel": "$KERNEL",
+  "gpl_built": $GPL_BUILT,
+  "packages": {
+$PACKAGES
+  },
+  "build_time": "$(date -u +%Y-%m-%dT%H:%M:%SZ)"
+}
+EOF
+chmod 644 "$MANIFEST_PATH"
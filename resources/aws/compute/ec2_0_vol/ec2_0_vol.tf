@@ -18,6 +18,9 @@ variable "meta_private_key" {}
 variable "meta_public_key" {}
 variable "volume_tags" {}
 variable "tags" {}
+variable "secondary_subnet_ids" {
+  default = null
+}
 
 data "template_file" "user_data" {
   template = <<EOF
@@ -97,6 +100,26 @@ resource "aws_instance" "itself" {
   }
 }
 
+data "aws_subnet" "secondary" {
+  for_each = toset(var.secondary_subnet_ids == null ? [] : var.secondary_subnet_ids)
+  id       = each.value
+}
+
+# Secondary interface per instance, in the secondary subnet of its index, carrying the daemon traffic
+resource "aws_network_interface" "secondary" {
+  for_each        = var.secondary_subnet_ids == null ? {} : { for idx in range(var.instances_count) : idx => element(var.secondary_subnet_ids, idx) }
+  subnet_id       = each.value
+  security_groups = var.security_groups
+  tags            = merge({ "Name" = format("%s-%s-data", var.name_prefix, tonumber(each.key) + 1) }, var.tags)
+}
+
+resource "aws_network_interface_attachment" "secondary" {
+  for_each             = aws_network_interface.secondary
+  instance_id          = aws_instance.itself[each.key].id
+  network_interface_id = each.value.id
+  device_index         = 1
+}
+
 output "instance_private_ips" {
   value = try(toset([for instance_details in aws_instance.itself : instance_details.private_ip]), [])
 }
@@ -108,3 +131,11 @@ output "instance_ids" {
 output "instance_private_dns_ip_map" {
   value = try({ for instance_details in aws_instance.itself : instance_details.private_ip => instance_details.private_dns }, {})
 }
+
+output "instance_private_ip_az_map" {
+  value = try({ for instance_details in aws_instance.itself : instance_details.private_ip => instance_details.availability_zone }, {})
+}
+
+output "instance_private_ip_secondary_interface_map" {
+  value = try({ for idx, interface_details in aws_network_interface.secondary : aws_instance.itself[idx].private_ip => { ip = interface_details.private_ip, subnet = cidrhost(data.aws_subnet.secondary[interface_details.subnet_id].cidr_block, 0) } }, {})
+}
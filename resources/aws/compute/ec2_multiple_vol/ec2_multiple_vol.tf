@@ -29,6 +29,9 @@ variable "enable_instance_store_block_device" {}
 variable "is_nitro_instance" {}
 variable "nvme_block_device_count" {}
 variable "tags" {}
+variable "secondary_subnet_ids" {
+  default = null
+}
 
 data "template_file" "user_data" {
   template = <<EOF
@@ -153,6 +156,26 @@ resource "aws_instance" "itself" {
   }
 }
 
+data "aws_subnet" "secondary" {
+  for_each = toset(var.secondary_subnet_ids == null ? [] : var.secondary_subnet_ids)
+  id       = each.value
+}
+
+# Secondary interface per instance, in the secondary subnet of its index, carrying the daemon traffic
+resource "aws_network_interface" "secondary" {
+  for_each        = var.secondary_subnet_ids == null ? {} : { for idx in range(var.instances_count) : idx => element(var.secondary_subnet_ids, idx) }
+  subnet_id       = each.value
+  security_groups = var.security_groups
+  tags            = merge({ "Name" = format("%s-%s-data", var.name_prefix, tonumber(each.key) + 1) }, var.tags)
+}
+
+resource "aws_network_interface_attachment" "secondary" {
+  for_each             = aws_network_interface.secondary
+  instance_id          = aws_instance.itself[each.key].id
+  network_interface_id = each.value.id
+  device_index         = 1
+}
+
 output "instance_private_ips" {
   value = try(toset([for instance_details in aws_instance.itself : instance_details.private_ip]), [])
 }
@@ -162,9 +185,17 @@ output "instance_ids" {
 }
 
 output "instance_ips_with_ebs_mapping" {
-  value = tobool(var.enable_instance_store_block_device) == true ? try({ for instance_details in aws_instance.itself : instance_details.private_ip => slice(var.ebs_block_device_names, 0, var.nvme_block_device_count) }, {}) : try({ for instance_details in aws_instance.itself : instance_details.private_ip => slice(var.ebs_block_device_names, 0, var.ebs_block_devices) }, {})
+  value = tobool(var.enable_instance_store_block_device) == true ? try({ for instance_details in aws_instance.itself : instance_details.private_ip => [for each_device in slice(var.ebs_block_device_names, 0, var.nvme_block_device_count) : { device = each_device, size = 0 }] }, {}) : try({ for instance_details in aws_instance.itself : instance_details.private_ip => [for each_device in slice(var.ebs_block_device_names, 0, var.ebs_block_devices) : { device = each_device, size = var.ebs_block_device_volume_size * 1073741824 }] }, {})
 }
 
 output "instance_private_dns_ip_map" {
   value = try({ for instance_details in aws_instance.itself : instance_details.private_ip => instance_details.private_dns }, {})
 }
+
+output "instance_private_ip_az_map" {
+  value = try({ for instance_details in aws_instance.itself : instance_details.private_ip => instance_details.availability_zone }, {})
+}
+
+output "instance_private_ip_secondary_interface_map" {
+  value = try({ for idx, interface_details in aws_network_interface.secondary : aws_instance.itself[idx].private_ip => { ip = interface_details.private_ip, subnet = cidrhost(data.aws_subnet.secondary[interface_details.subnet_id].cidr_block, 0) } }, {})
+}
@@ -170,5 +170,5 @@ output "instance_ids" {
 }
 
 output "instance_ips_with_data_mapping" {
-  value = try({ for instance_details in azurerm_linux_virtual_machine.itself : instance_details.private_ip_address => slice(var.data_disk_device_names, 0, var.data_disks_per_storage_instance) }, {})
+  value = try({ for instance_details in azurerm_linux_virtual_machine.itself : instance_details.private_ip_address => [for each_device in slice(var.data_disk_device_names, 0, var.data_disks_per_storage_instance) : { device = each_device, size = var.data_disk_size * 1073741824 }] }, {})
 }
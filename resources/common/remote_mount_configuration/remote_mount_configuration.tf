@@ -21,21 +21,37 @@ variable "using_jumphost_connection" {}
 variable "clone_complete" {}
 variable "compute_cluster_create_complete" {}
 variable "storage_cluster_create_complete" {}
+variable "remote_mount_pairs" {
+  default = []
+}
 
 locals {
   scripts_path              = replace(path.module, "remote_mount_configuration", "scripts")
   ansible_inv_script_path   = format("%s/prepare_remote_mount_inv.py", local.scripts_path)
+  trace_script_path         = format("%s/deployment_trace.py", local.scripts_path)
   compute_private_key       = format("%s/compute_key/id_rsa", var.clone_path) #tfsec:ignore:GEN002
   remote_mnt_inventory_path = format("%s/%s/remote_mount_inventory.ini", var.clone_path, "ibm-spectrum-scale-install-infra")
   remote_mnt_playbook_path  = format("%s/%s/remote_mount_cloud_playbook.yaml", var.clone_path, "ibm-spectrum-scale-install-infra")
+  remote_mnt_config_path    = format("%s/%s/remote_mount_config.json", var.clone_path, "ibm-spectrum-scale-install-infra")
+  remote_mnt_runner_path    = format("%s/%s/remote_mount_run_all.sh", var.clone_path, "ibm-spectrum-scale-install-infra")
+  # Several compute/storage cluster pairs are configured in one run, concurrently
+  use_remote_mnt_config  = length(var.remote_mount_pairs) > 0
+  remote_mnt_config_args = local.use_remote_mnt_config ? format(" --remote_mount_config %s", local.remote_mnt_config_path) : ""
+}
+
+resource "local_sensitive_file" "write_remote_mnt_config" {
+  count    = (tobool(var.turn_on) == true && tobool(var.clone_complete) == true && local.use_remote_mnt_config == true) ? 1 : 0
+  content  = jsonencode(var.remote_mount_pairs)
+  filename = local.remote_mnt_config_path
 }
 
 resource "null_resource" "prepare_remote_mnt_inventory_using_jumphost_connection" {
   count = (tobool(var.turn_on) == true && tobool(var.clone_complete) == true && tobool(var.compute_cluster_create_complete) == true && tobool(var.storage_cluster_create_complete) == true && tobool(var.using_jumphost_connection) == true) ? 1 : 0
   provisioner "local-exec" {
     interpreter = ["/bin/bash", "-c"]
-    command     = "python3 ${local.ansible_inv_script_path} --compute_tf_inv_path ${var.compute_inventory_path} --compute_gui_inv_path ${var.compute_gui_inventory_path} --storage_tf_inv_path ${var.storage_inventory_path} --storage_gui_inv_path ${var.storage_gui_inventory_path} --install_infra_path ${var.clone_path} --instance_private_key ${local.compute_private_key} --using_rest_initialization ${var.using_rest_initialization} --bastion_user ${var.bastion_user} --bastion_ip ${var.bastion_instance_public_ip} --bastion_ssh_private_key ${var.bastion_ssh_private_key} --compute_cluster_gui_username ${var.compute_cluster_gui_username} --compute_cluster_gui_password ${var.compute_cluster_gui_password} --storage_cluster_gui_username ${var.storage_cluster_gui_username} --storage_cluster_gui_password ${var.storage_cluster_gui_password}"
+    command     = "python3 ${local.ansible_inv_script_path} --compute_tf_inv_path ${var.compute_inventory_path} --compute_gui_inv_path ${var.compute_gui_inventory_path} --storage_tf_inv_path ${var.storage_inventory_path} --storage_gui_inv_path ${var.storage_gui_inventory_path} --install_infra_path ${var.clone_path} --instance_private_key ${local.compute_private_key} --using_rest_initialization ${var.using_rest_initialization} --bastion_user ${var.bastion_user} --bastion_ip ${var.bastion_instance_public_ip} --bastion_ssh_private_key ${var.bastion_ssh_private_key} --compute_cluster_gui_username ${var.compute_cluster_gui_username} --compute_cluster_gui_password ${var.compute_cluster_gui_password} --storage_cluster_gui_username ${var.storage_cluster_gui_username} --storage_cluster_gui_password ${var.storage_cluster_gui_password}${local.remote_mnt_config_args}"
   }
+  depends_on = [local_sensitive_file.write_remote_mnt_config]
   triggers = {
     build = timestamp()
   }
@@ -45,26 +61,30 @@ resource "null_resource" "prepare_remote_mnt_inventory" {
   count = (tobool(var.turn_on) == true && tobool(var.clone_complete) == true && tobool(var.compute_cluster_create_complete) == true && tobool(var.storage_cluster_create_complete) == true && tobool(var.using_jumphost_connection) == false) ? 1 : 0
   provisioner "local-exec" {
     interpreter = ["/bin/bash", "-c"]
-    command     = "python3 ${local.ansible_inv_script_path} --compute_tf_inv_path ${var.compute_inventory_path} --compute_gui_inv_path ${var.compute_gui_inventory_path} --storage_tf_inv_path ${var.storage_inventory_path} --storage_gui_inv_path ${var.storage_gui_inventory_path} --install_infra_path ${var.clone_path} --instance_private_key ${local.compute_private_key} --using_rest_initialization ${var.using_rest_initialization} --compute_cluster_gui_username ${var.compute_cluster_gui_username} --compute_cluster_gui_password ${var.compute_cluster_gui_password} --storage_cluster_gui_username ${var.storage_cluster_gui_username} --storage_cluster_gui_password ${var.storage_cluster_gui_password}"
+    command     = "python3 ${local.ansible_inv_script_path} --compute_tf_inv_path ${var.compute_inventory_path} --compute_gui_inv_path ${var.compute_gui_inventory_path} --storage_tf_inv_path ${var.storage_inventory_path} --storage_gui_inv_path ${var.storage_gui_inventory_path} --install_infra_path ${var.clone_path} --instance_private_key ${local.compute_private_key} --using_rest_initialization ${var.using_rest_initialization} --compute_cluster_gui_username ${var.compute_cluster_gui_username} --compute_cluster_gui_password ${var.compute_cluster_gui_password} --storage_cluster_gui_username ${var.storage_cluster_gui_username} --storage_cluster_gui_password ${var.storage_cluster_gui_password}${local.remote_mnt_config_args}"
   }
+  depends_on = [local_sensitive_file.write_remote_mnt_config]
   triggers = {
     build = timestamp()
   }
 }
 
-resource "time_sleep" "wait_for_gui_db_initializion" {
-  count           = (tobool(var.turn_on) == true && tobool(var.clone_complete) == true && tobool(var.storage_cluster_create_complete) == true && tobool(var.create_scale_cluster) == true) ? 1 : 0
-  create_duration = "180s"
-  depends_on      = [null_resource.prepare_remote_mnt_inventory, null_resource.prepare_remote_mnt_inventory_using_jumphost_connection]
+resource "null_resource" "wait_for_gui_db_initializion" {
+  count = (tobool(var.turn_on) == true && tobool(var.clone_complete) == true && tobool(var.storage_cluster_create_complete) == true && tobool(var.create_scale_cluster) == true) ? 1 : 0
+  provisioner "local-exec" {
+    interpreter = ["/bin/bash", "-c"]
+    command     = "python3 ${local.trace_script_path} run --phase wait_for_gui -- sleep 180"
+  }
+  depends_on = [null_resource.prepare_remote_mnt_inventory, null_resource.prepare_remote_mnt_inventory_using_jumphost_connection]
 }
 
 resource "null_resource" "perform_scale_deployment" {
   count = (tobool(var.turn_on) == true && tobool(var.clone_complete) == true && tobool(var.compute_cluster_create_complete) == true && tobool(var.storage_cluster_create_complete) == true && tobool(var.create_scale_cluster) == true) ? 1 : 0
   provisioner "local-exec" {
     interpreter = ["/bin/bash", "-c"]
-    command     = "ansible-playbook -i ${local.remote_mnt_inventory_path} ${local.remote_mnt_playbook_path}"
+    command     = local.use_remote_mnt_config ? "python3 ${local.trace_script_path} run --phase ansible_remote_mount --node_count ${length(var.remote_mount_pairs)} -- ${local.remote_mnt_runner_path}" : "python3 ${local.trace_script_path} run --phase ansible_remote_mount -- ansible-playbook -i ${local.remote_mnt_inventory_path} ${local.remote_mnt_playbook_path}"
   }
-  depends_on = [time_sleep.wait_for_gui_db_initializion, null_resource.prepare_remote_mnt_inventory, null_resource.prepare_remote_mnt_inventory_using_jumphost_connection]
+  depends_on = [null_resource.wait_for_gui_db_initializion, null_resource.prepare_remote_mnt_inventory, null_resource.prepare_remote_mnt_inventory_using_jumphost_connection]
   triggers = {
     build = timestamp()
   }
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Copyright IBM Corporation 2018
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Local deployment performance history.
+
+Stores the cluster shape, Scale version, phase durations (deployment_trace.py)
+and per role durations (scale_task_timing callback) of each deployment in a
+sqlite database, and compares a run against earlier runs of a similar shape.
+
+Ex: deployment_history.py record --run_id $SCALE_TRACE_RUN_ID --tf_inv_path inventory.json \\
+        --trace_file $SCALE_TRACE_FILE --task_timing_log scale_task_timing.jsonl
+    deployment_history.py compare --run_id $SCALE_TRACE_RUN_ID
+    deployment_history.py trend --metric core_install
+"""
+
+import argparse
+import deployment_trace
+import json
+import os
+import sqlite3
+import statistics
+import sys
+import task_timing_report
+import time
+
+DEFAULT_DB_PATH = os.path.expanduser("~/.scale_deployment_history.db")
+# Runs are comparable when node counts are within this ratio of each other
+SHAPE_NODE_COUNT_TOLERANCE = 0.25
+# Slowdowns smaller than this are noise, whatever their ratio
+MIN_REGRESSION_SECONDS = 30.0
+PLAYBOOK_ROLE_NAME = "(playbook)"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    recorded_at REAL,
+    cloud_platform TEXT,
+    scale_version TEXT,
+    compute_node_count INTEGER,
+    storage_node_count INTEGER,
+    instance_types TEXT,
+    az_count INTEGER,
+    wall_clock REAL
+);
+CREATE TABLE IF NOT EXISTS metrics (
+    run_id TEXT REFERENCES runs(run_id) ON DELETE CASCADE,
+    kind TEXT,
+    name TEXT,
+    duration REAL,
+    PRIMARY KEY (run_id, kind, name)
+);
+"""
+
+
+def read_json_file(json_path):
+    """ Read inventory as json file """
+    tf_inv = {}
+    try:
+        with open(json_path) as json_handler:
+            try:
+                tf_inv = json.load(json_handler)
+            except json.decoder.JSONDecodeError:
+                print("Provided terraform inventory file (%s) is not a valid json." % json_path)
+                sys.exit(1)
+    except OSError:
+        print("Provided terraform inventory file (%s) does not exist." % json_path)
+        sys.exit(1)
+
+    return tf_inv
+
+
+def open_database(db_path):
+    """ Open the history database, creating the tables on first use. """
+    connection = sqlite3.connect(db_path)
+    connection.row_factory = sqlite3.Row
+    connection.execute("PRAGMA foreign_keys = ON")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def get_cluster_shape(tf_inv, scale_version):
+    """ Cluster shape of a deployment from its terraform inventory. """
+    instance_types = dict(tf_inv.get('compute_cluster_instance_type_map', {}))
+    instance_types.update(tf_inv.get('storage_cluster_instance_type_map', {}))
+    return {"cloud_platform": tf_inv.get('cloud_platform', ""),
+            "scale_version": scale_version or tf_inv.get('scale_version', ""),
+            "compute_node_count": len(tf_inv.get('compute_cluster_instance_private_ips', [])),
+            "storage_node_count": (len(tf_inv.get('storage_cluster_instance_private_ips', [])) +
+                                   len(tf_inv.get('storage_cluster_desc_instance_private_ips', []))),
+            "instance_types": ",".join(sorted(set(instance_types.values()))),
+            "az_count": len(tf_inv.get('vpc_availability_zones', []))}
+
+
+def get_phase_durations(spans):
+    """ Total duration per deployment phase. """
+    phases = {}
+    for each_span in spans:
+        phases[each_span["phase"]] = phases.get(each_span["phase"], 0.0) + each_span["duration"]
+    return phases
+
+
+def get_wall_clock(timings):
+    """ Wall clock time of a run, from its first start to its last end.
+    :args: timings (list) of dict with start and end (trace spans, task results)
+    Phases and roles overlap, so their durations do not add up to it.
+    """
+    if not timings:
+        return 0.0
+    return max([each_timing["end"] for each_timing in timings]) - \
+        min([each_timing["start"] for each_timing in timings])
+
+
+def get_role_durations(task_results):
+    """ Total wall clock time per ansible role of one run. """
+    roles = {}
+    for each_instance in task_timing_report.get_task_instances(task_results):
+        role = each_instance["results"][0]["role"] if each_instance["results"] else ""
+        role = role or PLAYBOOK_ROLE_NAME
+        roles[role] = roles.get(role, 0.0) + each_instance["wall"]
+    return roles
+
+
+def record_run(connection, run_id, shape, wall_clock, phases, roles):
+    """ Store a run, replacing an earlier record of the same run id. """
+    with connection:
+        connection.execute("DELETE FROM runs WHERE run_id = ?", (run_id,))
+        connection.execute(
+            "INSERT INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (run_id, time.time(), shape["cloud_platform"], shape["scale_version"],
+             shape["compute_node_count"], shape["storage_node_count"],
+             shape["instance_types"], shape["az_count"], wall_clock))
+        connection.executemany(
+            "INSERT INTO metrics VALUES (?, ?, ?, ?)",
+            [(run_id, "phase", each_name, each_duration)
+             for each_name, each_duration in phases.items()] +
+            [(run_id, "role", each_name, each_duration)
+             for each_name, each_duration in roles.items()])
+
+
+def is_similar_shape(run, other_run):
+    """ Same platform and instance types, node counts within tolerance. """
+    if run["cloud_platform"] != other_run["cloud_platform"] or \
+            run["instance_types"] != other_run["instance_types"]:
+        return False
+    for each_key in ["compute_node_count", "storage_node_count"]:
+        if abs(run[each_key] - other_run[each_key]) > \
+                SHAPE_NODE_COUNT_TOLERANCE * max(run[each_key], other_run[each_key]):
+            return False
+    return True
+
+
+def get_run_metrics(connection, run_id):
+    """ Metrics of a run as {(kind, name): duration}. """
+    return {(each_row["kind"], each_row["name"]): each_row["duration"]
+            for each_row in connection.execute(
+                "SELECT kind, name, duration FROM metrics WHERE run_id = ?", (run_id,))}
+
+
+def compare_run(connection, run_id, threshold):
+    """ Compare each metric of a run with the median of earlier similar runs.
+    :return: (run, history run count, list of (kind, name, duration, median, ratio, regressed))
+    """
+    run = connection.execute("SELECT * FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+    if run is None:
+        print("Run (%s) is not recorded." % run_id)
+        sys.exit(1)
+    history = [each_run for each_run in connection.execute(
+        "SELECT * FROM runs WHERE run_id != ? AND recorded_at < ?", (run_id, run["recorded_at"]))
+               if is_similar_shape(run, each_run)]
+    history_metrics = [get_run_metrics(connection, each_run["run_id"]) for each_run in history]
+
+    comparison = []
+    for (kind, name), duration in sorted(get_run_metrics(connection, run_id).items()):
+        previous = [each_metrics[(kind, name)] for each_metrics in history_metrics
+                    if (kind, name) in each_metrics]
+        if not previous:
+            continue
+        median = statistics.median(previous)
+        ratio = duration / median if median else float("inf")
+        regressed = ratio > 1 + threshold and duration - median >= MIN_REGRESSION_SECONDS
+        comparison.append((kind, name, duration, median, ratio, regressed))
+    return run, len(history), comparison
+
+
+def get_trend(connection, metric):
+    """ Mean duration of a metric per Scale version and node count.
+    :return: list of rows (scale_version, node_count, runs, mean)
+    """
+    return connection.execute(
+        "SELECT runs.scale_version, runs.compute_node_count + runs.storage_node_count "
+        "AS node_count, COUNT(*) AS runs, AVG(metrics.duration) AS mean FROM metrics "
+        "JOIN runs USING (run_id) WHERE metrics.name = ? "
+        "GROUP BY runs.scale_version, node_count ORDER BY runs.scale_version, node_count",
+        (metric,)).fetchall()
+
+
+if __name__ == "__main__":
+    PARSER = argparse.ArgumentParser(description='Record and compare deployment performance.')
+    PARSER.add_argument('--db_path', default=DEFAULT_DB_PATH,
+                        help='History database path (default: %s)' % DEFAULT_DB_PATH)
+    SUBPARSERS = PARSER.add_subparsers(dest='action', required=True)
+    RECORD_PARSER = SUBPARSERS.add_parser('record', help='Store the metrics of a run')
+    RECORD_PARSER.add_argument('--run_id', required=True,
+                               help='Run id (the SCALE_TRACE_RUN_ID of the deployment)')
+    RECORD_PARSER.add_argument('--tf_inv_path', required=True,
+                               help='Terraform inventory file path')
+    RECORD_PARSER.add_argument('--trace_file',
+                               help='Deployment trace file written by deployment_trace.py')
+    RECORD_PARSER.add_argument('--task_timing_log',
+                               help='Task timing log written by the scale_task_timing callback')
+    RECORD_PARSER.add_argument('--scale_version',
+                               help='Scale version (default: from terraform inventory)')
+    COMPARE_PARSER = SUBPARSERS.add_parser('compare', help='Flag regressions of a run')
+    COMPARE_PARSER.add_argument('--run_id', required=True,
+                                help='Run id to compare with earlier runs')
+    COMPARE_PARSER.add_argument('--threshold', type=float, default=0.25,
+                                help='Slowdown ratio flagged as regression (Ex: 0.25 = 25%%)')
+    TREND_PARSER = SUBPARSERS.add_parser('trend', help='Metric per Scale version and size')
+    TREND_PARSER.add_argument('--metric', required=True,
+                              help='Phase or role name (Ex: ansible_storage, core_install)')
+    ARGUMENTS = PARSER.parse_args()
+
+    CONNECTION = open_database(ARGUMENTS.db_path)
+    if ARGUMENTS.action == 'record':
+        if not ARGUMENTS.trace_file and not ARGUMENTS.task_timing_log:
+            print("--trace_file or --task_timing_log is required.")
+            sys.exit(1)
+        PHASES, ROLES, TIMINGS = {}, {}, []
+        if ARGUMENTS.trace_file:
+            SPANS = deployment_trace.load_spans(ARGUMENTS.trace_file, ARGUMENTS.run_id)
+            PHASES = get_phase_durations(SPANS)
+            TIMINGS.extend(SPANS)
+        if ARGUMENTS.task_timing_log:
+            for each_run in task_timing_report.load_task_results(ARGUMENTS.task_timing_log):
+                if each_run[0]["run_id"] == ARGUMENTS.run_id:
+                    ROLES = get_role_durations(each_run)
+                    TIMINGS.extend(each_run)
+        if not PHASES and not ROLES:
+            print("No timings recorded for run (%s)." % ARGUMENTS.run_id)
+            sys.exit(1)
+        SHAPE = get_cluster_shape(read_json_file(ARGUMENTS.tf_inv_path), ARGUMENTS.scale_version)
+        record_run(CONNECTION, ARGUMENTS.run_id, SHAPE, get_wall_clock(TIMINGS), PHASES, ROLES)
+        print("Recorded run %s: %s phases, %s roles" % (ARGUMENTS.run_id, len(PHASES), len(ROLES)))
+
+    elif ARGUMENTS.action == 'compare':
+        RUN, HISTORY_COUNT, COMPARISON = compare_run(CONNECTION, ARGUMENTS.run_id,
+                                                     ARGUMENTS.threshold)
+        print("Run %s: Scale %s, %s compute + %s storage nodes, compared with %s similar runs" % (
+            RUN["run_id"], RUN["scale_version"], RUN["compute_node_count"],
+            RUN["storage_node_count"], HISTORY_COUNT))
+        if not COMPARISON:
+            print("No earlier runs of a similar shape.")
+            sys.exit(0)
+        print("\n%-6s %-32s %10s %10s %8s" % ("kind", "name", "seconds", "median", "change"))
+        for kind, name, duration, median, ratio, regressed in COMPARISON:
+            print("%-6s %-32s %10.1f %10.1f %+7.0f%%%s" % (
+                kind, name, duration, median, 100 * (ratio - 1), "  REGRESSION" if regressed else ""))
+        if any([each_item[5] for each_item in COMPARISON]):
+            sys.exit(2)
+
+    else:
+        print("%-12s %6s %6s %10s" % ("version", "nodes", "runs", "seconds"))
+        for each_row in get_trend(CONNECTION, ARGUMENTS.metric):
+            print("%-12s %6s %6s %10.1f" % (
+                each_row["scale_version"], each_row["node_count"], each_row["runs"],
+                each_row["mean"]))
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Copyright IBM Corporation 2018
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Deployment phase tracing.
+
+Every deployment stage appends a timing span as a json line to the file
+named by SCALE_TRACE_FILE, tagged with SCALE_TRACE_RUN_ID. Tracing is off
+when SCALE_TRACE_FILE is not set.
+
+The scripts run with --profile also use it to record in-process profiles
+(cProfile, tracemalloc and per phase wall time).
+
+Ex: export SCALE_TRACE_FILE=/tmp/scale_trace.jsonl SCALE_TRACE_RUN_ID=$(date +%s)
+    deployment_trace.py run --phase ansible_compute -- ansible-playbook ...
+    deployment_trace.py report
+"""
+
+import argparse
+import cProfile
+import io
+import json
+import os
+import pstats
+import socket
+import subprocess
+import sys
+import time
+import tracemalloc
+
+TRACE_FILE_ENV = "SCALE_TRACE_FILE"
+TRACE_RUN_ID_ENV = "SCALE_TRACE_RUN_ID"
+# Spans of a sequential pipeline may overlap by clock skew between stages
+SPAN_OVERLAP_TOLERANCE = 1.0
+# Entries listed per section of a profile report
+PROFILE_TOP_COUNT = 25
+
+
+def start_span(phase):
+    """ Start timing a phase. """
+    return {"phase": phase, "start": time.time()}
+
+
+def end_span(span, node_count=None, status="ok"):
+    """ Finish a span started by start_span and append it to the trace file.
+    :args: span (dict), node_count (int), status (string)
+    """
+    trace_file = os.environ.get(TRACE_FILE_ENV)
+    if not trace_file:
+        return
+    end = time.time()
+    record = {"run_id": os.environ.get(TRACE_RUN_ID_ENV, "unspecified"),
+              "phase": span["phase"],
+              "start": round(span["start"], 3),
+              "end": round(end, 3),
+              "duration": round(end - span["start"], 3),
+              "node_count": node_count,
+              "status": status,
+              "host": socket.gethostname(),
+              "pid": os.getpid()}
+    with open(trace_file, 'a') as trace_handler:
+        trace_handler.write(json.dumps(record) + "\n")
+
+
+def start_profile(enabled):
+    """ Start cProfile and tracemalloc for a --profile run.
+    :return: profile (dict), None when not enabled so the marks cost nothing
+    """
+    if not enabled:
+        return None
+    tracemalloc.start()
+    profile = {"profiler": cProfile.Profile(), "phases": [], "phase": None,
+               "phase_start": None}
+    profile["profiler"].enable()
+    return profile
+
+
+def mark_phase(profile, phase):
+    """ End the current phase of a profile and start the next one. """
+    if profile is None:
+        return
+    now = time.perf_counter()
+    if profile["phase"] is not None:
+        profile["phases"].append((profile["phase"], now - profile["phase_start"]))
+    profile["phase"], profile["phase_start"] = phase, now
+
+
+def write_profile(profile, output_path):
+    """ Stop profiling and write the report to <output_path>.txt and the raw
+    cProfile stats (for snakeviz, pstats) to <output_path>.prof.
+    :args: profile (dict), output_path (string) without extension
+    """
+    if profile is None:
+        return
+    profile["profiler"].disable()
+    mark_phase(profile, None)
+    snapshot = tracemalloc.take_snapshot()
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    report = io.StringIO()
+    total = sum([each_duration for _, each_duration in profile["phases"]])
+    report.write("Phase wall time:\n")
+    for each_phase, each_duration in profile["phases"]:
+        report.write("  %-24s %10.4fs %6.1f%%\n" % (
+            each_phase, each_duration, 100 * each_duration / max(total, 0.000001)))
+    report.write("  %-24s %10.4fs\n" % ("total", total))
+    report.write("\nPeak traced memory: %.1f KiB\n" % (peak_memory / 1024))
+    report.write("\nTop allocations:\n")
+    for each_stat in snapshot.statistics('lineno')[:PROFILE_TOP_COUNT]:
+        report.write("  %s\n" % each_stat)
+    report.write("\ncProfile (cumulative):\n")
+    stats = pstats.Stats(profile["profiler"], stream=report)
+    stats.sort_stats("cumulative").print_stats(PROFILE_TOP_COUNT)
+
+    profile["profiler"].dump_stats("%s.prof" % output_path)
+    with open("%s.txt" % output_path, 'w') as profile_handler:
+        profile_handler.write(report.getvalue())
+    print("Profile written to: %s.txt" % output_path)
+
+
+def load_spans(trace_file, run_id=None):
+    """ Spans of one run, the most recent run when run_id is not given. """
+    spans = []
+    try:
+        with open(trace_file) as trace_handler:
+            for each_line in trace_handler:
+                if each_line.strip():
+                    spans.append(json.loads(each_line))
+    except OSError:
+        print("Trace file (%s) does not exist." % trace_file)
+        sys.exit(1)
+    if not spans:
+        return []
+    if run_id is None:
+        run_id = max(spans, key=lambda each_span: each_span["end"])["run_id"]
+    return [each_span for each_span in spans if each_span["run_id"] == run_id]
+
+
+def get_critical_path(spans):
+    """ Longest chain of spans where each one starts after the previous ended. """
+    ordered = sorted(spans, key=lambda each_span: each_span["end"])
+    best, previous = [], []
+    for index, each_span in enumerate(ordered):
+        best.append(each_span["duration"])
+        previous.append(None)
+        for candidate in range(index):
+            if ordered[candidate]["end"] <= each_span["start"] + SPAN_OVERLAP_TOLERANCE and \
+                    best[candidate] + each_span["duration"] > best[index]:
+                best[index] = best[candidate] + each_span["duration"]
+                previous[index] = candidate
+    if not ordered:
+        return []
+    index = best.index(max(best))
+    path = []
+    while index is not None:
+        path.append(ordered[index])
+        index = previous[index]
+    return path[::-1]
+
+
+def print_report(spans):
+    """ Print per phase share of wall clock time and the critical path. """
+    if not spans:
+        print("No spans recorded.")
+        return
+    run_start = min([each_span["start"] for each_span in spans])
+    wall_clock = max([each_span["end"] for each_span in spans]) - run_start
+    print("Run %s: %s spans, wall clock %.1fs" % (spans[0]["run_id"], len(spans), wall_clock))
+
+    phases = {}
+    for each_span in spans:
+        phase = phases.setdefault(each_span["phase"], {"count": 0, "duration": 0.0,
+                                                       "node_count": None})
+        phase["count"] += 1
+        phase["duration"] += each_span["duration"]
+        phase["node_count"] = each_span.get("node_count") or phase["node_count"]
+    print("\n%-32s %6s %6s %10s %7s" % ("phase", "spans", "nodes", "seconds", "share"))
+    for each_name, each_phase in sorted(phases.items(),
+                                        key=lambda each_item: -each_item[1]["duration"]):
+        print("%-32s %6s %6s %10.1f %6.1f%%" % (
+            each_name, each_phase["count"],
+            each_phase["node_count"] if each_phase["node_count"] is not None else "-",
+            each_phase["duration"], 100 * each_phase["duration"] / max(wall_clock, 0.001)))
+
+    print("\nCritical path:")
+    traced = 0.0
+    for each_span in get_critical_path(spans):
+        traced += each_span["duration"]
+        print("  +%8.1fs %-32s %10.1fs %6.1f%%" % (
+            each_span["start"] - run_start, each_span["phase"], each_span["duration"],
+            100 * each_span["duration"] / max(wall_clock, 0.001)))
+    print("  untraced (terraform, gaps) %8.1fs %6.1f%%" % (
+        max(wall_clock - traced, 0), 100 * max(wall_clock - traced, 0) / max(wall_clock, 0.001)))
+
+
+if __name__ == "__main__":
+    PARSER = argparse.ArgumentParser(description='Record and report deployment phase timings.')
+    SUBPARSERS = PARSER.add_subparsers(dest='action', required=True)
+    RUN_PARSER = SUBPARSERS.add_parser('run', help='Run a command and record it as a phase')
+    RUN_PARSER.add_argument('--phase', required=True,
+                            help='Phase name (Ex: ansible_compute, wait_for_gui)')
+    RUN_PARSER.add_argument('--node_count', type=int,
+                            help='Number of nodes the phase works on')
+    RUN_PARSER.add_argument('command', nargs=argparse.REMAINDER,
+                            help='Command to run, after --')
+    REPORT_PARSER = SUBPARSERS.add_parser('report', help='Print phase shares and critical path')
+    REPORT_PARSER.add_argument('--trace_file', default=os.environ.get(TRACE_FILE_ENV),
+                               help='Trace file path (default: $%s)' % TRACE_FILE_ENV)
+    REPORT_PARSER.add_argument('--run_id',
+                               help='Run to report (default: most recent)')
+    ARGUMENTS = PARSER.parse_args()
+
+    if ARGUMENTS.action == 'run':
+        COMMAND = ARGUMENTS.command[1:] if ARGUMENTS.command[:1] == ["--"] else ARGUMENTS.command
+        if not COMMAND:
+            print("No command given.")
+            sys.exit(1)
+        SPAN = start_span(ARGUMENTS.phase)
+        RETURN_CODE = subprocess.call(COMMAND)
+        end_span(SPAN, ARGUMENTS.node_count, "ok" if RETURN_CODE == 0 else "failed")
+        sys.exit(RETURN_CODE)
+    else:
+        if not ARGUMENTS.trace_file:
+            print("--trace_file or %s is required." % TRACE_FILE_ENV)
+            sys.exit(1)
+        print_report(load_spans(ARGUMENTS.trace_file, ARGUMENTS.run_id))
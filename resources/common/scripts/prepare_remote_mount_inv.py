@@ -17,10 +17,11 @@ limitations under the License.
 """
 
 import argparse
-import configparser
+import deployment_trace
 import json
 import pathlib
 import os
+import re
 import sys
 
 
@@ -73,12 +74,12 @@ def prepare_remote_mount_playbook(hosts_config, mount_details):
     - scale_remotemount_storage_gui_username: {storage_gui_username}
     - scale_remotemount_storage_gui_password: {storage_gui_password}
     - scale_remotemount_storage_gui_hostname: {storage_gui_ip}
-    - scale_remotemount_filesystem_name:
-        - {{ scale_remotemount_client_filesystem_name: {compute_fs_name}, scale_remotemount_client_remotemount_path: {compute_fs_mount_path}, scale_remotemount_storage_filesystem_name: {storage_fs_name} }}
+{contact_nodes}    - scale_remotemount_filesystem_name:
+{filesystems}
   pre_tasks:
   roles:
     - remotemount_configure
-""".format(
+{contact_nodes_task}""".format(
         hosts_config=hosts_config,
         compute_gui_username=mount_details["compute_gui_username"],
         compute_gui_password=mount_details["compute_gui_password"],
@@ -87,13 +88,249 @@ def prepare_remote_mount_playbook(hosts_config, mount_details):
         storage_gui_username=mount_details["storage_gui_username"],
         storage_gui_password=mount_details["storage_gui_password"],
         storage_gui_ip=mount_details["storage_gui_ip"],
-        compute_fs_mount_path=mount_details["compute_fs_mnt"],
-        compute_fs_name=mount_details["compute_fs_name"],
-        storage_fs_name=mount_details["storage_fs_name"],
+        contact_nodes="    - scale_remotemount_storage_contactnodes: [%s]\n"
+        % ", ".join(mount_details["contact_nodes"])
+        if mount_details.get("contact_nodes")
+        else "",
+        contact_nodes_task="""  post_tasks:
+    - name: Set storage cluster contact nodes
+      command: /usr/lpp/mmfs/bin/mmremotecluster update %s -n {{ scale_remotemount_storage_contactnodes | join(',') }}
+"""
+        % mount_details["storage_cluster_name"]
+        if mount_details.get("contact_nodes")
+        else "",
+        filesystems="\n".join(
+            [
+                "        - { scale_remotemount_client_filesystem_name: %s, scale_remotemount_client_remotemount_path: %s, scale_remotemount_storage_filesystem_name: %s }"
+                % (
+                    each_fs["compute_fs_name"],
+                    each_fs["compute_fs_mnt"],
+                    each_fs["storage_fs_name"],
+                )
+                for each_fs in mount_details["filesystems"]
+            ]
+        ),
     )
     return content
 
 
+def prepare_parallel_runner(pair_names, max_parallel):
+    """Shell script running the remote mount playbooks with bounded parallelism"""
+    content = """#!/bin/bash
+# Run remote mount playbooks, at most {max_parallel} at a time.
+# Each pair logs to remote_mount_<pair>.log, exit status is non zero if any failed.
+cd "$(dirname "$0")"
+printf '%s\\n' {pair_names} | xargs -P {max_parallel} -I {{}} \\
+    sh -c 'ansible-playbook -i remote_mount_{{}}_inventory.ini remote_mount_{{}}_cloud_playbook.yaml > remote_mount_{{}}.log 2>&1 && echo "{{}}: done" || {{ echo "{{}}: failed"; exit 1; }}'
+""".format(
+        pair_names=" ".join(pair_names), max_parallel=max_parallel
+    )
+    return content
+
+
+def get_volume_details(disk_mapping):
+    """Normalize volume mapping entries to device/size dicts.
+    :args: disk_mapping (dict) of ip to list of device paths, or of
+           {"device": <path>, "size": <bytes>} entries
+    """
+    volume_details = {}
+    for each_ip, disk_per_ip in disk_mapping.items():
+        volume_details[each_ip] = []
+        for each_disk in disk_per_ip:
+            if isinstance(each_disk, dict):
+                volume_details[each_ip].append(
+                    {"device": each_disk["device"], "size": int(each_disk.get("size", 0))}
+                )
+            else:
+                volume_details[each_ip].append({"device": each_disk, "size": 0})
+    return volume_details
+
+
+def get_balanced_failure_groups(storage_ips, volume_details, shared_disk_mapping):
+    """Split storage nodes into two failure groups of balanced capacity.
+    :args: storage_ips (list), volume_details (dict), shared_disk_mapping (dict)
+    Same split as the inventory generators, see prepare_scale_inv_ini.py.
+    """
+    server_sizes = dict(
+        [
+            (
+                each_ip,
+                (
+                    sum([each_disk["size"] for each_disk in volume_details.get(each_ip, [])]),
+                    len(volume_details.get(each_ip, [])),
+                ),
+            )
+            for each_ip in storage_ips
+        ]
+    )
+    for each_volume in shared_disk_mapping.values():
+        share = 1.0 / len(each_volume["servers"])
+        for each_ip in each_volume["servers"]:
+            capacity, disk_count = server_sizes[each_ip]
+            server_sizes[each_ip] = (
+                capacity + int(each_volume.get("size", 0)) * share,
+                disk_count + share,
+            )
+    if not any([capacity for capacity, _ in server_sizes.values()]):
+        mid_index = len(storage_ips) // 2
+        return storage_ips[:mid_index], storage_ips[mid_index:]
+
+    group_members, group_load = [[], []], [(0, 0, 0), (0, 0, 0)]
+    for each_ip in sorted(
+        storage_ips, key=lambda each_ip: server_sizes[each_ip], reverse=True
+    ):
+        idx = group_load.index(min(group_load))
+        capacity, disk_count, server_count = group_load[idx]
+        group_load[idx] = (
+            capacity + server_sizes[each_ip][0],
+            disk_count + server_sizes[each_ip][1],
+            server_count + 1,
+        )
+        group_members[idx].append(each_ip)
+
+    return (
+        [each_ip for each_ip in storage_ips if each_ip in group_members[0]],
+        [each_ip for each_ip in storage_ips if each_ip in group_members[1]],
+    )
+
+
+def get_failure_group_map(strg_tf):
+    """Failure group of each storage cluster node, as the inventory generators
+    assign them: two groups of NSD servers and the tiebreaker node in group 3.
+    :args: strg_tf (dict)
+    """
+    disk_mapping = strg_tf.get("storage_cluster_with_data_volume_mapping", {})
+    shared_disk_mapping = strg_tf.get("storage_cluster_shared_data_volume_mapping", {})
+    storage_ips = list(disk_mapping)
+    for each_volume in shared_disk_mapping.values():
+        storage_ips.extend(
+            [each_ip for each_ip in each_volume["servers"] if each_ip not in storage_ips]
+        )
+
+    failure_group1, failure_group2 = [], []
+    if len(strg_tf.get("vpc_availability_zones", [])) == 1:
+        failure_group1, failure_group2 = get_balanced_failure_groups(
+            storage_ips, get_volume_details(disk_mapping), shared_disk_mapping
+        )
+    elif storage_ips:
+        subnet_pattern = re.compile(r"\d{1,3}\.\d{1,3}\.(\d{1,3})\.\d{1,3}")
+        subnet1A = subnet_pattern.findall(storage_ips[0])
+        for each_ip in storage_ips:
+            if subnet_pattern.findall(each_ip)[0] == subnet1A[0]:
+                failure_group1.append(each_ip)
+            else:
+                failure_group2.append(each_ip)
+
+    failure_group_map = dict(
+        [(each_ip, 1) for each_ip in failure_group1]
+        + [(each_ip, 2) for each_ip in failure_group2]
+    )
+    for each_ip in strg_tf.get("storage_cluster_desc_data_volume_mapping", {}):
+        failure_group_map[each_ip] = 3
+    return failure_group_map
+
+
+def get_contact_nodes(strg_tf, storage_gui_ip, contact_node_count):
+    """Contact nodes of the storage cluster for the remote cluster definition.
+    :args: strg_tf (dict), storage_gui_ip (string), contact_node_count (int)
+    Nodes are taken round-robin across failure groups. Within a failure
+    group nodes serving fewer data volumes come first, so busy NSD servers
+    and the GUI node are used only when needed.
+    """
+    volume_counts = dict(
+        [
+            (each_ip, len(each_volumes))
+            for each_ip, each_volumes in strg_tf.get(
+                "storage_cluster_with_data_volume_mapping", {}
+            ).items()
+        ]
+    )
+    failure_group_map = get_failure_group_map(strg_tf)
+    candidates = strg_tf["storage_cluster_instance_private_ips"] + strg_tf.get(
+        "storage_cluster_desc_instance_private_ips", []
+    )
+    failure_groups = {}
+    for each_ip in sorted(
+        candidates,
+        key=lambda each_ip: (
+            each_ip == storage_gui_ip,
+            volume_counts.get(each_ip, 0),
+        ),
+    ):
+        # Nodes without disks are in no failure group, taken after the groups
+        failure_groups.setdefault(failure_group_map.get(each_ip, 0), []).append(
+            each_ip
+        )
+
+    contact_nodes = []
+    max_len = max(
+        [len(each_group) for each_group in failure_groups.values()], default=0
+    )
+    for index in range(max_len):
+        for _, each_group in sorted(
+            failure_groups.items(), key=lambda each_item: each_item[0] or 4
+        ):
+            if index < len(each_group):
+                contact_nodes.append(each_group[index])
+    return contact_nodes[:contact_node_count]
+
+
+def get_storage_cluster_name(strg_tf):
+    """Storage cluster name, as given by the inventory generators"""
+    if strg_tf.get("resource_prefix"):
+        return strg_tf["resource_prefix"]
+    return "%s.%s" % ("spectrum-scale", "storage")
+
+
+def get_remote_mount_details(pair, arguments):
+    """Remote mount details of one compute/storage cluster pair.
+    :args: pair (dict) with the inventory paths, optional "filesystems" list of
+           {"storage_fs_name", "compute_fs_name", "compute_fs_mnt"} and optional
+           GUI credential overrides, arguments (argparse.Namespace)
+    """
+    comp_tf = read_json_file(pair["compute_tf_inv_path"])
+    strg_tf = read_json_file(pair["storage_tf_inv_path"])
+    comp_gui = read_json_file(pair["compute_gui_inv_path"])
+    strg_gui = read_json_file(pair["storage_gui_inv_path"])
+    if arguments.verbose:
+        print("Parsed compute terraform output: %s" % json.dumps(comp_tf, indent=4))
+        print("Parsed storage terraform output: %s" % json.dumps(strg_tf, indent=4))
+
+    remote_mount = {}
+    remote_mount["compute_gui_ip"] = comp_gui["compute_cluster_gui_ip_address"]
+    remote_mount["compute_gui_username"] = pair.get(
+        "compute_cluster_gui_username", arguments.compute_cluster_gui_username
+    )
+    remote_mount["compute_gui_password"] = pair.get(
+        "compute_cluster_gui_password", arguments.compute_cluster_gui_password
+    )
+    remote_mount["storage_gui_ip"] = strg_gui["storage_cluster_gui_ip_address"]
+    remote_mount["storage_cluster_name"] = get_storage_cluster_name(strg_tf)
+    remote_mount["contact_nodes"] = get_contact_nodes(
+        strg_tf,
+        remote_mount["storage_gui_ip"],
+        pair.get("contact_node_count", arguments.contact_node_count),
+    )
+    remote_mount["storage_gui_username"] = pair.get(
+        "storage_cluster_gui_username", arguments.storage_cluster_gui_username
+    )
+    remote_mount["storage_gui_password"] = pair.get(
+        "storage_cluster_gui_password", arguments.storage_cluster_gui_password
+    )
+    remote_mount["filesystems"] = pair.get("filesystems") or [
+        {
+            "compute_fs_mnt": comp_tf["compute_cluster_filesystem_mountpoint"],
+            "compute_fs_name": str(
+                pathlib.PurePath(comp_tf["compute_cluster_filesystem_mountpoint"]).stem
+            ),
+            "storage_fs_name": str(
+                pathlib.PurePath(strg_tf["storage_cluster_filesystem_mountpoint"]).stem
+            ),
+        }
+    ]
+    return remote_mount
+
+
 def get_host_format(node):
     """Return host entries"""
     host_format = f"{node['ip_addr']} scale_cluster_quorum={node['is_quorum']} scale_cluster_manager={node['is_manager']} scale_cluster_gui={node['is_gui']} scale_zimon_collector={node['is_collector']} is_nsd_server={node['is_nsd']} is_admin_node={node['is_admin']} ansible_user={node['user']} ansible_ssh_private_key_file={node['key_file']} ansible_python_interpreter=/usr/bin/python3 scale_nodeclass={node['class']}"
@@ -128,22 +365,18 @@ if __name__ == "__main__":
     )
     PARSER.add_argument(
         "--compute_tf_inv_path",
-        required=True,
         help="Compute cluster terraform inventory file path",
     )
     PARSER.add_argument(
         "--compute_gui_inv_path",
-        required=True,
         help="Compute cluster gui inventory file path",
     )
     PARSER.add_argument(
         "--storage_tf_inv_path",
-        required=True,
         help="Storage cluster terraform inventory file path",
     )
     PARSER.add_argument(
         "--storage_gui_inv_path",
-        required=True,
         help="Storage cluster gui inventory file path",
     )
     PARSER.add_argument(
@@ -183,80 +416,130 @@ if __name__ == "__main__":
         required=True,
         help="Spectrum Scale storage cluster GUI password",
     )
+    PARSER.add_argument(
+        "--remote_mount_config",
+        help="JSON file listing compute/storage cluster pairs (inventory paths, "
+        "optional name, filesystems and GUI credentials) to configure in one run",
+    )
+    PARSER.add_argument(
+        "--contact_node_count",
+        type=int,
+        default=0,
+        help="Storage cluster contact nodes set on the remote cluster definition "
+        "after the remote mount (default: 0, keep the nodes the role added)",
+    )
+    PARSER.add_argument(
+        "--max_parallel",
+        type=int,
+        default=4,
+        help="Max remote mount playbooks run concurrently",
+    )
+    PARSER.add_argument(
+        "--profile",
+        action="store_true",
+        help="Write cProfile, tracemalloc and per phase timings next to the inventory",
+    )
     PARSER.add_argument("--verbose", action="store_true",
                         help="print log messages")
     ARGUMENTS = PARSER.parse_args()
+    TRACE_SPAN = deployment_trace.start_span("inventory_remote_mount")
+    PROFILE = deployment_trace.start_profile(ARGUMENTS.profile)
 
-    # Step-1: Read the inventory file
-    COMP_TF = read_json_file(ARGUMENTS.compute_tf_inv_path)
-    if ARGUMENTS.verbose:
-        print("Parsed compute terraform output: %s" %
-              json.dumps(COMP_TF, indent=4))
-    STRG_TF = read_json_file(ARGUMENTS.storage_tf_inv_path)
-    if ARGUMENTS.verbose:
-        print("Parsed storage terraform output: %s" %
-              json.dumps(STRG_TF, indent=4))
-
-    # Step-2: Read the GUI inventory file
-    COMP_GUI = read_json_file(ARGUMENTS.compute_gui_inv_path)
-    if ARGUMENTS.verbose:
-        print("Parsed compute terraform output: %s" %
-              json.dumps(COMP_GUI, indent=4))
-    STRG_GUI = read_json_file(ARGUMENTS.storage_gui_inv_path)
-    if ARGUMENTS.verbose:
-        print("Parsed storage terraform output: %s" %
-              json.dumps(STRG_GUI, indent=4))
-
-    # Step-3: Create playbook
-    remote_mount = {}
-    remote_mount["compute_gui_ip"] = COMP_GUI["compute_cluster_gui_ip_address"]
-    remote_mount["compute_gui_username"] = ARGUMENTS.compute_cluster_gui_username
-    remote_mount["compute_gui_password"] = ARGUMENTS.compute_cluster_gui_password
-    remote_mount["compute_fs_mnt"] = COMP_TF["compute_cluster_filesystem_mountpoint"]
-    remote_mount["compute_fs_name"] = str(
-        pathlib.PurePath(COMP_TF["compute_cluster_filesystem_mountpoint"]).stem
-    )
-    remote_mount["storage_gui_ip"] = STRG_GUI["storage_cluster_gui_ip_address"]
-    remote_mount["storage_gui_username"] = ARGUMENTS.storage_cluster_gui_username
-    remote_mount["storage_gui_password"] = ARGUMENTS.storage_cluster_gui_password
-    remote_mount["storage_fs_name"] = str(
-        pathlib.PurePath(STRG_TF["storage_cluster_filesystem_mountpoint"]).stem
-    )
+    # Step-1: Collect compute/storage cluster pairs
+    deployment_trace.mark_phase(PROFILE, "parse")
+    if ARGUMENTS.remote_mount_config:
+        PAIRS = read_json_file(ARGUMENTS.remote_mount_config)
+        for index, each_pair in enumerate(PAIRS):
+            each_pair.setdefault("name", "pair%s" % (index + 1))
+            if not re.match(r"^[A-Za-z0-9_-]+$", each_pair["name"]):
+                print("Invalid remote mount pair name: %s" % each_pair["name"])
+                sys.exit(1)
+    elif None in [
+        ARGUMENTS.compute_tf_inv_path,
+        ARGUMENTS.compute_gui_inv_path,
+        ARGUMENTS.storage_tf_inv_path,
+        ARGUMENTS.storage_gui_inv_path,
+    ]:
+        print(
+            "Either --remote_mount_config or all of the compute/storage "
+            "terraform and gui inventory paths are required."
+        )
+        sys.exit(1)
+    else:
+        PAIRS = [
+            {
+                "name": None,
+                "compute_tf_inv_path": ARGUMENTS.compute_tf_inv_path,
+                "compute_gui_inv_path": ARGUMENTS.compute_gui_inv_path,
+                "storage_tf_inv_path": ARGUMENTS.storage_tf_inv_path,
+                "storage_gui_inv_path": ARGUMENTS.storage_gui_inv_path,
+            }
+        ]
 
-    playbook_content = prepare_remote_mount_playbook(
-        "scale_nodes", remote_mount)
-    write_to_file(
-        "%s/%s/remote_mount_cloud_playbook.yaml"
-        % (ARGUMENTS.install_infra_path, "ibm-spectrum-scale-install-infra"),
-        playbook_content,
-    )
+    for each_pair in PAIRS:
+        # Step-2: Read the terraform and GUI inventory files
+        deployment_trace.mark_phase(PROFILE, "role_assignment")
+        remote_mount = get_remote_mount_details(each_pair, ARGUMENTS)
+        file_prefix = "remote_mount"
+        if each_pair["name"]:
+            file_prefix = "remote_mount_%s" % each_pair["name"]
 
-    # Step-4: Create hosts
-    config = configparser.ConfigParser(allow_no_value=True)
-    node_details = initialize_node_details(
-        COMP_GUI["compute_cluster_gui_ip_address"],
-        "root",
-        ARGUMENTS.instance_private_key,
-    )
-    node_template = ""
-    for each_entry in node_details:
-        if ARGUMENTS.bastion_ssh_private_key is None:
-            node_template = node_template + each_entry + "\n"
-        else:
-            proxy_command = f"ssh -p 22 -o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null -W %h:%p {ARGUMENTS.bastion_user}@{ARGUMENTS.bastion_ip} -i {ARGUMENTS.bastion_ssh_private_key}"
-            each_entry = (
-                each_entry
-                + " "
-                + "ansible_ssh_common_args='-o ControlMaster=auto -o ControlPersist=30m -o UserKnownHostsFile=/dev/null -o StrictHostKeyChecking=no -o ProxyCommand=\""
-                + proxy_command
-                + "\"'"
-            )
-            node_template = node_template + each_entry + "\n"
-
-    with open(
-        "%s/%s/remote_mount_inventory.ini"
-        % (ARGUMENTS.install_infra_path, "ibm-spectrum-scale-install-infra"),
-        "w",
-    ) as configfile:
-        configfile.write("[scale_nodes]" + "\n")
-        configfile.write(node_template)
+        # Step-3: Create playbook
+        deployment_trace.mark_phase(PROFILE, "write")
+        playbook_content = prepare_remote_mount_playbook(
+            "scale_nodes", remote_mount)
+        write_to_file(
+            "%s/%s/%s_cloud_playbook.yaml"
+            % (ARGUMENTS.install_infra_path, "ibm-spectrum-scale-install-infra",
+               file_prefix),
+            playbook_content,
+        )
+
+        # Step-4: Create hosts
+        node_details = initialize_node_details(
+            remote_mount["compute_gui_ip"],
+            "root",
+            ARGUMENTS.instance_private_key,
+        )
+        node_template = ""
+        for each_entry in node_details:
+            if ARGUMENTS.bastion_ssh_private_key is None:
+                node_template = node_template + each_entry + "\n"
+            else:
+                proxy_command = f"ssh -p 22 -o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null -W %h:%p {ARGUMENTS.bastion_user}@{ARGUMENTS.bastion_ip} -i {ARGUMENTS.bastion_ssh_private_key}"
+                each_entry = (
+                    each_entry
+                    + " "
+                    + "ansible_ssh_common_args='-o ControlMaster=auto -o ControlPersist=30m -o UserKnownHostsFile=/dev/null -o StrictHostKeyChecking=no -o ProxyCommand=\""
+                    + proxy_command
+                    + "\"'"
+                )
+                node_template = node_template + each_entry + "\n"
+
+        with open(
+            "%s/%s/%s_inventory.ini"
+            % (ARGUMENTS.install_infra_path, "ibm-spectrum-scale-install-infra",
+               file_prefix),
+            "w",
+        ) as configfile:
+            configfile.write("[scale_nodes]" + "\n")
+            configfile.write(node_template)
+
+    # Step-5: Runner executing all pairs concurrently
+    if ARGUMENTS.remote_mount_config:
+        runner_path = "%s/%s/remote_mount_run_all.sh" % (
+            ARGUMENTS.install_infra_path,
+            "ibm-spectrum-scale-install-infra",
+        )
+        write_to_file(
+            runner_path,
+            prepare_parallel_runner(
+                [each_pair["name"] for each_pair in PAIRS], ARGUMENTS.max_parallel
+            ),
+        )
+        os.chmod(runner_path, 0o755)
+        print("Remote mount runner for %s pairs written to: %s" % (len(PAIRS), runner_path))
+
+    deployment_trace.write_profile(PROFILE, "%s/%s/remote_mount_inventory_profile" % (
+        ARGUMENTS.install_infra_path, "ibm-spectrum-scale-install-infra"))
+    deployment_trace.end_span(TRACE_SPAN, len(PAIRS))
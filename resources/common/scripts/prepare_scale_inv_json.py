@@ -17,6 +17,7 @@ limitations under the License.
 """
 
 import argparse
+import deployment_trace
 import json
 import pathlib
 import re
@@ -31,6 +32,51 @@ CLUSTER_DEFINITION_JSON = {"scale_cluster": {},
                            "node_details": [],
                            "scale_config": []}
 
+# Mounting nodes a token manager is sized for, per GB of instance memory
+TOKEN_MANAGER_NODES_PER_GB = 8
+MIN_MANAGER_COUNT = 2
+MAX_MANAGER_COUNT = 32
+
+# Filesystem workload: (block size, metadata block size, average file size KiB)
+FILESYSTEM_WORKLOAD_PROFILES = {"large_sequential": ("16M", "1M", 65536),
+                                "mixed": ("4M", "1M", 1024),
+                                "small_files": ("1M", "256K", 64)}
+DEFAULT_ESTIMATED_NODE_COUNT = 32
+MIN_INODE_LIMIT = 100000
+# Max data and metadata replicas planned for a filesystem
+MAX_REPLICAS = 2
+
+# Local read-only cache, enabled on the nodes with LROC disks once their NSDs exist
+LROC_CONFIG_PARAMS = [{"lrocData": "yes"}, {"lrocDirectories": "yes"},
+                      {"lrocInodes": "yes"}]
+
+# Instance-store disks do not come back after host loss, start restripe early
+EPHEMERAL_CONFIG_PARAMS = [{"restripeOnDiskFailure": "yes"},
+                           {"minDiskWaitTimeForRecovery": 60},
+                           {"dataDiskWaitTimeForRecovery": 300},
+                           {"metadataDiskWaitTimeForRecovery": 60}]
+
+# Instance types with RDMA capable NICs, as (instance type pattern, fabric).
+# The TF inventory "instance_type_fabric_map" overrides or extends these.
+FABRIC_INSTANCE_TYPE_PATTERNS = [(r'^(p4d|p4de|p5|hpc6a|hpc6id|hpc7a|hpc7g|trn1)\.', "efa"),
+                                 (r'^(c5n|c6gn|c6in|m6in|r6in)\.(16xlarge|18xlarge|32xlarge|metal)$', "efa"),
+                                 (r'^standard_(hb|hc|hx|nd)\d+[a-z]*r', "infiniband")]
+FABRIC_DEFAULT_VERBS_PORTS = {"efa": "efa_0/1", "infiniband": "mlx5_0/1"}
+FABRIC_SOCKET_BUFFER_SIZE = 4194304
+
+# Federated performance monitoring collectors, one per COLLECTOR_NODE_COUNT nodes
+COLLECTOR_NODE_COUNT = 128
+MIN_COLLECTOR_COUNT = 2
+MAX_COLLECTOR_COUNT = 6
+# Sensor periods (seconds) stretched by one step per SENSOR_PERIOD_NODE_COUNT nodes
+SENSOR_PERIOD_NODE_COUNT = 64
+MAX_SENSOR_PERIOD_FACTOR = 10
+ZIMON_SENSOR_PERIODS = {"CPU": 1, "Load": 1, "Memory": 1, "Network": 1,
+                        "Netstat": 10, "Diskstat": 10, "DiskFree": 600,
+                        "GPFSFilesystem": 10, "GPFSFilesystemAPI": 10,
+                        "GPFSNSDDisk": 10, "GPFSNSDFS": 10, "GPFSPoolIO": 10,
+                        "GPFSVFS": 10, "GPFSDiskCap": 86400, "GPFSFilesetQuota": 3600}
+
 
 def read_json_file(json_path):
     """ Read inventory as json file """
@@ -107,6 +153,18 @@ def initialize_scale_config_details(node_class, param_key, param_value):
                                                     "params": [{param_key: param_value}]})
 
 
+def add_scale_config_params(node_class, params):
+    """ Add params to an existing node class config, or create one.
+    :args: node_class (string), params (list)
+    """
+    for each_config in CLUSTER_DEFINITION_JSON['scale_config']:
+        if each_config['nodeclass'] == node_class:
+            each_config['params'].extend(params)
+            return
+    CLUSTER_DEFINITION_JSON['scale_config'].append({"nodeclass": node_class,
+                                                    "params": list(params)})
+
+
 def set_node_details(fqdn, ip_address, ansible_ssh_private_key_file,
                      node_class, user, is_quorum_node=False,
                      is_manager_node=False, is_gui_server=False,
@@ -149,271 +207,186 @@ def set_node_details(fqdn, ip_address, ansible_ssh_private_key_file,
     })
 
 
+def calculate_manager_count(total_node_count, client_node_count, memory_size):
+    """ Calculate size of the manager (filesystem/token manager) pool.
+    :args: total_node_count (int), client_node_count (int), memory_size (string)
+    """
+    # Token state held by a manager grows with the number of nodes mounting
+    # the filesystem, and the memory available to hold it with instance size.
+    mem_size_gb = int(int(memory_size) * 1.048576 * 0.001) if memory_size else 0
+    nodes_per_manager = max(mem_size_gb * TOKEN_MANAGER_NODES_PER_GB,
+                            TOKEN_MANAGER_NODES_PER_GB)
+    mounting_node_count = total_node_count + client_node_count
+    manager_count = -(-mounting_node_count // nodes_per_manager)
+    return min(max(manager_count, MIN_MANAGER_COUNT), MAX_MANAGER_COUNT)
+
+
+def get_failure_domain_ordered(private_ips):
+    """ Order ips round-robin across subnets (one subnet per AZ). """
+    failure_domains = {}
+    subnet_pattern = re.compile(r'\d{1,3}\.\d{1,3}\.(\d{1,3})\.\d{1,3}')
+    for each_ip in private_ips:
+        failure_domains.setdefault(
+            subnet_pattern.findall(each_ip)[0], []).append(each_ip)
+
+    ordered_ips = []
+    max_len = max([len(each_group) for each_group in failure_domains.values()],
+                  default=0)
+    for idx in range(max_len):
+        for each_group in failure_domains.values():
+            if idx < len(each_group):
+                ordered_ips.append(each_group[idx])
+    return ordered_ips
+
+
+def get_manager_nodes(candidate_ips, manager_count, avoid_ips):
+    """ Select manager nodes spread across failure domains.
+    :args: candidate_ips (list), manager_count (int), avoid_ips (list)
+    Nodes in avoid_ips (GUI/collector) are used only when there are not
+    enough other candidates, earliest entries first.
+    """
+    ordered_ips = get_failure_domain_ordered(candidate_ips)
+    preferred = [each_ip for each_ip in ordered_ips if each_ip not in avoid_ips]
+    fallback = [each_ip for each_ip in avoid_ips if each_ip in ordered_ips]
+    return (preferred + fallback)[:manager_count]
+
+
+def calculate_collector_count(node_count):
+    """ Size of the federated collector set for the given node count. """
+    collector_count = -(-node_count // COLLECTOR_NODE_COUNT)
+    return min(max(collector_count, MIN_COLLECTOR_COUNT), MAX_COLLECTOR_COUNT, node_count)
+
+
+def get_collector_nodes(nodes, gui_ips, collector_count):
+    """ Select collector nodes, GUI nodes first and then the least loaded nodes.
+    :args: nodes (list) of (ip, roles) tuples, roles being a tuple of role
+           flags ordered by cost (Ex: (is_nsd, is_manager, is_quorum)),
+           gui_ips (list), collector_count (int)
+    Nodes with the same roles are taken round-robin across failure domains.
+    """
+    node_roles = dict(nodes)
+    candidates = sorted([each_ip for each_ip in get_failure_domain_ordered(list(node_roles))
+                         if each_ip not in gui_ips],
+                        key=lambda each_ip: node_roles[each_ip])
+    return (list(gui_ips) + candidates)[:collector_count]
+
+
+def get_role_placement(nodes, gui_hosts, admin_hosts):
+    """ Place GUI and admin roles off the NSD servers where possible.
+    :args: nodes (list) of (ip, is_nsd_server) tuples, gui_hosts (list),
+           admin_hosts (list)
+    Explicit hosts win. Otherwise the first non NSD server takes both roles.
+    :return: (gui ips, admin ips), empty when no node qualifies
+    """
+    node_roles = dict(nodes)
+    for each_host in gui_hosts + admin_hosts:
+        if each_host not in node_roles:
+            print("Role host %s is not a node of this cluster." % each_host)
+            sys.exit(1)
+
+    non_nsd_ips = [each_ip for each_ip in get_failure_domain_ordered(list(node_roles))
+                   if not node_roles[each_ip]]
+    gui_ips = gui_hosts or non_nsd_ips[:1]
+    admin_ips = admin_hosts or gui_ips
+    return gui_ips, admin_ips
+
+
+def report_role_separation(nodes):
+    """ Warn about NSD servers holding management roles that could move.
+    :args: nodes (list) of (ip, is_nsd_server, roles) tuples, roles being
+           the names of the management roles held
+    """
+    if all([is_nsd_server for _, is_nsd_server, _ in nodes]):
+        return
+    for each_ip, is_nsd_server, roles in nodes:
+        if is_nsd_server and roles:
+            print("Warning: NSD server %s also holds %s role(s)." % (each_ip, ", ".join(roles)))
+
+
+def get_zimon_sensors(node_count, nsd_nodeclasses, cluster_sensor_node):
+    """ Sensor periods and filters scaled to the cluster size.
+    :args: node_count (int), nsd_nodeclasses (list) node classes of the NSD
+           servers, cluster_sensor_node (string)
+    Per node sensors are sampled less often as the cluster grows, so the
+    data points sent to the collectors stay bounded. Cluster wide sensors
+    run on a single node.
+    """
+    period_factor = min(-(-node_count // SENSOR_PERIOD_NODE_COUNT), MAX_SENSOR_PERIOD_FACTOR)
+    sensors = []
+    for each_name, each_period in sorted(ZIMON_SENSOR_PERIODS.items()):
+        sensor = {"name": each_name, "period": each_period}
+        if each_name in ["GPFSDiskCap", "GPFSFilesetQuota"]:
+            sensor["restrict"] = cluster_sensor_node
+        else:
+            sensor["period"] = each_period * max(period_factor, 1)
+        if each_name == "Network":
+            sensor["filter"] = "netdev_name=veth.*|docker.*|flannel.*|cali.*|cbr.*"
+        if each_name == "GPFSNSDDisk" and nsd_nodeclasses:
+            sensor["restrict"] = ",".join(nsd_nodeclasses)
+        sensors.append(sensor)
+    return sensors
+
+
 def initialize_node_details(az_count, cls_type,
                             compute_private_ips, compute_dns_map,
                             storage_private_ips, storage_dns_map,
                             desc_private_ips, desc_dns_map,
-                            quorum_count, user, key_file):
+                            quorum_count, manager_counts, user, key_file):
     """ Initialize node details for cluster definition.
     :args: az_count (int), cls_type (string), compute_private_ips (list),
            storage_private_ips (list), desc_private_ips (list),
-           quorum_count (int), user (string), key_file (string)
+           quorum_count (int), manager_counts (dict), user (string),
+           key_file (string)
     """
-    node_details, node = [], {}
     if cls_type == 'compute':
         start_quorum_assign = quorum_count - 1
 
-        compute_instances = []
         if az_count > 1:
-            failure_group1, temp_group, failure_group2, failure_group3 = [], [], [], []
-            subnet_pattern = re.compile(
-                r'\d{1,3}\.\d{1,3}\.(\d{1,3})\.\d{1,3}')
-            subnet1A = subnet_pattern.findall(compute_private_ips[0])
-            for each_ip in compute_private_ips:
-                current_subnet = subnet_pattern.findall(each_ip)
-                if current_subnet[0] == subnet1A[0]:
-                    failure_group1.append(each_ip)
-                else:
-                    temp_group.append(each_ip)
-
-            subnet1A = subnet_pattern.findall(temp_group[0])
-            for each_ip in temp_group:
-                current_subnet = subnet_pattern.findall(each_ip)
-                if current_subnet[0] == subnet1A[0]:
-                    failure_group2.append(each_ip)
-                else:
-                    failure_group3.append(each_ip)
-
-            max_len = max(len(failure_group1), len(
-                failure_group2), len(failure_group3))
-            idx = 0
-            while idx < max_len:
-                if idx < len(failure_group1):
-                    compute_instances.append(failure_group1[idx])
-
-                if idx < len(failure_group2):
-                    compute_instances.append(failure_group2[idx])
-
-                if idx < len(failure_group3):
-                    compute_instances.append(failure_group3[idx])
-
-                idx = idx + 1
+            compute_instances = get_failure_domain_ordered(compute_private_ips)
         else:
             compute_instances = compute_private_ips
 
-        for each_ip in compute_instances:
-
-            if compute_instances.index(each_ip) <= (start_quorum_assign) and \
-                    compute_instances.index(each_ip) <= (manager_count - 1):
-                if compute_instances.index(each_ip) == 0:
-
-                    # node = {'ip_addr': each_ip, 'is_quorum': True, 'is_manager': True,
-                    #         'is_gui': True, 'is_collector': True, 'is_nsd': False,
-                    #         'is_admin': True, 'user': user, 'key_file': key_file,
-                    #         'class': "computenodegrp"}
-
-                    set_node_details(each_ip,
-                                     each_ip,
-                                     key_file,
-                                     "computenodegrp",
-                                     user,
-                                     is_quorum_node=True,
-                                     is_manager_node=True,
-                                     is_gui_server=True,
-                                     is_collector_node=True,
-                                     is_nsd_server=False,
-                                     is_admin_node=True)
-
-                elif compute_instances.index(each_ip) == 1:
-
-                    # node = {'ip_addr': each_ip, 'is_quorum': True, 'is_manager': True,
-                    #         'is_gui': False, 'is_collector': True, 'is_nsd': False,
-                    #         'is_admin': False, 'user': user, 'key_file': key_file,
-                    #         'class': "computenodegrp"}
-
-                    set_node_details(each_ip,
-                                     each_ip,
-                                     key_file,
-                                     "computenodegrp",
-                                     user,
-                                     is_quorum_node=True,
-                                     is_manager_node=True,
-                                     is_gui_server=False,
-                                     is_collector_node=True,
-                                     is_nsd_server=False,
-                                     is_admin_node=False)
-
-                else:
+        # Keep managers off the GUI (index 0) and collector (index 1) nodes
+        manager_nodes = get_manager_nodes(compute_instances,
+                                          manager_counts.get("computenodegrp", 0),
+                                          compute_instances[:2][::-1])
 
-                    # node = {'ip_addr': each_ip, 'is_quorum': True, 'is_manager': True,
-                    #         'is_gui': False, 'is_collector': False, 'is_nsd': False,
-                    #         'is_admin': False, 'user': user, 'key_file': key_file,
-                    #         'class': "computenodegrp"}
-
-                    set_node_details(each_ip,
-                                     each_ip,
-                                     key_file,
-                                     "computenodegrp",
-                                     user,
-                                     is_quorum_node=True,
-                                     is_manager_node=True,
-                                     is_gui_server=False,
-                                     is_collector_node=False,
-                                     is_nsd_server=False,
-                                     is_admin_node=False)
-
-            elif compute_instances.index(each_ip) <= (start_quorum_assign) and \
-                    compute_instances.index(each_ip) > (manager_count - 1):
-
-                # node = {'ip_addr': each_ip, 'is_quorum': True, 'is_manager': False,
-                #         'is_gui': False, 'is_collector': False, 'is_nsd': False,
-                #         'is_admin': False, 'user': user, 'key_file': key_file,
-                #         'class': "computenodegrp"}
-
-                set_node_details(each_ip,
-                                 each_ip,
-                                 key_file,
-                                 "computenodegrp",
-                                 user,
-                                 is_quorum_node=True,
-                                 is_manager_node=False,
-                                 is_gui_server=False,
-                                 is_collector_node=False,
-                                 is_nsd_server=False,
-                                 is_admin_node=False)
-
-            else:
-
-                # node = {'ip_addr': each_ip, 'is_quorum': False, 'is_manager': False,
-                #         'is_gui': False, 'is_collector': False, 'is_nsd': False,
-                #         'is_admin': False, 'user': user, 'key_file': key_file,
-                #         'class': "computenodegrp"}
-
-                set_node_details(each_ip,
-                                 each_ip,
-                                 key_file,
-                                 "computenodegrp",
-                                 user,
-                                 is_quorum_node=False,
-                                 is_manager_node=False,
-                                 is_gui_server=False,
-                                 is_collector_node=False,
-                                 is_nsd_server=False,
-                                 is_admin_node=False)
+        for index, each_ip in enumerate(compute_instances):
+            set_node_details(each_ip,
+                             each_ip,
+                             key_file,
+                             "computenodegrp",
+                             user,
+                             is_quorum_node=index <= start_quorum_assign,
+                             is_manager_node=each_ip in manager_nodes,
+                             is_gui_server=index == 0,
+                             is_collector_node=index <= min(
+                                 1, start_quorum_assign),
+                             is_nsd_server=False,
+                             is_admin_node=index == 0)
 
     elif cls_type == 'storage' and az_count == 1:
         start_quorum_assign = quorum_count - 1
-        for each_ip in storage_private_ips:
-
-            if storage_private_ips.index(each_ip) <= (start_quorum_assign) and \
-                    storage_private_ips.index(each_ip) <= (manager_count - 1):
-                if storage_private_ips.index(each_ip) == 0:
-
-                    # node = {'ip_addr': each_ip, 'is_quorum': True, 'is_manager': True,
-                    #         'is_gui': True, 'is_collector': True, 'is_nsd': True,
-                    #         'is_admin': True, 'user': user, 'key_file': key_file,
-                    #         'class': "storagenodegrp"}
-                    # write_json_file({'storage_cluster_gui_ip_address': each_ip},
-                    #                 "%s/%s" % (str(pathlib.PurePath(ARGUMENTS.tf_inv_path).parent),
-                    #                           "storage_cluster_gui_details.json"))
-
-                    set_node_details(each_ip,
-                                     each_ip,
-                                     key_file,
-                                     "storagenodegrp",
-                                     user,
-                                     is_quorum_node=True,
-                                     is_manager_node=True,
-                                     is_gui_server=True,
-                                     is_collector_node=True,
-                                     is_nsd_server=True,
-                                     is_admin_node=True)
-
-                elif storage_private_ips.index(each_ip) == 1:
-
-                    # node = {'ip_addr': each_ip, 'is_quorum': True, 'is_manager': True,
-                    #         'is_gui': False, 'is_collector': True, 'is_nsd': True,
-                    #         'is_admin': False, 'user': user, 'key_file': key_file,
-                    #         'class': "storagenodegrp"}
-
-                    set_node_details(each_ip,
-                                     each_ip,
-                                     key_file,
-                                     "storagenodegrp",
-                                     user,
-                                     is_quorum_node=True,
-                                     is_manager_node=True,
-                                     is_gui_server=False,
-                                     is_collector_node=True,
-                                     is_nsd_server=True,
-                                     is_admin_node=False)
-
-                else:
-
-                    # node = {'ip_addr': each_ip, 'is_quorum': True, 'is_manager': False,
-                    #         'is_gui': False, 'is_collector': True, 'is_nsd': True,
-                    #         'is_admin': False, 'user': user, 'key_file': key_file,
-                    #         'class': "storagenodegrp"}
-
-                    set_node_details(each_ip,
-                                     each_ip,
-                                     key_file,
-                                     "storagenodegrp",
-                                     user,
-                                     is_quorum_node=True,
-                                     is_manager_node=False,
-                                     is_gui_server=False,
-                                     is_collector_node=True,
-                                     is_nsd_server=True,
-                                     is_admin_node=False)
-
-            elif storage_private_ips.index(each_ip) <= (start_quorum_assign) and \
-                    storage_private_ips.index(each_ip) > (manager_count - 1):
-
-                # node = {'ip_addr': each_ip, 'is_quorum': True, 'is_manager': False,
-                #         'is_gui': False, 'is_collector': False, 'is_nsd': True,
-                #         'is_admin': False, 'user': user, 'key_file': key_file,
-                #         'class': "storagenodegrp"}
-
-                set_node_details(each_ip,
-                                 each_ip,
-                                 key_file,
-                                 "storagenodegrp",
-                                 user,
-                                 is_quorum_node=True,
-                                 is_manager_node=False,
-                                 is_gui_server=False,
-                                 is_collector_node=False,
-                                 is_nsd_server=True,
-                                 is_admin_node=False)
-
-            else:
+        manager_nodes = get_manager_nodes(storage_private_ips,
+                                          manager_counts.get("storagenodegrp", 0),
+                                          storage_private_ips[:2][::-1])
 
-                # node = {'ip_addr': each_ip, 'is_quorum': False, 'is_manager': False,
-                #         'is_gui': False, 'is_collector': False, 'is_nsd': True,
-                #         'is_admin': False, 'user': user, 'key_file': key_file,
-                #         'class': "storagenodegrp"}
-
-                set_node_details(each_ip,
-                                 each_ip,
-                                 key_file,
-                                 "storagenodegrp",
-                                 user,
-                                 is_quorum_node=False,
-                                 is_manager_node=False,
-                                 is_gui_server=False,
-                                 is_collector_node=False,
-                                 is_nsd_server=True,
-                                 is_admin_node=False)
+        for index, each_ip in enumerate(storage_private_ips):
+            set_node_details(each_ip,
+                             each_ip,
+                             key_file,
+                             "storagenodegrp",
+                             user,
+                             is_quorum_node=index <= start_quorum_assign,
+                             is_manager_node=each_ip in manager_nodes,
+                             is_gui_server=index == 0,
+                             is_collector_node=index <= min(
+                                 1, start_quorum_assign),
+                             is_nsd_server=True,
+                             is_admin_node=index == 0)
 
-    elif cls_type == 'storage' and az_count > 1:
+    elif cls_type in ['storage', 'combined']:
         for each_ip in desc_private_ips:
-
-            # node = {'ip_addr': each_ip, 'is_quorum': True, 'is_manager': False,
-            #         'is_gui': False, 'is_collector': False, 'is_nsd': True,
-            #         'is_admin': False, 'user': user, 'key_file': key_file,
-            #         'class': "computedescnodegrp"}
-
             set_node_details(each_ip,
                              each_ip,
                              key_file,
@@ -433,366 +406,312 @@ def initialize_node_details(az_count, cls_type,
             # Storage/NSD nodes to be quorum nodes (quorum_count - 1 as index starts from 0)
             start_quorum_assign = quorum_count - 1
 
-        failure_group1, failure_group2 = [], []
-
-        subnet_pattern = re.compile(r'\d{1,3}\.\d{1,3}\.(\d{1,3})\.\d{1,3}')
-        subnet1A = subnet_pattern.findall(storage_private_ips[0])
-        for each_ip in storage_private_ips:
-            current_subnet = subnet_pattern.findall(each_ip)
-            if current_subnet[0] == subnet1A[0]:
-                failure_group1.append(each_ip)
-            else:
-                failure_group2.append(each_ip)
-
-        storage_instances = []
-        max_len = max(len(failure_group1), len(failure_group2))
-        idx = 0
-        while idx < max_len:
-            if idx < len(failure_group1):
-                storage_instances.append(failure_group1[idx])
-
-            if idx < len(failure_group2):
-                storage_instances.append(failure_group2[idx])
-
-            idx = idx + 1
-
-        for each_ip in storage_instances:
-
-            if storage_instances.index(each_ip) <= (start_quorum_assign) and \
-                    storage_instances.index(each_ip) <= (manager_count - 1):
-                if storage_instances.index(each_ip) == 0:
-
-                    # node = {'ip_addr': each_ip, 'is_quorum': True, 'is_manager': True,
-                    #         'is_gui': True, 'is_collector': True, 'is_nsd': True,
-                    #         'is_admin': True, 'user': user, 'key_file': key_file,
-                    #         'class': "storagenodegrp"}
-
-                    set_node_details(each_ip,
-                                     each_ip,
-                                     key_file,
-                                     "storagenodegrp",
-                                     user,
-                                     is_quorum_node=True,
-                                     is_manager_node=True,
-                                     is_gui_server=True,
-                                     is_collector_node=True,
-                                     is_nsd_server=True,
-                                     is_admin_node=True)
-
-                    # write_json_file({'storage_cluster_gui_ip_address': each_ip},
-                    #                 "%s/%s" % (str(pathlib.PurePath(ARGUMENTS.tf_inv_path).parent),
-                    #                            "storage_cluster_gui_details.json"))
-                elif storage_instances.index(each_ip) == 1:
-
-                    # node = {'ip_addr': each_ip, 'is_quorum': True, 'is_manager': True,
-                    #         'is_gui': False, 'is_collector': True, 'is_nsd': True,
-                    #         'is_admin': True, 'user': user, 'key_file': key_file,
-                    #         'class': "storagenodegrp"}
-
-                    set_node_details(each_ip,
-                                     each_ip,
-                                     key_file,
-                                     "storagenodegrp",
-                                     user,
-                                     is_quorum_node=True,
-                                     is_manager_node=True,
-                                     is_gui_server=False,
-                                     is_collector_node=True,
-                                     is_nsd_server=True,
-                                     is_admin_node=True)
-
-                else:
-
-                    # node = {'ip_addr': each_ip, 'is_quorum': True, 'is_manager': True,
-                    #         'is_gui': False, 'is_collector': False, 'is_nsd': True,
-                    #         'is_admin': True, 'user': user, 'key_file': key_file,
-                    #         'class': "storagenodegrp"}
-
-                    set_node_details(each_ip,
-                                     each_ip,
-                                     key_file,
-                                     "storagenodegrp",
-                                     user,
-                                     is_quorum_node=True,
-                                     is_manager_node=True,
-                                     is_gui_server=False,
-                                     is_collector_node=False,
-                                     is_nsd_server=True,
-                                     is_admin_node=True)
-
-            elif storage_instances.index(each_ip) <= (start_quorum_assign) and \
-                    storage_instances.index(each_ip) > (manager_count - 1):
-
-                # node = {'ip_addr': each_ip, 'is_quorum': True, 'is_manager': False,
-                #         'is_gui': False, 'is_collector': False, 'is_nsd': True,
-                #         'is_admin': True, 'user': user, 'key_file': key_file,
-                #         'class': "storagenodegrp"}
-
-                set_node_details(each_ip,
-                                 each_ip,
-                                 key_file,
-                                 "storagenodegrp",
-                                 user,
-                                 is_quorum_node=True,
-                                 is_manager_node=False,
-                                 is_gui_server=False,
-                                 is_collector_node=False,
-                                 is_nsd_server=True,
-                                 is_admin_node=True)
-
-            else:
-
-                # node = {'ip_addr': each_ip, 'is_quorum': False, 'is_manager': False,
-                #         'is_gui': False, 'is_collector': False, 'is_nsd': True,
-                #         'is_admin': False, 'user': user, 'key_file': key_file,
-                #         'class': "storagenodegrp"}
-
-                set_node_details(each_ip,
-                                 each_ip,
-                                 key_file,
-                                 "storagenodegrp",
-                                 user,
-                                 is_quorum_node=False,
-                                 is_manager_node=False,
-                                 is_gui_server=False,
-                                 is_collector_node=False,
-                                 is_nsd_server=True,
-                                 is_admin_node=False)
-
-    elif cls_type == 'combined':
-        for each_ip in desc_private_ips:
+        if cls_type == 'storage':
+            storage_instances = get_failure_domain_ordered(storage_private_ips)
+        else:
+            storage_instances = storage_private_ips
 
-            # node = {'ip_addr': each_ip, 'is_quorum': True, 'is_manager': False,
-            #         'is_gui': False, 'is_collector': False, 'is_nsd': True,
-            #         'is_admin': False, 'user': user, 'key_file': key_file,
-            #         'class': "computedescnodegrp"}
+        manager_nodes = get_manager_nodes(storage_instances,
+                                          manager_counts.get("storagenodegrp", 0),
+                                          storage_instances[:2][::-1])
 
+        for index, each_ip in enumerate(storage_instances):
             set_node_details(each_ip,
                              each_ip,
                              key_file,
-                             "computedescnodegrp",
+                             "storagenodegrp",
                              user,
-                             is_quorum_node=True,
-                             is_manager_node=False,
-                             is_gui_server=False,
-                             is_collector_node=False,
+                             is_quorum_node=index <= start_quorum_assign,
+                             is_manager_node=each_ip in manager_nodes,
+                             is_gui_server=index == 0,
+                             is_collector_node=index <= min(
+                                 1, start_quorum_assign),
                              is_nsd_server=True,
-                             is_admin_node=False)
-
-        if az_count > 1:
-            # Storage/NSD nodes to be quorum nodes (quorum_count - 2 as index starts from 0)
-            start_quorum_assign = quorum_count - 2
-        else:
-            # Storage/NSD nodes to be quorum nodes (quorum_count - 1 as index starts from 0)
-            start_quorum_assign = quorum_count - 1
-
-        for each_ip in storage_private_ips:
-
-            if storage_private_ips.index(each_ip) <= (start_quorum_assign) and \
-                    storage_private_ips.index(each_ip) <= (manager_count - 1):
-                if storage_private_ips.index(each_ip) == 0:
-
-                    # node = {'ip_addr': each_ip, 'is_quorum': True, 'is_manager': True,
-                    #         'is_gui': True, 'is_collector': True, 'is_nsd': True,
-                    #         'is_admin': True, 'user': user, 'key_file': key_file,
-                    #         'class': "storagenodegrp"}
-
-                    set_node_details(each_ip,
-                                     each_ip,
-                                     key_file,
-                                     "storagenodegrp",
-                                     user,
-                                     is_quorum_node=True,
-                                     is_manager_node=True,
-                                     is_gui_server=True,
-                                     is_collector_node=True,
-                                     is_nsd_server=True,
-                                     is_admin_node=True)
-
-                elif storage_private_ips.index(each_ip) == 1:
-
-                    # node = {'ip_addr': each_ip, 'is_quorum': True, 'is_manager': True,
-                    #         'is_gui': False, 'is_collector': True, 'is_nsd': True,
-                    #         'is_admin': True, 'user': user, 'key_file': key_file,
-                    #         'class': "storagenodegrp"}
-
-                    set_node_details(each_ip,
-                                     each_ip,
-                                     key_file,
-                                     "storagenodegrp",
-                                     user,
-                                     is_quorum_node=True,
-                                     is_manager_node=True,
-                                     is_gui_server=False,
-                                     is_collector_node=True,
-                                     is_nsd_server=True,
-                                     is_admin_node=True)
+                             is_admin_node=index <= start_quorum_assign)
 
+        if cls_type == 'combined':
+            if az_count > 1:
+                if len(storage_private_ips) - len(desc_private_ips) >= quorum_count:
+                    quorums_left = 0
                 else:
-
-                    # node = {'ip_addr': each_ip, 'is_quorum': True, 'is_manager': True,
-                    #         'is_gui': False, 'is_collector': False, 'is_nsd': True,
-                    #         'is_admin': True, 'user': user, 'key_file': key_file,
-                    #         'class': "storagenodegrp"}
-
-                    set_node_details(each_ip,
-                                     each_ip,
-                                     key_file,
-                                     "storagenodegrp",
-                                     user,
-                                     is_quorum_node=True,
-                                     is_manager_node=True,
-                                     is_gui_server=False,
-                                     is_collector_node=False,
-                                     is_nsd_server=True,
-                                     is_admin_node=True)
-
-            elif storage_private_ips.index(each_ip) <= (start_quorum_assign) and \
-                    storage_private_ips.index(each_ip) > (manager_count - 1):
-
-                # node = {'ip_addr': each_ip, 'is_quorum': True, 'is_manager': False,
-                #         'is_gui': False, 'is_collector': False, 'is_nsd': True,
-                #         'is_admin': True, 'user': user, 'key_file': key_file,
-                #         'class': "storagenodegrp"}
-
-                set_node_details(each_ip,
-                                 each_ip,
-                                 key_file,
-                                 "storagenodegrp",
-                                 user,
-                                 is_quorum_node=True,
-                                 is_manager_node=False,
-                                 is_gui_server=False,
-                                 is_collector_node=False,
-                                 is_nsd_server=True,
-                                 is_admin_node=True)
-
+                    quorums_left = quorum_count - \
+                        len(storage_private_ips) - len(desc_private_ips)
             else:
+                if len(storage_private_ips) > quorum_count:
+                    quorums_left = 0
+                else:
+                    quorums_left = quorum_count - len(storage_private_ips)
 
-                # node = {'ip_addr': each_ip, 'is_quorum': False, 'is_manager': False,
-                #         'is_gui': False, 'is_collector': False, 'is_nsd': True,
-                #         'is_admin': False, 'user': user, 'key_file': key_file,
-                #         'class': "storagenodegrp"}
-
-                set_node_details(each_ip,
-                                 each_ip,
-                                 key_file,
-                                 "storagenodegrp",
-                                 user,
-                                 is_quorum_node=False,
-                                 is_manager_node=False,
-                                 is_gui_server=False,
-                                 is_collector_node=False,
-                                 is_nsd_server=True,
-                                 is_admin_node=False)
-
-        if az_count > 1:
-            if len(storage_private_ips) - len(desc_private_ips) >= quorum_count:
-                quorums_left = 0
-            else:
-                quorums_left = quorum_count - \
-                    len(storage_private_ips) - len(desc_private_ips)
-        else:
-            if len(storage_private_ips) > quorum_count:
-                quorums_left = 0
-            else:
-                quorums_left = quorum_count - len(storage_private_ips)
-
-        # Additional quorums assign to compute nodes
-        if quorums_left > 0:
-            for each_ip in compute_private_ips[0:quorums_left]:
-
-                # node = {'ip_addr': each_ip, 'is_quorum': True, 'is_manager': False,
-                #         'is_gui': False, 'is_collector': False, 'is_nsd': False,
-                #         'is_admin': True, 'user': user, 'key_file': key_file,
-                #         'class': "computenodegrp"}
+            # Additional quorums assign to compute nodes
+            quorums_left = max(quorums_left, 0)
+            manager_nodes = get_manager_nodes(compute_private_ips,
+                                              manager_counts.get(
+                                                  "computenodegrp", 0),
+                                              [])
 
+            for index, each_ip in enumerate(compute_private_ips):
                 set_node_details(each_ip,
                                  each_ip,
                                  key_file,
                                  "computenodegrp",
                                  user,
-                                 is_quorum_node=True,
-                                 is_manager_node=False,
+                                 is_quorum_node=index < quorums_left,
+                                 is_manager_node=each_ip in manager_nodes,
                                  is_gui_server=False,
                                  is_collector_node=False,
                                  is_nsd_server=False,
-                                 is_admin_node=True)
-
-            for each_ip in compute_private_ips[quorums_left:]:
+                                 is_admin_node=index < quorums_left)
 
-                # node = {'ip_addr': each_ip, 'is_quorum': False, 'is_manager': False,
-                #         'is_gui': False, 'is_collector': False, 'is_nsd': False,
-                #         'is_admin': False, 'user': user, 'key_file': key_file,
-                #         'class': "computenodegrp"}
 
-                set_node_details(each_ip,
-                                 each_ip,
-                                 key_file,
-                                 "computenodegrp",
-                                 user,
-                                 is_quorum_node=False,
-                                 is_manager_node=False,
-                                 is_gui_server=False,
-                                 is_collector_node=False,
-                                 is_nsd_server=False,
-                                 is_admin_node=False)
-
-        if quorums_left == 0:
-            for each_ip in compute_private_ips:
+def get_daemon_interfaces(secondary_interface_map):
+    """ Daemon (data) network node names from per node secondary interfaces.
+    :args: secondary_interface_map (dict) of primary ip to either the secondary
+           ip, or {"ip": ..., "dns": ..., "subnet": ...}
+    :return: (dict of primary ip to daemon node name,
+              dict of primary ip to daemon subnet)
+    """
+    daemon_nodenames, daemon_subnets = {}, {}
+    for each_ip, each_interface in secondary_interface_map.items():
+        if not isinstance(each_interface, dict):
+            each_interface = {"ip": each_interface}
+        daemon_nodenames[each_ip] = each_interface.get("dns") or each_interface["ip"]
+        if each_interface.get("subnet"):
+            daemon_subnets[each_ip] = each_interface["subnet"]
+    return daemon_nodenames, daemon_subnets
+
+
+def get_instance_fabric(instance_type, instance_type_fabric_map):
+    """ High-performance fabric of an instance type, or None for TCP only.
+    :args: instance_type (string), instance_type_fabric_map (dict) of instance
+           type to {"fabric": ..., "verbs_ports": ..., "subnet": ...}
+    """
+    if instance_type in instance_type_fabric_map:
+        return instance_type_fabric_map[instance_type]
+    for each_pattern, each_fabric in FABRIC_INSTANCE_TYPE_PATTERNS:
+        if re.match(each_pattern, instance_type.lower()):
+            return {"fabric": each_fabric}
+    return None
 
-                # node = {'ip_addr': each_ip, 'is_quorum': False, 'is_manager': False,
-                #         'is_gui': False, 'is_collector': False, 'is_nsd': False,
-                #         'is_admin': False, 'user': user, 'key_file': key_file,
-                #         'class': "computenodegrp"}
 
-                set_node_details(each_ip,
-                                 each_ip,
-                                 key_file,
-                                 "computenodegrp",
-                                 user,
-                                 is_quorum_node=False,
-                                 is_manager_node=False,
-                                 is_gui_server=False,
-                                 is_collector_node=False,
-                                 is_nsd_server=False,
-                                 is_admin_node=False)
+def get_fabric_config_params(fabric):
+    """ RDMA/verbs and socket buffer params for a node class on a fabric.
+    :args: fabric (dict)
+    """
+    params = [{"verbsRdma": "enable"},
+              {"verbsRdmaSend": "yes"},
+              {"verbsPorts": fabric.get("verbs_ports",
+                                        FABRIC_DEFAULT_VERBS_PORTS.get(fabric["fabric"], ""))},
+              {"socketRcvBufferSize": FABRIC_SOCKET_BUFFER_SIZE},
+              {"socketSndBufferSize": FABRIC_SOCKET_BUFFER_SIZE}]
+    if fabric.get("subnet"):
+        params.append({"subnets": fabric["subnet"]})
+    return params
+
+
+def get_instance_type_name(instance_type):
+    """ Instance type used in node class names (Ex: c6i.4xlarge -> c6i4xlarge) """
+    return re.sub(r'[^a-z0-9]', '', instance_type.lower().replace("standard_", ""))
+
+
+def get_node_az_index(nodes, az_map, availability_zones):
+    """ AZ (1 based index in availability_zones) of each node.
+    :args: nodes (list) of (ip, node class) tuples, az_map (dict) of ip to AZ
+           name, availability_zones (list)
+    Nodes missing from az_map are all in az1 on a single AZ cluster. On a
+    multi AZ cluster the tie breaker (computedescnodegrp) is in the last AZ,
+    and other nodes follow the order of the subnets of their own node class.
+    """
+    subnet_pattern = re.compile(r'\d{1,3}\.\d{1,3}\.(\d{1,3})\.\d{1,3}')
+    node_az_index, subnet_index = {}, {}
+    for each_ip, node_class in nodes:
+        if az_map.get(each_ip) in availability_zones:
+            node_az_index[each_ip] = availability_zones.index(az_map[each_ip]) + 1
+        elif len(availability_zones) <= 1:
+            node_az_index[each_ip] = 1
+        elif node_class == "computedescnodegrp":
+            node_az_index[each_ip] = len(availability_zones)
+        else:
+            class_subnets = subnet_index.setdefault(node_class, {})
+            subnet = subnet_pattern.findall(each_ip)[0]
+            class_subnets.setdefault(subnet, len(class_subnets) + 1)
+            node_az_index[each_ip] = class_subnets[subnet]
+    return node_az_index
+
+
+def get_nodeclass_shards(nodes, instance_type_map, az_map, availability_zones):
+    """ Shard node classes by AZ and instance type.
+    :args: nodes (list) of (ip, node class) tuples, instance_type_map (dict),
+           az_map (dict), availability_zones (list)
+    :return: (dict of ip to sharded node class,
+              dict of sharded node class to (node class, instance type))
+    """
+    node_az_index = get_node_az_index(nodes, az_map, availability_zones)
+    nodeclass_shards, shard_details = {}, {}
+    for each_ip, node_class in nodes:
+        shard = "%s_az%s" % (node_class, node_az_index[each_ip])
+        instance_type = instance_type_map.get(each_ip)
+        if instance_type:
+            shard = "%s_%s" % (shard, get_instance_type_name(instance_type))
+        nodeclass_shards[each_ip] = shard
+        shard_details[shard] = (node_class, instance_type)
+    return nodeclass_shards, shard_details
+
+
+def get_sharded_scale_config(scale_config, shard_details, instance_type_memory_map,
+                             max_pagepool_gb):
+    """ Copy each node class params to its shards, sizing pagepool per shard.
+    :args: scale_config (list), shard_details (dict),
+           instance_type_memory_map (dict), max_pagepool_gb (int)
+    """
+    sharded_config = []
+    for each_config in scale_config:
+        shards = [each_shard for each_shard, (node_class, _) in shard_details.items()
+                  if node_class == each_config['nodeclass']]
+        if not shards:
+            sharded_config.append(each_config)
+        for each_shard in sorted(shards):
+            instance_type = shard_details[each_shard][1]
+            params = []
+            for each_param in each_config['params']:
+                each_param = dict(each_param)
+                if "pagepool" in each_param and instance_type in instance_type_memory_map:
+                    each_param["pagepool"] = calculate_pagepool(
+                        instance_type_memory_map[instance_type], max_pagepool_gb)
+                params.append(each_param)
+            sharded_config.append({"nodeclass": each_shard, "params": params})
+    return sharded_config
+
+
+def get_nsd_servers(attached_ips, failure_group_map, servers_per_disk,
+                    server_load, disk_size):
+    """ Select primary and ordered backup NSD servers for a shared volume.
+    :args: attached_ips (list), failure_group_map (dict), servers_per_disk (int),
+           server_load (dict), disk_size (int)
+    The least loaded server (NSD count, then capacity) becomes primary, so
+    primaries rotate across servers. Backups come from the same failure group.
+    """
+    primary = min(attached_ips,
+                  key=lambda each_ip: server_load.get(each_ip, (0, 0)))
+    backups = sorted([each_ip for each_ip in attached_ips
+                      if each_ip != primary and
+                      failure_group_map.get(each_ip) == failure_group_map.get(primary)],
+                     key=lambda each_ip: server_load.get(each_ip, (0, 0)))
+    nsd_count, capacity = server_load.get(primary, (0, 0))
+    server_load[primary] = (nsd_count + 1, capacity + disk_size)
+    return [primary] + backups[:max(servers_per_disk, 1) - 1]
+
+
+def get_volume_details(disk_mapping):
+    """ Normalize volume mapping entries to device/size dicts.
+    :args: disk_mapping (dict) of ip to list of device paths, or of
+           {"device": <path>, "size": <bytes>} entries
+    """
+    volume_details = {}
+    for each_ip, disk_per_ip in disk_mapping.items():
+        volume_details[each_ip] = []
+        for each_disk in disk_per_ip:
+            if isinstance(each_disk, dict):
+                volume_details[each_ip].append({"device": each_disk['device'],
+                                                "size": int(each_disk.get('size', 0))})
+            else:
+                volume_details[each_ip].append({"device": each_disk, "size": 0})
+    return volume_details
 
 
-def get_disks_list(az_count, disk_mapping, storage_dns_map, desc_disk_mapping, desc_dns_map, fs_mount):
-    """ Initialize disk list. """
+def get_balanced_failure_groups(storage_ips, volume_details, shared_disk_mapping):
+    """ Split storage nodes into two failure groups of balanced capacity.
+    :args: storage_ips (list), volume_details (dict), shared_disk_mapping (dict)
+    Largest servers are placed first, each on the group with the least
+    capacity so far (then fewest disks, then fewest servers). A shared
+    volume counts equally towards each server it is attached to. Without
+    volume sizes, the list is split in two contiguous halves.
+    """
+    server_sizes = dict([(each_ip, (sum([each_disk['size'] for each_disk in volume_details.get(each_ip, [])]),
+                                    len(volume_details.get(each_ip, []))))
+                         for each_ip in storage_ips])
+    for each_volume in shared_disk_mapping.values():
+        share = 1.0 / len(each_volume['servers'])
+        for each_ip in each_volume['servers']:
+            capacity, disk_count = server_sizes[each_ip]
+            server_sizes[each_ip] = (capacity + int(each_volume.get('size', 0)) * share,
+                                     disk_count + share)
+    if not any([capacity for capacity, _ in server_sizes.values()]):
+        mid_index = len(storage_ips) // 2
+        return storage_ips[:mid_index], storage_ips[mid_index:]
+
+    group_members, group_load = [[], []], [(0, 0, 0), (0, 0, 0)]
+    for each_ip in sorted(storage_ips, key=lambda each_ip: server_sizes[each_ip],
+                          reverse=True):
+        idx = group_load.index(min(group_load))
+        capacity, disk_count, server_count = group_load[idx]
+        group_load[idx] = (capacity + server_sizes[each_ip][0],
+                           disk_count + server_sizes[each_ip][1],
+                           server_count + 1)
+        group_members[idx].append(each_ip)
+
+    return ([each_ip for each_ip in storage_ips if each_ip in group_members[0]],
+            [each_ip for each_ip in storage_ips if each_ip in group_members[1]])
+
+
+def report_failure_group_balance(disks_list):
+    """ Print capacity and disk count per failure group and the imbalance. """
+    failure_groups = {}
+    for each_disk in disks_list:
+        if each_disk['usage'] == "descOnly":
+            continue
+        capacity, disk_count = failure_groups.get(each_disk['failureGroup'], (0, 0))
+        failure_groups[each_disk['failureGroup']] = (capacity + int(each_disk.get('size', 0)),
+                                                     disk_count + 1)
+    for each_group, (capacity, disk_count) in sorted(failure_groups.items()):
+        if capacity:
+            print("Failure group %s: %s disks, %.1f GiB" %
+                  (each_group, disk_count, capacity / 1024 ** 3))
+        else:
+            print("Failure group %s: %s disks" % (each_group, disk_count))
+
+    if len(failure_groups) > 1:
+        capacities = [capacity for capacity, _ in failure_groups.values()]
+        disk_counts = [disk_count for _, disk_count in failure_groups.values()]
+        if max(capacities):
+            print("Failure group capacity imbalance: %.1f%%" %
+                  ((max(capacities) - min(capacities)) * 100.0 / max(capacities)))
+        print("Failure group disk count imbalance: %.1f%%" %
+              ((max(disk_counts) - min(disk_counts)) * 100.0 / max(disk_counts)))
+
+
+def get_disks_list(az_count, disk_mapping, storage_dns_map, desc_disk_mapping,
+                   desc_dns_map, fs_mount, shared_disk_mapping, servers_per_disk,
+                   desc_disk_count=1):
+    """ Initialize disk list, with desc_disk_count tiebreaker (descOnly) disks. """
     disks_list = []
+    volume_details = get_volume_details(disk_mapping)
+
+    # Storage nodes owning only shared volumes still take part in failure groups
+    storage_ips = list(disk_mapping)
+    for each_volume in shared_disk_mapping.values():
+        storage_ips.extend([each_ip for each_ip in each_volume['servers']
+                            if each_ip not in storage_ips])
 
     # Map storage nodes to failure groups based on AZ and subnet variations
     failure_group1, failure_group2 = [], []
     if az_count == 1:
-        # Single AZ, just split list equally
-        num_storage_nodes = len(list(disk_mapping))
-        mid_index = num_storage_nodes//2
-        failure_group1 = list(disk_mapping)[:mid_index]
-        failure_group2 = list(disk_mapping)[mid_index:]
+        # Single AZ, split balancing capacity and disk count
+        failure_group1, failure_group2 = get_balanced_failure_groups(storage_ips,
+                                                                     volume_details,
+                                                                     shared_disk_mapping)
     else:
         # Multi AZ, split based on subnet match
         subnet_pattern = re.compile(r'\d{1,3}\.\d{1,3}\.(\d{1,3})\.\d{1,3}')
-        subnet1A = subnet_pattern.findall(list(disk_mapping)[0])
-        for each_ip in disk_mapping:
+        subnet1A = subnet_pattern.findall(storage_ips[0])
+        for each_ip in storage_ips:
             current_subnet = subnet_pattern.findall(each_ip)
             if current_subnet[0] == subnet1A[0]:
                 failure_group1.append(each_ip)
             else:
                 failure_group2.append(each_ip)
 
-    storage_instances = []
-    max_len = max(len(failure_group1), len(failure_group2))
-    idx = 0
-    while idx < max_len:
-        if idx < len(failure_group1):
-            storage_instances.append(failure_group1[idx])
-
-        if idx < len(failure_group2):
-            storage_instances.append(failure_group2[idx])
-
-        idx = idx + 1
+    failure_group_map = dict([(each_ip, 1) for each_ip in failure_group1] +
+                             [(each_ip, 2) for each_ip in failure_group2])
 
     # Prepare dict of disks / NSD list
     # "nsd": "nsd1",
@@ -804,76 +723,300 @@ def get_disks_list(az_count, disk_mapping, storage_dns_map, desc_disk_mapping, d
     # "usage": "dataAndMetadata",
     # "pool": "system"
 
-    nsd_count = 1
-    for each_ip, disk_per_ip in disk_mapping.items():
-
-        if each_ip in failure_group1:
-            for each_disk in disk_per_ip:
-
-                # disks_list.append({"device": each_disk,
-                #                    "failureGroup": 1, "servers": each_ip,
-                #                    "usage": "dataAndMetadata", "pool": "system"})
-
-                # TODO: FIX Include disk "size"
-                disks_list.append({
-                    "nsd": "nsd_" + each_ip.replace(".", "_") + "_" + os.path.basename(each_disk),
-                    "filesystem": pathlib.PurePath(fs_mount).name,
-                    "device": each_disk,
-                    "failureGroup": 1,
-                    "servers": each_ip,
-                    "usage": "dataAndMetadata",
-                    "pool": "system"
-                })
-                nsd_count = nsd_count + 1
-
-        if each_ip in failure_group2:
-            for each_disk in disk_per_ip:
-
-                # disks_list.append({"device": each_disk,
-                #                    "failureGroup": 2, "servers": each_ip,
-                #                    "usage": "dataAndMetadata", "pool": "system"})
-
-                # TODO: FIX Include disk "size"
-                disks_list.append({
-                    "nsd": "nsd_" + each_ip.replace(".", "_") + "_" + os.path.basename(each_disk),
-                    "filesystem": pathlib.PurePath(fs_mount).name,
-                    "device": each_disk,
-                    "failureGroup": 2,
-                    "servers": each_ip,
-                    "usage": "dataAndMetadata",
-                    "pool": "system"
-                })
-                nsd_count = nsd_count + 1
-
-    # Append "descOnly" disk details
+    for each_ip, disk_per_ip in volume_details.items():
+        for each_disk in disk_per_ip:
+            disk = {
+                "nsd": "nsd_" + each_ip.replace(".", "_") + "_" + os.path.basename(each_disk['device']),
+                "filesystem": pathlib.PurePath(fs_mount).name,
+                "device": each_disk['device'],
+                "failureGroup": failure_group_map[each_ip],
+                "servers": each_ip,
+                "usage": "dataAndMetadata",
+                "pool": "system"
+            }
+            if each_disk['size']:
+                disk["size"] = each_disk['size']
+            disks_list.append(disk)
+
+    # Shared (multi-attach) volumes get a server list: the primary rotates
+    # across attached servers, followed by backups from its failure group
+    server_load = {}
+    for each_ip, disk_per_ip in volume_details.items():
+        server_load[each_ip] = (len(disk_per_ip),
+                                sum([each_disk['size'] for each_disk in disk_per_ip]))
+
+    for each_volume_id, each_volume in shared_disk_mapping.items():
+        nsd_servers = get_nsd_servers(each_volume['servers'], failure_group_map,
+                                      servers_per_disk, server_load,
+                                      int(each_volume.get('size', 0)))
+        disk = {
+            "nsd": "nsd_" + re.sub(r'[^A-Za-z0-9]', '_', each_volume_id),
+            "filesystem": pathlib.PurePath(fs_mount).name,
+            "device": each_volume['device'],
+            "failureGroup": failure_group_map[nsd_servers[0]],
+            "servers": ",".join(nsd_servers),
+            "usage": "dataAndMetadata",
+            "pool": "system"
+        }
+        if int(each_volume.get('size', 0)):
+            disk["size"] = int(each_volume['size'])
+        disks_list.append(disk)
+
+    # Append "descOnly" disk details, one per filesystem
     if len(desc_disk_mapping.keys()):
         ip_address = list(desc_disk_mapping.keys())[0]
-        device = list(desc_disk_mapping.values())[0][0]
-
-        # TODO: FIX Include disk "size"
-        disks_list.append({"nsd": "nsd_" + ip_address.replace(".", "_") + "_" + os.path.basename(device),
-                           "filesystem": pathlib.PurePath(fs_mount).name,
-                           "device": device,
-                           "failureGroup": 3,
-                           "servers": ip_address,
-                           "usage": "descOnly",
-                           "pool": "system"})
+        desc_volumes = get_volume_details(desc_disk_mapping)[ip_address]
+        if len(desc_volumes) < desc_disk_count:
+            print("Tiebreaker node %s has %s volumes, each of the %s filesystems needs one. "
+                  "Declare the filesystems in the storage_cluster_filesystems template "
+                  "variable to size its volumes." % (ip_address, len(desc_volumes), desc_disk_count))
+            sys.exit(1)
+
+        for each_volume in desc_volumes[:desc_disk_count]:
+            device = each_volume['device']
+            disks_list.append({"nsd": "nsd_" + ip_address.replace(".", "_") + "_" + os.path.basename(device),
+                               "filesystem": pathlib.PurePath(fs_mount).name,
+                               "device": device,
+                               "failureGroup": 3,
+                               "servers": ip_address,
+                               "usage": "descOnly",
+                               "pool": "system"})
 
     return disks_list
 
 
-def initialize_scale_storage_details(az_count, fs_mount, block_size):
+def get_lroc_disks_list(local_disk_mapping, compute_private_ips):
+    """ Local read-only cache (LROC) disks on compute node local devices.
+    :args: local_disk_mapping (dict), compute_private_ips (list)
+    """
+    lroc_disks = []
+    for each_ip, disk_per_ip in get_volume_details(local_disk_mapping).items():
+        if each_ip not in compute_private_ips:
+            continue
+        for each_disk in disk_per_ip:
+            lroc_disks.append({"nsd": "lroc_" + each_ip.replace(".", "_") + "_" +
+                                      os.path.basename(each_disk['device']),
+                               "device": each_disk['device'],
+                               "servers": each_ip,
+                               "usage": "localCache"})
+    return lroc_disks
+
+
+def prepare_nsd_stanza(disks_list):
+    """ Native mmcrnsd stanza for the given disks """
+    stanza_keys = ["device", "nsd", "servers", "usage", "failureGroup", "pool"]
+    content = ""
+    for each_disk in disks_list:
+        content = content + "%nsd:\n"
+        for each_key in stanza_keys:
+            if each_key in each_disk:
+                content = content + "  %s=%s\n" % (each_key, each_disk[each_key])
+        content = content + "\n"
+    return content
+
+
+def get_nsd_creation_plan(fs_name, fs_mount, disks_list, fs_layout, policy_file=None):
+    """ NSD and filesystem creation commands for the given disks.
+    :args: fs_name (string), fs_mount (string), disks_list (list),
+           fs_layout (dict), policy_file (string)
+    mmcrnsd commits to the cluster configuration under its lock, so calls
+    split per NSD server can not run in parallel, and each extra call adds
+    a configuration commit pushed to every node. A single mmcrnsd over all
+    the stanzas is the fastest way to create the NSDs. The filesystem is
+    created from the same stanza file and its placement policy installed
+    right after.
+    :return: stanza file content (string), plan (dict)
+    """
+    fs_stanza = "%s_nsd_all.stanza" % fs_name
+    fs_command = ["mmcrfs", fs_name, "-F", fs_stanza,
+                  "-B", fs_layout["blockSize"],
+                  "-m", str(fs_layout["defaultMetadataReplicas"]),
+                  "-r", str(fs_layout["defaultDataReplicas"]),
+                  "-n", str(fs_layout["numNodes"]),
+                  "-T", fs_mount, "-A", "yes"]
+    if "metadataBlockSize" in fs_layout:
+        fs_command.extend(["--metadata-block-size", fs_layout["metadataBlockSize"]])
+    if "inodeLimit" in fs_layout:
+        fs_command.extend(["--inode-limit", str(fs_layout["inodeLimit"])])
+    if "writeCacheThreshold" in fs_layout:
+        fs_command.extend(["--write-cache-threshold", fs_layout["writeCacheThreshold"]])
+    if "logReplicas" in fs_layout:
+        fs_command.extend(["--log-replicas", str(fs_layout["logReplicas"])])
+
+    plan = {"filesystem": fs_name,
+            "filesystem_stanza": fs_stanza,
+            "nsd_command": "mmcrnsd -F %s" % fs_stanza,
+            "filesystem_command": " ".join(fs_command)}
+    if policy_file:
+        plan["policy_command"] = "mmchpolicy %s %s -I yes" % (fs_name, policy_file)
+    return prepare_nsd_stanza(disks_list), plan
+
+
+def apply_recovery_log_class(disks_list, volume_class_mapping, log_class):
+    """ Place recovery logs on disks of log_class (system.log pool).
+    :args: disks_list (list), volume_class_mapping (dict), log_class (string)
+    """
+    if not log_class:
+        return
+    for each_disk in disks_list:
+        if each_disk['usage'] == "dataAndMetadata" and \
+                volume_class_mapping.get(each_disk['device']) == log_class:
+            each_disk['usage'] = "metadataOnly"
+            each_disk['pool'] = "system.log"
+
+
+def assign_host_failure_groups(disks_list):
+    """ One failure group per NSD server, as local disks are lost with their host.
+    :args: disks_list (list)
+    """
+    host_failure_groups = {}
+    for each_disk in disks_list:
+        if each_disk['usage'] == "descOnly":
+            continue
+        primary = each_disk['servers'].split(",")[0]
+        host_failure_groups.setdefault(primary, len(host_failure_groups) + 1)
+        each_disk['failureGroup'] = host_failure_groups[primary]
+
+
+def get_filesystem_definitions(fs_definitions, default_mount):
+    """ Normalize filesystem definitions, defaulting to a single filesystem.
+    :args: fs_definitions (list), default_mount (string)
+    Each definition holds a "mountpoint" and optionally "block_size",
+    "workload", "data_replicas", "metadata_replicas" and a "devices" or
+    "servers" list selecting its disks.
+    """
+    if not fs_definitions:
+        fs_definitions = [{"mountpoint": default_mount}]
+
+    filesystems = []
+    for each_definition in fs_definitions:
+        if "mountpoint" not in each_definition:
+            print("Filesystem definition without mountpoint: %s" % each_definition)
+            sys.exit(1)
+        filesystem = dict(each_definition)
+        filesystem["name"] = pathlib.PurePath(each_definition["mountpoint"]).name
+        filesystems.append(filesystem)
+
+    fs_names = [each_fs["name"] for each_fs in filesystems]
+    if len(set(fs_names)) != len(fs_names):
+        print("Filesystem names derived from mountpoints must be unique: %s" % fs_names)
+        sys.exit(1)
+    return filesystems
+
+
+def split_disks_by_filesystem(disks_list, filesystems):
+    """ Assign disks to filesystems.
+    :args: disks_list (list), filesystems (list)
+    A disk belongs to the first filesystem listing its device or NSD name
+    under "devices", or one of its NSD servers under "servers". Remaining
+    disks go to the first filesystem without a selection. Each filesystem
+    gets its own tiebreaker (descOnly) disk.
+    :return: disks per filesystem name (dict)
+    """
+    unselected = [each_fs["name"] for each_fs in filesystems
+                  if not each_fs.get("devices") and not each_fs.get("servers")]
+    fs_disks = dict([(each_fs["name"], []) for each_fs in filesystems])
+    for each_disk in disks_list:
+        fs_name, selected = unselected[0] if unselected else None, False
+        for each_fs in filesystems:
+            if each_disk['device'] in each_fs.get("devices", []) or \
+                    each_disk.get('nsd') in each_fs.get("devices", []) or \
+                    set(each_disk['servers'].split(",")) & set(each_fs.get("servers", [])):
+                fs_name, selected = each_fs["name"], True
+                break
+        if each_disk['usage'] == "descOnly" and not selected:
+            # Tiebreaker disks only hold descriptors, one per filesystem
+            fs_name = ([each_fs["name"] for each_fs in filesystems
+                        if not [each_item for each_item in fs_disks[each_fs["name"]]
+                                if each_item['usage'] == "descOnly"]] + [None])[0]
+        if fs_name is None:
+            print("Disk %s on %s is not selected by any filesystem." %
+                  (each_disk['device'], each_disk['servers']))
+            sys.exit(1)
+        each_disk['filesystem'] = fs_name
+        fs_disks[fs_name].append(each_disk)
+
+    desc_disk_count = len([each_disk for each_disk in disks_list
+                           if each_disk['usage'] == "descOnly"])
+    for each_name, each_disks in fs_disks.items():
+        if not [each_disk for each_disk in each_disks if each_disk['usage'] != "descOnly"]:
+            print("Filesystem %s has no disks assigned." % each_name)
+            sys.exit(1)
+        if desc_disk_count and len([each_disk for each_disk in each_disks
+                                    if each_disk['usage'] == "descOnly"]) != 1:
+            print("Filesystem %s needs exactly one tiebreaker (descOnly) disk." % each_name)
+            sys.exit(1)
+    return fs_disks
+
+
+def plan_filesystem_layout(workload, block_size, disks_list, node_count, az_count,
+                           ephemeral=False):
+    """ Plan filesystem creation parameters fixed at mmcrfs time.
+    :args: workload (string), block_size (string), disks_list (list),
+           node_count (int), az_count (int), ephemeral (bool)
+    """
+    layout = {"blockSize": block_size}
+    if workload:
+        block_size, metadata_block_size, avg_file_kib = \
+            FILESYSTEM_WORKLOAD_PROFILES[workload]
+        layout["blockSize"] = block_size
+        if any(each_disk['usage'] == "metadataOnly" for each_disk in disks_list):
+            layout["metadataBlockSize"] = metadata_block_size
+
+        # Size the inode limit for the expected average file size
+        capacity = sum([int(each_disk.get('size', 0)) for each_disk in disks_list
+                        if each_disk['usage'] in ["dataAndMetadata", "dataOnly"]])
+        if capacity:
+            layout["inodeLimit"] = max(capacity // (avg_file_kib * 1024),
+                                       MIN_INODE_LIMIT)
+
+    # Replicas can not exceed the number of failure groups holding them
+    data_failure_groups = set([each_disk['failureGroup'] for each_disk in disks_list
+                               if each_disk['usage'] in ["dataAndMetadata", "dataOnly"]])
+    metadata_failure_groups = set([each_disk['failureGroup'] for each_disk in disks_list
+                                   if each_disk['usage'] in ["dataAndMetadata", "metadataOnly"] and
+                                   each_disk['pool'] != "system.log"])
+    if az_count > 1 or ephemeral:
+        layout["defaultDataReplicas"] = min(2, max(len(data_failure_groups), 1))
+    else:
+        layout["defaultDataReplicas"] = 1
+    layout["defaultMetadataReplicas"] = min(2, max(len(metadata_failure_groups), 1))
+
+    # Estimated number of mounting nodes, with headroom for growth
+    layout["numNodes"] = max(DEFAULT_ESTIMATED_NODE_COUNT, -(-node_count * 5 // 4))
+    return layout
+
+
+def apply_replica_overrides(filesystem, fs_layout, disks_list):
+    """ Apply the data_replicas/metadata_replicas of a filesystem definition.
+    :args: filesystem (dict), fs_layout (dict), disks_list (list)
+    Replicas can not exceed the failure groups of the filesystem holding
+    them, nor the maximum replicas it is created with.
+    """
+    failure_groups = {
+        "data_replicas": set([each_disk['failureGroup'] for each_disk in disks_list
+                              if each_disk['usage'] in ["dataAndMetadata", "dataOnly"]]),
+        "metadata_replicas": set([each_disk['failureGroup'] for each_disk in disks_list
+                                  if each_disk['usage'] in ["dataAndMetadata", "metadataOnly"] and
+                                  each_disk['pool'] != "system.log"])}
+    for each_key, each_layout_key in [("data_replicas", "defaultDataReplicas"),
+                                      ("metadata_replicas", "defaultMetadataReplicas")]:
+        if each_key not in filesystem:
+            continue
+        replicas = int(filesystem[each_key])
+        if not 1 <= replicas <= min(MAX_REPLICAS, len(failure_groups[each_key])):
+            print("Filesystem %s %s=%s, but its disks are in %s failure groups (max %s)." %
+                  (filesystem["name"], each_key, replicas,
+                   len(failure_groups[each_key]), MAX_REPLICAS))
+            sys.exit(1)
+        fs_layout[each_layout_key] = replicas
+
+
+def initialize_scale_storage_details(fs_mount, fs_layout):
     """ Initialize storage details.
-    :args: az_count (int), fs_mount (string), block_size (string),
-           disks_list (list)
+    :args: fs_mount (string), fs_layout (dict)
     """
     storage = []
-    if az_count > 1:
-        data_replicas = 2
-        metadata_replicas = 2
-    else:
-        data_replicas = 1
-        metadata_replicas = 2
 
     # "scale_filesystem": [
     #    {
@@ -884,23 +1027,29 @@ def initialize_scale_storage_details(az_count, fs_mount, block_size):
     #        "maxDataReplicas": "2",
     #        "defaultMetadataReplicas": "1",
     #        "maxMetadataReplicas": "2",
+    #        "automaticMountOption": "true",
+    #        "numNodes": 32,
     #        "scale_fal_enable": "False",
     #        "logfileset": ".audit_log",
     #        "retention": "365"
     #    }
     # ]
 
-    # TODO: FIX. Add "automaticMountOption": "true"
-    storage.append({"filesystem": pathlib.PurePath(fs_mount).name,
-                    "defaultMountPoint": fs_mount,
-                    "blockSize": block_size,
-                    "defaultDataReplicas": data_replicas,
-                    "maxDataReplicas": "2",
-                    "defaultMetadataReplicas": metadata_replicas,
-                    "maxMetadataReplicas": "2",
-                    "scale_fal_enable": False,
-                    "logfileset": ".audit_log",
-                    "retention": "365"})
+    filesystem = {"filesystem": pathlib.PurePath(fs_mount).name,
+                  "defaultMountPoint": fs_mount,
+                  "blockSize": fs_layout["blockSize"],
+                  "defaultDataReplicas": fs_layout["defaultDataReplicas"],
+                  "maxDataReplicas": "2",
+                  "defaultMetadataReplicas": fs_layout["defaultMetadataReplicas"],
+                  "maxMetadataReplicas": "2",
+                  "automaticMountOption": "true",
+                  "numNodes": fs_layout["numNodes"],
+                  "scale_fal_enable": False,
+                  "logfileset": ".audit_log",
+                  "retention": "365"}
+    if "inodeLimit" in fs_layout:
+        filesystem["inodeLimit"] = fs_layout["inodeLimit"]
+    storage.append(filesystem)
     return storage
 
 
@@ -930,12 +1079,72 @@ if __name__ == "__main__":
                         help='Spectrum Scale GUI username')
     PARSER.add_argument('--gui_password', required=True,
                         help='Spectrum Scale GUI password')
+    PARSER.add_argument('--remote_client_count', type=int, default=0,
+                        help='Number of remote cluster nodes mounting the filesystem')
+    PARSER.add_argument('--manager_count_per_nodeclass', type=json.loads,
+                        default={},
+                        help='Manager count per node class as json '
+                             '(Ex: \'{"storagenodegrp": 4, "computenodegrp": 2}\')')
+    PARSER.add_argument('--nsd_servers_per_disk', type=int, default=2,
+                        help='Number of NSD servers (primary + backups) per shared volume. '
+                             'Shared volumes are not created by the templates, they are read '
+                             'from the storage_cluster_shared_data_volume_mapping input')
+    PARSER.add_argument('--metadata_volume_class',
+                        help='Not supported with the JSON cluster definition, '
+                             'use the INI inventory format to separate metadata')
+    PARSER.add_argument('--filesystem_workload',
+                        choices=list(FILESYSTEM_WORKLOAD_PROFILES),
+                        help='Workload hint used to plan filesystem block size '
+                             'and inode allocation (default: use filesystem_block_size)')
+    PARSER.add_argument('--nodeclass_sharding', action='store_true',
+                        help='Split node classes by AZ and instance type, '
+                             'Ex: computenodegrp_az1_c6i4xlarge')
+    PARSER.add_argument('--write_cache_threshold',
+                        help='Not supported with the JSON cluster definition, '
+                             'use the INI inventory format to enable HAWC')
+    PARSER.add_argument('--recovery_log_volume_class',
+                        help='Volume class (from storage_cluster_volume_class_mapping) '
+                             'to hold the recovery logs (system.log pool)')
+    PARSER.add_argument('--ephemeral_storage', action='store_true',
+                        help='Storage cluster NSDs are on instance-store (ephemeral) '
+                             'devices, replicate data across hosts')
+    PARSER.add_argument('--filesystems', type=json.loads, default=None,
+                        help='JSON list of filesystem definitions, each with a mountpoint '
+                             'and optional block_size, workload, data_replicas, '
+                             'metadata_replicas and devices or servers selection '
+                             '(default: storage_cluster_filesystems of the terraform inventory)')
+    PARSER.add_argument('--collector_sharding', action='store_true',
+                        help='Size and place federated performance monitoring collectors '
+                             'by node count and scale sensor periods')
+    PARSER.add_argument('--role_separation_node_count', type=int, default=0,
+                        help='Move GUI, admin and collector roles off NSD servers '
+                             'from this cluster size on (0 disables)')
+    PARSER.add_argument('--gui_hosts',
+                        help='Comma separated private IPs of the GUI nodes')
+    PARSER.add_argument('--admin_hosts',
+                        help='Comma separated private IPs of the admin nodes')
+    PARSER.add_argument('--profile', action='store_true',
+                        help='Write cProfile, tracemalloc and per phase timings '
+                             'next to the cluster definition')
     PARSER.add_argument('--verbose', action='store_true',
                         help='print log messages')
 
     ARGUMENTS = PARSER.parse_args()
+    # No step of the JSON flow runs after filesystem creation to enable HAWC
+    if ARGUMENTS.write_cache_threshold:
+        print("--write_cache_threshold requires the INI inventory format, the "
+              "JSON cluster definition can not enable HAWC on the filesystem.")
+        sys.exit(1)
+    # Nor does it install the placement policy a metadata/data split needs
+    if ARGUMENTS.metadata_volume_class:
+        print("--metadata_volume_class requires the INI inventory format, the "
+              "JSON cluster definition can not install a placement policy.")
+        sys.exit(1)
+    TRACE_SPAN = deployment_trace.start_span("inventory")
+    PROFILE = deployment_trace.start_profile(ARGUMENTS.profile)
 
     # Step-1: Read the inventory file
+    deployment_trace.mark_phase(PROFILE, "parse")
     TF = read_json_file(ARGUMENTS.tf_inv_path)
 
     if ARGUMENTS.verbose:
@@ -1024,7 +1233,7 @@ if __name__ == "__main__":
     # Determine total number of quorum, manager nodes to be in the cluster
     # manager designates the node as part of the pool of nodes from which
     # file system managers and token managers are selected.
-    quorum_count, manager_count = 0, 2
+    quorum_count = 0
     if total_node_count < 4:
         quorum_count = total_node_count
     elif 4 <= total_node_count < 10:
@@ -1037,6 +1246,19 @@ if __name__ == "__main__":
     if ARGUMENTS.verbose:
         print("Total quorum count: ", quorum_count)
 
+    # Managers are drawn from storage nodes when present, otherwise compute
+    manager_counts = {}
+    if cluster_type == "compute":
+        manager_counts["computenodegrp"] = calculate_manager_count(
+            total_node_count, ARGUMENTS.remote_client_count, ARGUMENTS.memory_size)
+    else:
+        manager_counts["storagenodegrp"] = calculate_manager_count(
+            total_node_count, ARGUMENTS.remote_client_count, ARGUMENTS.memory_size)
+    manager_counts.update(ARGUMENTS.manager_count_per_nodeclass)
+
+    if ARGUMENTS.verbose:
+        print("Manager count per node class: ", manager_counts)
+
     # Define cluster details
     if TF['resource_prefix']:
         cluster_name = TF['resource_prefix']
@@ -1056,6 +1278,7 @@ if __name__ == "__main__":
     initialize_callhome_details()
 
     # Step-5: Create hosts
+    deployment_trace.mark_phase(PROFILE, "role_assignment")
     initialize_node_details(len(TF['vpc_availability_zones']), cluster_type,
                             TF['compute_cluster_instance_private_ips'],
                             TF['compute_cluster_instance_private_dns_ip_map'],
@@ -1063,26 +1286,195 @@ if __name__ == "__main__":
                             TF['storage_cluster_instance_private_dns_ip_map'],
                             TF['storage_cluster_desc_instance_private_ips'],
                             TF['storage_cluster_desc_instance_private_dns_ip_map'],
-                            quorum_count, "root", ARGUMENTS.instance_private_key)
-
+                            quorum_count, manager_counts, "root",
+                            ARGUMENTS.instance_private_key)
+
+    if ARGUMENTS.ephemeral_storage and cluster_type in ['storage', 'combined']:
+        add_scale_config_params("storagenodegrp", EPHEMERAL_CONFIG_PARAMS)
+
+    # Keep GUI, admin and collector duties off the NSD servers (I/O path)
+    gui_hosts = ARGUMENTS.gui_hosts.split(",") if ARGUMENTS.gui_hosts else []
+    admin_hosts = ARGUMENTS.admin_hosts.split(",") if ARGUMENTS.admin_hosts else []
+    if gui_hosts or admin_hosts or (ARGUMENTS.role_separation_node_count and
+                                    total_node_count >= ARGUMENTS.role_separation_node_count):
+        gui_ips, admin_ips = get_role_placement(
+            [(each_node['ip_address'], each_node['is_nsd_server'])
+             for each_node in CLUSTER_DEFINITION_JSON['node_details']],
+            gui_hosts, admin_hosts)
+        if gui_ips:
+            collector_nodes = get_collector_nodes(
+                [(each_node['ip_address'], (each_node['is_nsd_server'],
+                                            each_node['is_manager_node'],
+                                            each_node['is_quorum_node']))
+                 for each_node in CLUSTER_DEFINITION_JSON['node_details']],
+                gui_ips,
+                len([each_node for each_node in CLUSTER_DEFINITION_JSON['node_details']
+                     if each_node['scale_zimon_collector']]))
+            for each_node in CLUSTER_DEFINITION_JSON['node_details']:
+                each_node['is_gui_server'] = each_node['ip_address'] in gui_ips
+                each_node['is_admin_node'] = each_node['ip_address'] in admin_ips
+                each_node['scale_zimon_collector'] = each_node['ip_address'] in collector_nodes
+        report_role_separation(
+            [(each_node['ip_address'], each_node['is_nsd_server'],
+              [each_role for each_role, each_flag in
+               [("GUI", each_node['is_gui_server']), ("admin", each_node['is_admin_node']),
+                ("collector", each_node['scale_zimon_collector'])] if each_flag])
+             for each_node in CLUSTER_DEFINITION_JSON['node_details']])
+
+    if ARGUMENTS.collector_sharding:
+        collector_nodes = get_collector_nodes(
+            [(each_node['ip_address'], (each_node['is_nsd_server'], each_node['is_manager_node'],
+                                        each_node['is_quorum_node']))
+             for each_node in CLUSTER_DEFINITION_JSON['node_details']],
+            [each_node['ip_address'] for each_node in CLUSTER_DEFINITION_JSON['node_details']
+             if each_node['is_gui_server']],
+            calculate_collector_count(total_node_count))
+        for each_node in CLUSTER_DEFINITION_JSON['node_details']:
+            each_node['scale_zimon_collector'] = each_node['ip_address'] in collector_nodes
+        print("Performance monitoring collectors: ", collector_nodes)
+
+    # Daemon (data) traffic on secondary interfaces, admin traffic stays on the primary
+    secondary_interface_map = dict(TF.get('compute_cluster_secondary_interface_map', {}))
+    secondary_interface_map.update(TF.get('storage_cluster_secondary_interface_map', {}))
+    if secondary_interface_map:
+        daemon_nodenames, daemon_subnets = get_daemon_interfaces(secondary_interface_map)
+        nodeclass_subnets = {}
+        for each_node in CLUSTER_DEFINITION_JSON['node_details']:
+            if each_node['ip_address'] not in daemon_nodenames:
+                continue
+            each_node['scale_daemon_nodename'] = daemon_nodenames[each_node['ip_address']]
+            each_node['scale_admin_nodename'] = each_node['fqdn']
+            if each_node['ip_address'] in daemon_subnets:
+                nodeclass_subnets.setdefault(each_node['scale_nodeclass'], set()).add(
+                    daemon_subnets[each_node['ip_address']])
+        for each_class, each_subnets in sorted(nodeclass_subnets.items()):
+            add_scale_config_params(each_class, [{"subnets": " ".join(sorted(each_subnets))}])
+
+    # Compute node local devices become LROC in front of remote storage
+    if cluster_type in ['compute', 'combined']:
+        lroc_disks = get_lroc_disks_list(TF.get('compute_cluster_with_local_volume_mapping', {}),
+                                         TF['compute_cluster_instance_private_ips'])
+        if lroc_disks:
+            # The roles do not create localCache NSDs, so the nodes keep their
+            # class and LROC is enabled on them after the NSDs are created
+            lroc_ips = sorted(set([each_disk['servers'] for each_disk in lroc_disks]))
+            lroc_stanza_path = "%s/%s_lroc_nsd.stanza" % (
+                os.path.dirname(ARGUMENTS.install_infra_path.rstrip('/') +
+                                SCALE_CLUSTER_DEFINITION_PATH), cluster_type)
+            os.makedirs(os.path.dirname(lroc_stanza_path), exist_ok=True)
+            with open(lroc_stanza_path, 'w') as stanza_fh:
+                stanza_fh.write(prepare_nsd_stanza(lroc_disks))
+            lroc_params = ",".join(["%s=%s" % list(each_param.items())[0]
+                                    for each_param in LROC_CONFIG_PARAMS])
+            print("LROC disks on %s nodes, enable them once the cluster is up: "
+                  "mmcrnsd -F %s && mmchconfig %s -N %s" %
+                  (len(lroc_ips), lroc_stanza_path, lroc_params, ",".join(lroc_ips)))
+
+    if ARGUMENTS.nodeclass_sharding:
+        instance_type_map = dict(TF.get('compute_cluster_instance_type_map', {}))
+        instance_type_map.update(TF.get('storage_cluster_instance_type_map', {}))
+        az_map = dict(TF.get('compute_cluster_instance_az_map', {}))
+        az_map.update(TF.get('storage_cluster_instance_az_map', {}))
+        nodeclass_shards, shard_details = get_nodeclass_shards(
+            [(each_node['ip_address'], each_node['scale_nodeclass'])
+             for each_node in CLUSTER_DEFINITION_JSON['node_details']],
+            instance_type_map, az_map, TF['vpc_availability_zones'])
+        for each_node in CLUSTER_DEFINITION_JSON['node_details']:
+            each_node['scale_nodeclass'] = nodeclass_shards[each_node['ip_address']]
+        CLUSTER_DEFINITION_JSON['scale_config'] = get_sharded_scale_config(
+            CLUSTER_DEFINITION_JSON['scale_config'], shard_details,
+            TF.get('instance_type_memory_map', {}), ARGUMENTS.max_pagepool_gb)
+        if ARGUMENTS.verbose:
+            print("Node class shards: ", sorted(shard_details))
+
+    # After sharding, so the NSD disk sensor follows the sharded node classes
+    if ARGUMENTS.collector_sharding:
+        CLUSTER_DEFINITION_JSON.update({"scale_zimon_sensors": get_zimon_sensors(
+            total_node_count,
+            sorted(set([each_node['scale_nodeclass']
+                        for each_node in CLUSTER_DEFINITION_JSON['node_details']
+                        if each_node['is_nsd_server']])),
+            collector_nodes[0])})
+
+    # RDMA/verbs for node classes on high-performance fabric instance types
+    instance_type_map = dict(TF.get('compute_cluster_instance_type_map', {}))
+    instance_type_map.update(TF.get('storage_cluster_instance_type_map', {}))
+    nodeclass_fabrics = {}
+    for each_node in CLUSTER_DEFINITION_JSON['node_details']:
+        nodeclass_fabrics.setdefault(each_node['scale_nodeclass'], []).append(
+            get_instance_fabric(instance_type_map.get(each_node['ip_address'], ""),
+                                TF.get('instance_type_fabric_map', {})))
+    for each_class, each_fabrics in sorted(nodeclass_fabrics.items()):
+        if each_fabrics[0] and each_fabrics.count(each_fabrics[0]) == len(each_fabrics):
+            add_scale_config_params(each_class, get_fabric_config_params(each_fabrics[0]))
+        elif any(each_fabrics):
+            print("Node class %s mixes fabric and TCP only instances, RDMA not enabled "
+                  "(use --nodeclass_sharding)." % each_class)
+
+    deployment_trace.mark_phase(PROFILE, "disk_planning")
     if cluster_type in ['storage', 'combined']:
+        filesystems = get_filesystem_definitions(
+            ARGUMENTS.filesystems or TF.get('storage_cluster_filesystems'),
+            TF['storage_cluster_filesystem_mountpoint'])
         disks_list = get_disks_list(len(TF['vpc_availability_zones']),
                                     TF['storage_cluster_with_data_volume_mapping'],
                                     TF['storage_cluster_instance_private_dns_ip_map'],
                                     TF['storage_cluster_desc_data_volume_mapping'],
                                     TF['storage_cluster_desc_instance_private_dns_ip_map'],
-                                    TF['storage_cluster_filesystem_mountpoint'])
-
-        scale_storage = initialize_scale_storage_details(len(TF['vpc_availability_zones']),
-                                                         TF['storage_cluster_filesystem_mountpoint'],
-                                                         TF['filesystem_block_size'])
+                                    TF['storage_cluster_filesystem_mountpoint'],
+                                    TF.get('storage_cluster_shared_data_volume_mapping', {}),
+                                    ARGUMENTS.nsd_servers_per_disk, len(filesystems))
+
+        if ARGUMENTS.ephemeral_storage:
+            if len(TF['vpc_availability_zones']) == 1:
+                assign_host_failure_groups(disks_list)
+            if len(set([each_disk['failureGroup'] for each_disk in disks_list])) < 2:
+                print("Ephemeral storage requires NSD servers in at least two "
+                      "failure groups to replicate data.")
+                sys.exit(1)
+        report_failure_group_balance(disks_list)
+        apply_recovery_log_class(disks_list,
+                                 TF.get('storage_cluster_volume_class_mapping', {}),
+                                 ARGUMENTS.recovery_log_volume_class)
+        fs_disks = split_disks_by_filesystem(disks_list, filesystems)
+        scale_storage = []
+        for each_fs in filesystems:
+            each_disks = fs_disks[each_fs["name"]]
+            fs_layout = plan_filesystem_layout(each_fs.get("workload", ARGUMENTS.filesystem_workload),
+                                               each_fs.get("block_size", TF['filesystem_block_size']),
+                                               each_disks,
+                                               total_node_count + ARGUMENTS.remote_client_count,
+                                               len(TF['vpc_availability_zones']),
+                                               ARGUMENTS.ephemeral_storage)
+            apply_replica_overrides(each_fs, fs_layout, each_disks)
+            if "metadataBlockSize" in fs_layout:
+                print("Filesystem %s metadata block size (%s) only applies when created "
+                      "from its NSD creation plan." % (each_fs["name"],
+                                                       fs_layout["metadataBlockSize"]))
+            nsd_plan_dir = "%s/%s_nsd_plan" % (
+                os.path.dirname(ARGUMENTS.install_infra_path.rstrip('/') +
+                                SCALE_CLUSTER_DEFINITION_PATH), each_fs["name"])
+            nsd_stanza, nsd_plan = get_nsd_creation_plan(each_fs["name"], each_fs["mountpoint"],
+                                                         each_disks, fs_layout)
+            os.makedirs(nsd_plan_dir, exist_ok=True)
+            with open("%s/%s" % (nsd_plan_dir, nsd_plan['filesystem_stanza']), 'w') as stanza_fh:
+                stanza_fh.write(nsd_stanza)
+            with open("%s/creation_plan.json" % nsd_plan_dir, 'w') as plan_fh:
+                json.dump(nsd_plan, plan_fh, indent=4)
+            print("NSD creation plan, to create the filesystem outside the storage role, "
+                  "written to: %s" % nsd_plan_dir)
+            scale_storage.extend(initialize_scale_storage_details(each_fs["mountpoint"],
+                                                                  fs_layout))
 
         CLUSTER_DEFINITION_JSON.update({"scale_filesystem": scale_storage})
         CLUSTER_DEFINITION_JSON.update({"scale_disks": disks_list})
 
+    deployment_trace.mark_phase(PROFILE, "serialization")
+    CLUSTER_DEFINITION_CONTENT = json.dumps(CLUSTER_DEFINITION_JSON, indent=4)
     if ARGUMENTS.verbose:
-        print("Content of scale_clusterdefinition.json: ",
-              json.dumps(CLUSTER_DEFINITION_JSON, indent=4))
+        print("Content of scale_clusterdefinition.json: ", CLUSTER_DEFINITION_CONTENT)
+
+    deployment_trace.mark_phase(PROFILE, "write")
 
     # Write json content
     if ARGUMENTS.verbose:
@@ -1100,8 +1492,14 @@ if __name__ == "__main__":
             '/') + SCALE_CLUSTER_DEFINITION_PATH), exist_ok=True)
 
     with open(ARGUMENTS.install_infra_path.rstrip('/') + SCALE_CLUSTER_DEFINITION_PATH, 'w') as json_fh:
-        json.dump(CLUSTER_DEFINITION_JSON, json_fh, indent=4)
+        json_fh.write(CLUSTER_DEFINITION_CONTENT)
 
     if ARGUMENTS.verbose:
         print("Completed writing cloud infrastructure details to: ",
               ARGUMENTS.install_infra_path.rstrip('/') + SCALE_CLUSTER_DEFINITION_PATH)
+
+    deployment_trace.write_profile(PROFILE, "%s/%s_inventory_profile" % (
+        os.path.dirname(ARGUMENTS.install_infra_path.rstrip('/') + SCALE_CLUSTER_DEFINITION_PATH),
+        cluster_type))
+    TRACE_SPAN["phase"] = "inventory_%s" % cluster_type
+    deployment_trace.end_span(TRACE_SPAN, total_node_count)
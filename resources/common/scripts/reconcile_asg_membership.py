@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Copyright IBM Corporation 2018
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import argparse
+import json
+import os
+import pathlib
+import subprocess
+import sys
+import time
+
+JOIN_EVENTS = ["autoscaling:EC2_INSTANCE_LAUNCH", "autoscaling:EC2_INSTANCE_LAUNCHING"]
+LEAVE_EVENTS = ["autoscaling:EC2_INSTANCE_TERMINATE", "autoscaling:EC2_INSTANCE_TERMINATING"]
+
+
+def read_json_file(json_path):
+    """ Read inventory as json file """
+    tf_inv = {}
+    try:
+        with open(json_path) as json_handler:
+            try:
+                tf_inv = json.load(json_handler)
+            except json.decoder.JSONDecodeError:
+                print(
+                    "Provided terraform inventory file (%s) is not a valid json." % json_path)
+                sys.exit(1)
+    except OSError:
+        print("Provided terraform inventory file (%s) does not exist." % json_path)
+        sys.exit(1)
+
+    return tf_inv
+
+
+def write_json_file(json_data, json_path):
+    """ Write to json file """
+    with open(json_path, 'w') as json_handler:
+        json.dump(json_data, json_handler, indent=4)
+
+
+def write_to_file(filepath, filecontent):
+    """ Write to specified file """
+    with open(filepath, "w") as file_handler:
+        file_handler.write(filecontent)
+
+
+def local_execution(command_list):
+    """
+    Helper to execute command locally (stores o/p in variable).
+    :arg: command_list (list)
+    :return: (out, err, command_pipe.returncode)
+    """
+    sub_command = subprocess.Popen(command_list, stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE,
+                                   universal_newlines=True)
+    out, err = sub_command.communicate()
+    return out, err, sub_command.returncode
+
+
+def aws_execution(command_list):
+    """ Run an aws cli command and return its parsed json output. """
+    out, err, code = local_execution(command_list + ["--output", "json"])
+    if code:
+        print("Command (%s) failed." % " ".join(command_list))
+        print("%s: %s %s: %s" % ("stdout", out, "stderr", err))
+        return None
+    return json.loads(out) if out.strip() else {}
+
+
+def aws_get_private_ips(instance_ids, region):
+    """ Private IPs of the given instances, those without one are left out. """
+    if not instance_ids:
+        return {}
+    reservations = aws_execution(["aws", "ec2", "describe-instances",
+                                  "--region", region, "--instance-ids"] + instance_ids)
+    if reservations is None:
+        return {}
+    private_ips = {}
+    for each_reservation in reservations.get("Reservations", []):
+        for each_instance in each_reservation.get("Instances", []):
+            if each_instance.get("PrivateIpAddress"):
+                private_ips[each_instance["InstanceId"]] = each_instance["PrivateIpAddress"]
+    return private_ips
+
+
+def aws_get_asg_members(asg_names, region):
+    """ In service instance ids of the autoscaling groups, None on failure. """
+    groups = aws_execution(["aws", "autoscaling", "describe-auto-scaling-groups",
+                            "--region", region, "--auto-scaling-group-names"] + asg_names)
+    if groups is None:
+        return None
+    return [each_instance["InstanceId"]
+            for each_group in groups.get("AutoScalingGroups", [])
+            for each_instance in each_group.get("Instances", [])
+            if each_instance["LifecycleState"] == "InService"]
+
+
+def read_queued_events(queue_dir):
+    """ Read SNS style autoscaling notifications queued as files, oldest first.
+    :args: queue_dir (string)
+    :return: (list of (instance id, "join" or "delete") tuples, consumed files)
+    """
+    events, consumed = [], []
+    if not os.path.isdir(queue_dir):
+        return events, consumed
+    queued_files = sorted(pathlib.Path(queue_dir).glob("*.json"),
+                          key=lambda each_file: each_file.stat().st_mtime)
+    for each_file in queued_files:
+        consumed.append(str(each_file))
+        try:
+            notification = json.loads(each_file.read_text())
+            # SNS wraps the autoscaling message as a json string
+            message = notification.get("Message", notification)
+            if isinstance(message, str):
+                message = json.loads(message)
+        except (ValueError, AttributeError):
+            print("Skipping malformed event file: %s" % each_file)
+            continue
+        event = message.get("LifecycleTransition") or message.get("Event")
+        if event in JOIN_EVENTS:
+            events.append((message["EC2InstanceId"], "join"))
+        elif event in LEAVE_EVENTS:
+            events.append((message["EC2InstanceId"], "delete"))
+    return events, consumed
+
+
+def get_membership_changes(members, desired, managed):
+    """ Instances to join and to delete.
+    :args: members (dict) of instance id to ip in the cluster,
+           desired (dict) of instance id to ip (None when not known yet),
+           managed (list) of instance ids ever seen in the autoscaling groups
+    Only autoscaling group instances are deleted, nodes terraform created
+    outside the groups are left alone.
+    """
+    changes = {}
+    for each_id, each_ip in desired.items():
+        if each_id not in members:
+            changes[each_id] = ("join", each_ip)
+    for each_id, each_ip in members.items():
+        if each_id in managed and each_id not in desired:
+            changes[each_id] = ("delete", each_ip)
+    return changes
+
+
+def debounce_changes(pending, changes, now, debounce_seconds, max_batch_size):
+    """ Hold changes until they are stable, then release them in batches.
+    :args: pending (dict) of instance id to {"action", "ip", "first_seen"},
+           changes (dict), now (float), debounce_seconds (int),
+           max_batch_size (int)
+    A change that disappears before debounce_seconds (Ex: a node replaced
+    right after launch) is dropped.
+    :return: (updated pending, ready batch as list of (id, action, ip))
+    """
+    updated = {}
+    for each_id, (action, each_ip) in changes.items():
+        previous = pending.get(each_id)
+        first_seen = previous["first_seen"] if previous and previous["action"] == action else now
+        updated[each_id] = {"action": action, "ip": each_ip, "first_seen": first_seen}
+
+    ready = sorted([(each_change["first_seen"], each_id)
+                    for each_id, each_change in updated.items()
+                    if now - each_change["first_seen"] >= debounce_seconds and
+                    each_change["ip"]])
+    batch = [(each_id, updated[each_id]["action"], updated[each_id]["ip"])
+             for _, each_id in ready[:max_batch_size]]
+    for each_id, _, _ in batch:
+        del updated[each_id]
+    return updated, batch
+
+
+def get_host_format(node_ip, user, key_file):
+    """ Return host entry of an elastic compute node """
+    return f"{node_ip} scale_cluster_quorum=False scale_cluster_manager=False scale_cluster_gui=False scale_zimon_collector=False is_nsd_server=False is_admin_node=False ansible_user={user} ansible_ssh_private_key_file={key_file} ansible_python_interpreter=/usr/bin/python3 scale_nodeclass=computenodegrp"
+
+
+def prepare_join_actions(batch, node_class):
+    """ Cluster actions for a batch of membership changes.
+    :args: batch (list) of (instance id, action, ip), node_class (string)
+    """
+    joins = [each_ip for _, action, each_ip in batch if action == "join"]
+    deletes = [each_ip for _, action, each_ip in batch if action == "delete"]
+    actions = {"join": [{"instance_id": each_id, "ip": each_ip}
+                        for each_id, action, each_ip in batch if action == "join"],
+               "delete": [{"instance_id": each_id, "ip": each_ip}
+                          for each_id, action, each_ip in batch if action == "delete"],
+               "commands": []}
+    if deletes:
+        actions["commands"].extend(["mmshutdown -N %s" % ",".join(deletes),
+                                    "mmdelnode -N %s" % ",".join(deletes)])
+    if joins:
+        actions["commands"].extend(["mmaddnode -N %s" % ",".join(joins),
+                                    "mmchlicense client --accept -N %s" % ",".join(joins),
+                                    "mmchnodeclass %s add -N %s" % (node_class, ",".join(joins)),
+                                    "mmstartup -N %s" % ",".join(joins)])
+    return actions
+
+
+def reconcile(state, desired, output_dir, arguments):
+    """ One reconcile pass, writing incremental artifacts for a ready batch. """
+    changes = get_membership_changes(state["members"], desired, state["managed"])
+    state["pending"], batch = debounce_changes(state["pending"], changes, time.time(),
+                                               arguments.debounce_seconds,
+                                               arguments.max_batch_size)
+    if not batch:
+        if arguments.verbose and state["pending"]:
+            print("Pending membership changes: %s" % sorted(state["pending"]))
+        return
+
+    batch_id = time.strftime("%Y%m%d%H%M%S")
+    joins = [each_ip for _, action, each_ip in batch if action == "join"]
+    if joins:
+        inventory_path = "%s/asg_join_%s_inventory.ini" % (output_dir, batch_id)
+        write_to_file(inventory_path,
+                      "[scale_nodes]\n" +
+                      "".join(["%s\n" % get_host_format(each_ip, "root",
+                                                        arguments.instance_private_key)
+                               for each_ip in joins]))
+        print("Incremental inventory written to: %s" % inventory_path)
+    actions_path = "%s/asg_actions_%s.json" % (output_dir, batch_id)
+    write_json_file(prepare_join_actions(batch, "computenodegrp"), actions_path)
+    print("Membership actions (%s join, %s delete) written to: %s" %
+          (len(joins), len(batch) - len(joins), actions_path))
+
+    for each_id, action, each_ip in batch:
+        if action == "join":
+            state["members"][each_id] = each_ip
+        else:
+            state["members"].pop(each_id, None)
+
+
+if __name__ == "__main__":
+    PARSER = argparse.ArgumentParser(description='Reconcile autoscaling group membership '
+                                                 'with the Spectrum Scale compute cluster.')
+    PARSER.add_argument('--tf_inv_path', required=True,
+                        help='Terraform inventory file path')
+    PARSER.add_argument('--instance_private_key', required=True,
+                        help='Spectrum Scale instances SSH private key path')
+    PARSER.add_argument('--asg_names',
+                        help='Comma separated autoscaling group names to poll')
+    PARSER.add_argument('--event_queue_dir',
+                        help='Directory of queued autoscaling notifications (one json per file) '
+                             'consumed instead of polling')
+    PARSER.add_argument('--output_dir',
+                        help='Directory for incremental inventories and actions '
+                             '(default: terraform inventory directory)')
+    PARSER.add_argument('--debounce_seconds', type=int, default=30,
+                        help='Time a membership change must be stable before acting on it')
+    PARSER.add_argument('--max_batch_size', type=int, default=32,
+                        help='Max nodes joined or deleted per batch')
+    PARSER.add_argument('--interval', type=int, default=10,
+                        help='Seconds between reconcile passes')
+    PARSER.add_argument('--once', action='store_true',
+                        help='Run a single reconcile pass and exit')
+    PARSER.add_argument('--verbose', action='store_true',
+                        help='print log messages')
+    ARGUMENTS = PARSER.parse_args()
+
+    if not ARGUMENTS.asg_names and not ARGUMENTS.event_queue_dir:
+        print("Either --asg_names or --event_queue_dir is required.")
+        sys.exit(1)
+
+    # Step-1: Read the inventory file
+    TF = read_json_file(ARGUMENTS.tf_inv_path)
+    if TF['cloud_platform'].upper() != 'AWS':
+        print("Autoscaling group reconciliation is supported on AWS only.")
+        sys.exit(1)
+    OUTPUT_DIR = ARGUMENTS.output_dir or str(pathlib.PurePath(ARGUMENTS.tf_inv_path).parent)
+    pathlib.Path(OUTPUT_DIR).mkdir(parents=True, exist_ok=True)
+
+    # Step-2: Load membership state, seeded from the compute nodes terraform created
+    STATE_PATH = "%s/asg_membership_state.json" % OUTPUT_DIR
+    if os.path.exists(STATE_PATH):
+        STATE = read_json_file(STATE_PATH)
+    else:
+        STATE = {"members": dict(zip(TF.get('compute_cluster_instance_ids', []),
+                                     TF['compute_cluster_instance_private_ips'])),
+                 "managed": [], "desired": {}, "pending": {}}
+
+    # Step-3: Reconcile until stopped
+    while True:
+        if ARGUMENTS.event_queue_dir:
+            events, consumed = read_queued_events(ARGUMENTS.event_queue_dir)
+            for each_id, action in events:
+                if action == "join":
+                    STATE["desired"].setdefault(each_id, None)
+                else:
+                    STATE["desired"].pop(each_id, None)
+                if each_id not in STATE["managed"]:
+                    STATE["managed"].append(each_id)
+        else:
+            consumed = []
+            members = aws_get_asg_members(ARGUMENTS.asg_names.split(","), TF['vpc_region'])
+            if members is not None:
+                STATE["desired"] = dict([(each_id, STATE["desired"].get(each_id))
+                                         for each_id in members])
+                STATE["managed"].extend([each_id for each_id in members
+                                         if each_id not in STATE["managed"]])
+
+        # Joining nodes need a private IP before they can be added
+        unresolved = [each_id for each_id, each_ip in STATE["desired"].items() if not each_ip]
+        STATE["desired"].update(aws_get_private_ips(unresolved, TF['vpc_region']))
+
+        reconcile(STATE, STATE["desired"], OUTPUT_DIR, ARGUMENTS)
+        write_json_file(STATE, STATE_PATH)
+        for each_file in consumed:
+            os.remove(each_file)
+
+        if ARGUMENTS.once:
+            break
+        time.sleep(ARGUMENTS.interval)
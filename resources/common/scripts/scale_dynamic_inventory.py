@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Copyright IBM Corporation 2018
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Ansible dynamic inventory for Spectrum Scale clusters.
+
+The inventory is produced by prepare_scale_inv_ini.py from the terraform
+inventory and cached on disk keyed by a hash of its inputs, so repeated
+ansible runs answer from the cache until the terraform inventory changes.
+
+Environment:
+  SCALE_TF_INV_PATH           Terraform inventory file path (required)
+  SCALE_INVENTORY_ARGS        Additional prepare_scale_inv_ini.py arguments
+  SCALE_INVENTORY_CACHE_DIR   Cache directory (default: <tf inventory dir>/.scale_inventory_cache)
+
+Ex: SCALE_TF_INV_PATH=/tmp/inventory.json \\
+    SCALE_INVENTORY_ARGS="--instance_private_key /root/.ssh/id_rsa ..." \\
+    ansible-playbook -i scale_dynamic_inventory.py playbook.yaml
+"""
+
+import argparse
+import ast
+import configparser
+import hashlib
+import json
+import os
+import pathlib
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+import yaml
+
+GENERATOR_PATH = str(pathlib.Path(__file__).resolve().parent / "prepare_scale_inv_ini.py")
+
+
+def get_inventory_hash(tf_inv_path, generator_args):
+    """ Content hash of everything the generated inventory depends on.
+    :args: tf_inv_path (string), generator_args (string)
+    """
+    inventory_hash = hashlib.sha256()
+    for each_path in [tf_inv_path, GENERATOR_PATH]:
+        try:
+            with open(each_path, 'rb') as file_handler:
+                inventory_hash.update(file_handler.read())
+        except OSError:
+            print("Inventory input (%s) does not exist." % each_path, file=sys.stderr)
+            sys.exit(1)
+    inventory_hash.update(generator_args.encode())
+    return inventory_hash.hexdigest()
+
+
+def parse_host_entry(host_entry):
+    """ Host name and vars of an INI inventory host line.
+    Values are read as python literals the way ansible does (Ex: True).
+    """
+    fields = shlex.split(host_entry)
+    host_vars = {}
+    for each_field in fields[1:]:
+        key, _, value = each_field.partition("=")
+        try:
+            host_vars[key] = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            host_vars[key] = value
+    return fields[0], host_vars
+
+
+def generate_inventory(tf_inv_path, generator_args, staging_dir):
+    """ Run the INI generator and convert its output to dynamic inventory json.
+    :args: tf_inv_path (string), generator_args (string), staging_dir (string)
+    """
+    infra_dir = "%s/%s" % (staging_dir, "ibm-spectrum-scale-install-infra")
+    pathlib.Path(infra_dir).mkdir(parents=True, exist_ok=True)
+    command = [sys.executable, GENERATOR_PATH, "--tf_inv_path", tf_inv_path,
+               "--install_infra_path", staging_dir] + shlex.split(generator_args)
+    sub_command = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                 universal_newlines=True)
+    if sub_command.returncode:
+        print("Inventory generation failed:\n%s%s" % (sub_command.stdout, sub_command.stderr),
+              file=sys.stderr)
+        sys.exit(1)
+
+    inventory = {"_meta": {"hostvars": {}},
+                 "all": {"children": ["scale_nodes"]},
+                 "scale_nodes": {"hosts": [], "vars": {}}}
+    for each_inventory in sorted(pathlib.Path(infra_dir).glob("*_inventory.ini")):
+        # Host lines are not key=value pairs configparser can read
+        host_lines, var_lines, section = [], [], None
+        for each_line in each_inventory.read_text().splitlines():
+            if each_line.startswith("["):
+                section = each_line.strip("[]")
+                if section != "scale_nodes":
+                    var_lines.append(each_line)
+            elif section == "scale_nodes" and each_line.strip():
+                host_lines.append(each_line)
+            elif section:
+                var_lines.append(each_line)
+
+        for each_line in host_lines:
+            host, host_vars = parse_host_entry(each_line)
+            inventory["scale_nodes"]["hosts"].append(host)
+            inventory["_meta"]["hostvars"][host] = host_vars
+
+        config = configparser.ConfigParser()
+        config.read_string("\n".join(var_lines))
+        if config.has_section("all:vars"):
+            inventory["scale_nodes"]["vars"].update(dict(config.items("all:vars")))
+
+    for each_group_vars in sorted(pathlib.Path(infra_dir, "group_vars").glob("*.yaml")):
+        with open(each_group_vars) as yaml_handler:
+            for each_document in yaml.safe_load_all(yaml_handler):
+                inventory["scale_nodes"]["vars"].update(each_document or {})
+    return inventory
+
+
+def get_inventory(tf_inv_path, generator_args, cache_dir):
+    """ Cached inventory, generated and stored only when the inputs changed. """
+    cache_path = "%s/%s.json" % (cache_dir, get_inventory_hash(tf_inv_path, generator_args))
+    if os.path.exists(cache_path):
+        with open(cache_path) as json_handler:
+            return json.load(json_handler)
+
+    pathlib.Path(cache_dir).mkdir(parents=True, exist_ok=True)
+    staging_dir = tempfile.mkdtemp(dir=cache_dir)
+    try:
+        inventory = generate_inventory(tf_inv_path, generator_args, staging_dir)
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    # Write then rename, concurrent ansible runs never read a partial file
+    with tempfile.NamedTemporaryFile('w', dir=cache_dir, suffix=".tmp",
+                                     delete=False) as json_handler:
+        json.dump(inventory, json_handler)
+    os.replace(json_handler.name, cache_path)
+    return inventory
+
+
+if __name__ == "__main__":
+    PARSER = argparse.ArgumentParser(description='Spectrum Scale ansible dynamic inventory.')
+    PARSER.add_argument('--list', action='store_true',
+                        help='Print all groups and hosts')
+    PARSER.add_argument('--host',
+                        help='Print vars of the given host')
+    ARGUMENTS = PARSER.parse_args()
+
+    TF_INV_PATH = os.environ.get("SCALE_TF_INV_PATH")
+    if not TF_INV_PATH:
+        print("SCALE_TF_INV_PATH is not set.", file=sys.stderr)
+        sys.exit(1)
+    CACHE_DIR = os.environ.get("SCALE_INVENTORY_CACHE_DIR",
+                               "%s/.scale_inventory_cache" % pathlib.PurePath(TF_INV_PATH).parent)
+
+    INVENTORY = get_inventory(TF_INV_PATH, os.environ.get("SCALE_INVENTORY_ARGS", ""), CACHE_DIR)
+    if ARGUMENTS.host:
+        print(json.dumps(INVENTORY["_meta"]["hostvars"].get(ARGUMENTS.host, {})))
+    else:
+        print(json.dumps(INVENTORY))
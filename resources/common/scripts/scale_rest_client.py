@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Copyright IBM Corporation 2018
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+REST client for the Spectrum Scale GUI API (/scalemgmt/v2).
+
+Keeps a pool of keep-alive connections, bounds the number of concurrent
+requests to the pool size, retries transient failures with exponential
+backoff and polls asynchronous jobs to completion. Only idempotent methods
+are retried after connection errors and server errors, other methods only
+when the server rejected the request without processing it (429, 503).
+
+Ex: client = ScaleRestClient("https://10.0.1.10:443", "admin", "password")
+    client.run_job("POST", "/scalemgmt/v2/remotemount/remoteclusters", {...})
+    client.map_concurrent(lambda fs: client.get("/scalemgmt/v2/filesystems/" + fs),
+                          ["fs1", "fs2"])
+"""
+
+import argparse
+import base64
+import concurrent.futures
+import http.client
+import json
+import queue
+import ssl
+import sys
+import threading
+import time
+import urllib.parse
+
+RETRY_STATUS_CODES = [429, 500, 502, 503, 504]
+# A retried request may be applied twice, only these are retried by default
+IDEMPOTENT_METHODS = ["GET", "HEAD", "PUT", "DELETE"]
+# The server did not process the request, safe to retry whatever the method
+NOT_PROCESSED_STATUS_CODES = [429, 503]
+JOB_FINAL_STATES = ["COMPLETED", "FAILED", "CANCELLED"]
+
+
+class ScaleRestError(Exception):
+    """ Raised when a request or job fails after all retries. """
+
+    def __init__(self, message, status=None, response=None):
+        super().__init__(message)
+        self.status = status
+        self.response = response
+
+
+class ScaleRestClient:
+    """ Pooled, concurrent client for the Spectrum Scale GUI REST API.
+    :args: base_url (string) Ex: https://gui-host:443, username (string),
+           password (string), pool_size (int) max connections and concurrent
+           requests, retries (int), backoff (float) first retry delay in
+           seconds, timeout (int), verify (bool) check the server certificate
+    """
+
+    def __init__(self, base_url, username, password, pool_size=4, retries=5,
+                 backoff=1.0, timeout=60, verify=False):
+        url = urllib.parse.urlsplit(base_url)
+        self.scheme = url.scheme or "https"
+        self.host = url.hostname
+        self.port = url.port or (443 if self.scheme == "https" else 80)
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.headers = {
+            "Authorization": "Basic " + base64.b64encode(
+                ("%s:%s" % (username, password)).encode()).decode(),
+            "Accept": "application/json",
+            "Content-Type": "application/json",
+            "Connection": "keep-alive"}
+        # The GUI uses a self signed certificate unless one was installed
+        self.ssl_context = ssl.create_default_context()
+        if not verify:
+            self.ssl_context.check_hostname = False
+            self.ssl_context.verify_mode = ssl.CERT_NONE
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        self._slots = threading.BoundedSemaphore(pool_size)
+
+    def _new_connection(self):
+        """ Open a new connection to the GUI node. """
+        if self.scheme == "https":
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout,
+                                               context=self.ssl_context)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def _send(self, method, path, payload):
+        """ Send one request over a pooled connection.
+        :return: (status, headers, body)
+        """
+        try:
+            connection = self._pool.get_nowait()
+        except queue.Empty:
+            connection = self._new_connection()
+        try:
+            connection.request(method, path, body=payload, headers=self.headers)
+            response = connection.getresponse()
+            body = response.read()
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            raise
+        if response.will_close:
+            connection.close()
+        else:
+            try:
+                self._pool.put_nowait(connection)
+            except queue.Full:
+                connection.close()
+        return response.status, response.headers, body
+
+    def request(self, method, path, data=None, retry=None):
+        """ Send a request, retrying connection errors and transient statuses.
+        :args: method (string), path (string), data (dict), retry (bool) retry
+               like an idempotent method (default: by method)
+        :return: (status, parsed json response)
+        """
+        if retry is None:
+            retry = method.upper() in IDEMPOTENT_METHODS
+        retry_status_codes = RETRY_STATUS_CODES if retry else NOT_PROCESSED_STATUS_CODES
+        payload = json.dumps(data) if data is not None else None
+        for attempt in range(self.retries + 1):
+            delay = self.backoff * (2 ** attempt)
+            send_error = None
+            with self._slots:
+                try:
+                    status, headers, body = self._send(method, path, payload)
+                except (OSError, http.client.HTTPException) as error:
+                    send_error = error
+            # Back off outside the slot so other requests can proceed
+            if send_error is not None:
+                if attempt == self.retries or not retry:
+                    raise ScaleRestError("%s %s failed: %s" % (method, path, send_error))
+                time.sleep(delay)
+                continue
+            try:
+                response = json.loads(body) if body else {}
+            except ValueError:
+                response = {"message": body.decode(errors="replace")}
+            if status in retry_status_codes and attempt < self.retries:
+                retry_after = headers.get("Retry-After")
+                time.sleep(float(retry_after) if retry_after and retry_after.isdigit()
+                           else delay)
+                continue
+            if status >= 400:
+                raise ScaleRestError("%s %s returned %s: %s" % (method, path, status, response),
+                                     status, response)
+            return status, response
+        raise ScaleRestError("%s %s failed after %s retries" % (method, path, self.retries))
+
+    def get(self, path):
+        """ GET a resource and return the parsed response. """
+        return self.request("GET", path)[1]
+
+    def post(self, path, data=None, retry=False):
+        """ POST to a resource and return the parsed response. """
+        return self.request("POST", path, data, retry)[1]
+
+    def put(self, path, data=None):
+        """ PUT to a resource and return the parsed response. """
+        return self.request("PUT", path, data)[1]
+
+    def delete(self, path):
+        """ DELETE a resource and return the parsed response. """
+        return self.request("DELETE", path)[1]
+
+    def wait_for_job(self, job_id, poll_interval=2, timeout=1800):
+        """ Poll an asynchronous job until it reaches a final state.
+        :args: job_id (int), poll_interval (int), timeout (int) seconds
+        :return: job (dict) once COMPLETED
+        """
+        deadline = time.time() + timeout
+        while True:
+            jobs = self.get("/scalemgmt/v2/jobs/%s" % job_id).get("jobs", [])
+            job = jobs[0] if jobs else {}
+            if job.get("status") in JOB_FINAL_STATES:
+                if job["status"] != "COMPLETED":
+                    raise ScaleRestError("Job %s %s: %s" % (job_id, job["status"],
+                                                            job.get("result", {})),
+                                         response=job)
+                return job
+            if time.time() > deadline:
+                raise ScaleRestError("Job %s did not complete within %ss" % (job_id, timeout),
+                                     response=job)
+            time.sleep(poll_interval)
+
+    def run_job(self, method, path, data=None, poll_interval=2, timeout=1800, retry=None):
+        """ Submit a request and wait for the jobs it started, if any.
+        :return: list of completed jobs, or the response for synchronous calls
+        """
+        response = self.request(method, path, data, retry)[1]
+        jobs = response.get("jobs", [])
+        if not jobs:
+            return response
+        return [self.wait_for_job(each_job["jobId"], poll_interval, timeout)
+                for each_job in jobs]
+
+    def map_concurrent(self, func, items):
+        """ Apply func to items concurrently, bounded by the pool size.
+        :return: results in the order of items
+        """
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.pool_size) as executor:
+            return list(executor.map(func, items))
+
+    def close(self):
+        """ Close all pooled connections. """
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+if __name__ == "__main__":
+    PARSER = argparse.ArgumentParser(description='Call the Spectrum Scale GUI REST API.')
+    PARSER.add_argument('--gui_url', required=True,
+                        help='GUI base url (Ex: https://10.0.1.10:443)')
+    PARSER.add_argument('--gui_username', required=True,
+                        help='Spectrum Scale GUI username')
+    PARSER.add_argument('--gui_password', required=True,
+                        help='Spectrum Scale GUI password')
+    PARSER.add_argument('--method', default="GET",
+                        help='HTTP method')
+    PARSER.add_argument('--path', required=True, action='append',
+                        help='API path, repeat to issue requests concurrently '
+                             '(Ex: /scalemgmt/v2/filesystems)')
+    PARSER.add_argument('--data', type=json.loads,
+                        help='JSON request body')
+    PARSER.add_argument('--pool_size', type=int, default=4,
+                        help='Max pooled connections and concurrent requests')
+    PARSER.add_argument('--retries', type=int, default=5,
+                        help='Retries of failed requests')
+    PARSER.add_argument('--retry_all', action='store_true',
+                        help='Retry the request like an idempotent method, when it is '
+                             'safe to repeat (default: POST only retried on 429/503)')
+    PARSER.add_argument('--wait', action='store_true',
+                        help='Wait for the asynchronous jobs started by the request')
+    PARSER.add_argument('--verify', action='store_true',
+                        help='Verify the GUI server certificate')
+    ARGUMENTS = PARSER.parse_args()
+
+    CLIENT = ScaleRestClient(ARGUMENTS.gui_url, ARGUMENTS.gui_username,
+                             ARGUMENTS.gui_password, pool_size=ARGUMENTS.pool_size,
+                             retries=ARGUMENTS.retries, verify=ARGUMENTS.verify)
+    try:
+        if ARGUMENTS.wait:
+            RESULTS = CLIENT.map_concurrent(
+                lambda each_path: CLIENT.run_job(ARGUMENTS.method, each_path, ARGUMENTS.data,
+                                                 retry=ARGUMENTS.retry_all or None),
+                ARGUMENTS.path)
+        else:
+            RESULTS = CLIENT.map_concurrent(
+                lambda each_path: CLIENT.request(ARGUMENTS.method, each_path, ARGUMENTS.data,
+                                                 ARGUMENTS.retry_all or None)[1],
+                ARGUMENTS.path)
+    except ScaleRestError as error:
+        print(error)
+        sys.exit(1)
+    finally:
+        CLIENT.close()
+    print(json.dumps(RESULTS if len(RESULTS) > 1 else RESULTS[0], indent=4))
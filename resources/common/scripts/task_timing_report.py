@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Copyright IBM Corporation 2018
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Summarize the per task, per host timings recorded by the scale_task_timing
+callback plugin installed next to the generated playbooks.
+
+Ex: task_timing_report.py --log_path ibm-spectrum-scale-install-infra/scale_task_timing.jsonl
+"""
+
+import argparse
+import json
+import statistics
+import sys
+
+# Hosts finishing this much later than the median host of a task are stragglers
+STRAGGLER_MIN_SECONDS = 5.0
+
+
+def load_task_results(log_path, last_runs=None):
+    """ Task results grouped per run, oldest run first.
+    :args: log_path (string), last_runs (int) only keep the most recent runs
+    """
+    runs = {}
+    try:
+        with open(log_path) as log_handler:
+            for each_line in log_handler:
+                if each_line.strip():
+                    result = json.loads(each_line)
+                    runs.setdefault(result["run_id"], []).append(result)
+    except OSError:
+        print("Task timing log (%s) does not exist." % log_path)
+        sys.exit(1)
+    ordered = sorted(runs.values(), key=lambda each_run: min(
+        [each_result["start"] for each_result in each_run]))
+    return ordered[-last_runs:] if last_runs else ordered
+
+
+def get_task_instances(run_results):
+    """ Results of one run grouped per executed task, with the hosts of its play.
+    :return: list of dict (name, hosts, play_host_count, wall, results)
+    """
+    play_hosts = {}
+    tasks = {}
+    for each_result in run_results:
+        play_key = (each_result["playbook"], each_result["play"])
+        play_hosts.setdefault(play_key, set()).add(each_result["host"])
+        tasks.setdefault((play_key, each_result["task_id"]), []).append(each_result)
+
+    instances = []
+    for (play_key, _), each_results in tasks.items():
+        name = each_results[0]["task"]
+        if each_results[0]["role"]:
+            name = "%s : %s" % (each_results[0]["role"], name)
+        executed = [each_result for each_result in each_results
+                    if each_result["status"] != "skipped"]
+        instances.append({
+            "name": name,
+            "results": executed,
+            "hosts": set([each_result["host"] for each_result in executed]),
+            "play_host_count": len(play_hosts[play_key]),
+            "wall": (max([each_result["end"] for each_result in each_results]) -
+                     min([each_result["start"] for each_result in each_results]))})
+    return instances
+
+
+def get_hot_tasks(runs):
+    """ Tasks ordered by mean wall clock time per run. """
+    totals = {}
+    for each_run in runs:
+        for each_instance in get_task_instances(each_run):
+            totals[each_instance["name"]] = totals.get(each_instance["name"], 0.0) + \
+                each_instance["wall"]
+    return sorted([(each_name, each_total / len(runs)) for each_name, each_total in totals.items()],
+                  key=lambda each_item: -each_item[1])
+
+
+def get_straggler_hosts(runs):
+    """ Hosts that finished tasks well after the median host.
+    :return: list of (host, times slowest, seconds others waited)
+    """
+    stragglers = {}
+    for each_run in runs:
+        for each_instance in get_task_instances(each_run):
+            if len(each_instance["results"]) < 3:
+                continue
+            durations = [each_result["duration"] for each_result in each_instance["results"]]
+            median = statistics.median(durations)
+            slowest = max(each_instance["results"], key=lambda each_result: each_result["duration"])
+            if slowest["duration"] - median >= STRAGGLER_MIN_SECONDS:
+                straggler = stragglers.setdefault(slowest["host"], [0, 0.0])
+                straggler[0] += 1
+                straggler[1] += slowest["duration"] - median
+    return sorted([(each_host, each_count, each_wait / len(runs))
+                   for each_host, (each_count, each_wait) in stragglers.items()],
+                  key=lambda each_item: -each_item[2])
+
+
+def get_serial_sections(runs):
+    """ Tasks that ran on fewer hosts than their play, leaving the rest idle
+    (run_once, delegated or host limited tasks).
+    :return: list of (task, hosts, idle host seconds per run)
+    """
+    serial = {}
+    for each_run in runs:
+        for each_instance in get_task_instances(each_run):
+            idle_hosts = each_instance["play_host_count"] - len(each_instance["hosts"])
+            if each_instance["hosts"] and idle_hosts > 0:
+                section = serial.setdefault(each_instance["name"], [0, 0.0])
+                section[0] = max(section[0], len(each_instance["hosts"]))
+                section[1] += each_instance["wall"] * idle_hosts
+    return sorted([(each_name, each_hosts, each_idle / len(runs))
+                   for each_name, (each_hosts, each_idle) in serial.items()],
+                  key=lambda each_item: -each_item[2])
+
+
+def print_report(runs, top):
+    """ Print hot tasks, straggler hosts and serial sections. """
+    if not runs:
+        print("No task results recorded.")
+        return
+    print("Runs: %s, task results: %s" % (len(runs), sum([len(each_run) for each_run in runs])))
+
+    print("\nHot tasks (mean seconds per run):")
+    for each_name, each_seconds in get_hot_tasks(runs)[:top]:
+        print("  %10.1f  %s" % (each_seconds, each_name))
+
+    print("\nStraggler hosts (times slowest, mean seconds waited per run):")
+    for each_host, each_count, each_seconds in get_straggler_hosts(runs)[:top]:
+        print("  %10.1f  %-40s %s" % (each_seconds, each_host, each_count))
+
+    print("\nSerial sections (mean idle host seconds per run):")
+    for each_name, each_hosts, each_seconds in get_serial_sections(runs)[:top]:
+        print("  %10.1f  %s (%s host)" % (each_seconds, each_name, each_hosts))
+
+
+if __name__ == "__main__":
+    PARSER = argparse.ArgumentParser(description='Summarize ansible task timings.')
+    PARSER.add_argument('--log_path', required=True,
+                        help='Task timing log written by the scale_task_timing callback')
+    PARSER.add_argument('--last_runs', type=int,
+                        help='Only report the most recent runs')
+    PARSER.add_argument('--top', type=int, default=15,
+                        help='Entries per section')
+    ARGUMENTS = PARSER.parse_args()
+
+    print_report(load_task_results(ARGUMENTS.log_path, ARGUMENTS.last_runs), ARGUMENTS.top)
@@ -17,7 +17,9 @@ limitations under the License.
 """
 
 import argparse
+import deployment_trace
 import json
+import os
 import subprocess
 import sys
 
@@ -76,16 +78,23 @@ if __name__ == "__main__":
                         help='Terraform inventory file path')
     PARSER.add_argument('--cluster_type', required=True,
                         help='Cluster type (Ex: compute, storage, combined')
+    PARSER.add_argument('--profile', action='store_true',
+                        help='Write cProfile, tracemalloc and per phase timings '
+                             'next to the terraform inventory')
     PARSER.add_argument('--verbose', action='store_true',
                         help='print log messages')
     ARGUMENTS = PARSER.parse_args()
+    TRACE_SPAN = deployment_trace.start_span("wait_for_ssh_%s" % ARGUMENTS.cluster_type)
+    PROFILE = deployment_trace.start_profile(ARGUMENTS.profile)
 
     # Step-1: Read the inventory file
+    deployment_trace.mark_phase(PROFILE, "parse")
     TF = read_json_file(ARGUMENTS.tf_inv_path)
     if ARGUMENTS.verbose:
         print("Parsed terraform output: %s" % json.dumps(TF, indent=4))
 
     # Step-2: Identify instance id's based cluster_type
+    deployment_trace.mark_phase(PROFILE, "wait")
     target_instance_ids = []
     if TF['cloud_platform'].upper() == 'AWS':
         if ARGUMENTS.cluster_type == 'compute':
@@ -104,3 +113,7 @@ if __name__ == "__main__":
             if TF['bastion_instance_id'] != 'None':
                 target_instance_ids.append(TF['bastion_instance_id'])
         aws_ec2_wait_running(target_instance_ids, TF['vpc_region'])
+
+    deployment_trace.write_profile(PROFILE, "%s/wait_for_ssh_%s_profile" % (
+        os.path.dirname(os.path.abspath(ARGUMENTS.tf_inv_path)), ARGUMENTS.cluster_type))
+    deployment_trace.end_span(TRACE_SPAN, len(target_instance_ids))
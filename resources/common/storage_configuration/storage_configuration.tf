@@ -23,10 +23,12 @@ variable "bastion_ssh_private_key" {}
 variable "meta_private_key" {}
 variable "scale_version" {}
 variable "spectrumscale_rpms_path" {}
+variable "node_count" {}
 
 locals {
   scripts_path             = replace(path.module, "storage_configuration", "scripts")
   ansible_inv_script_path  = var.inventory_format == "ini" ? format("%s/prepare_scale_inv_ini.py", local.scripts_path) : format("%s/prepare_scale_inv_json.py", local.scripts_path)
+  trace_script_path        = format("%s/deployment_trace.py", local.scripts_path)
   wait_for_ssh_script_path = format("%s/wait_for_ssh_availability.py", local.scripts_path)
   scale_tuning_config_path = format("%s/%s", var.clone_path, "storagesncparams.profile")
   storage_private_key      = format("%s/storage_key/id_rsa", var.clone_path) #tfsec:ignore:GEN002
@@ -104,19 +106,22 @@ resource "null_resource" "wait_for_ssh_availability" {
   }
 }
 
-resource "time_sleep" "wait_60_seconds" {
-  count           = (tobool(var.turn_on) == true && tobool(var.clone_complete) == true && tobool(var.write_inventory_complete) == true) ? 1 : 0
-  create_duration = "60s"
-  depends_on      = [null_resource.wait_for_ssh_availability]
+resource "null_resource" "wait_60_seconds" {
+  count = (tobool(var.turn_on) == true && tobool(var.clone_complete) == true && tobool(var.write_inventory_complete) == true) ? 1 : 0
+  provisioner "local-exec" {
+    interpreter = ["/bin/bash", "-c"]
+    command     = "python3 ${local.trace_script_path} run --phase wait_60s -- sleep 60"
+  }
+  depends_on = [null_resource.wait_for_ssh_availability]
 }
 
 resource "null_resource" "perform_scale_deployment" {
   count = (tobool(var.turn_on) == true && tobool(var.clone_complete) == true && tobool(var.write_inventory_complete) == true && tobool(var.create_scale_cluster) == true) ? 1 : 0
   provisioner "local-exec" {
     interpreter = ["/bin/bash", "-c"]
-    command     = "ansible-playbook -f 32 -i ${local.storage_inventory_path} ${local.storage_playbook_path} --extra-vars \"scale_version=${var.scale_version}\" --extra-vars \"scale_install_directory_pkg_path=${var.spectrumscale_rpms_path}\""
+    command     = "python3 ${local.trace_script_path} run --phase ansible_storage --node_count ${var.node_count} -- ansible-playbook -f 32 -i ${local.storage_inventory_path} ${local.storage_playbook_path} --extra-vars \"scale_version=${var.scale_version}\" --extra-vars \"scale_install_directory_pkg_path=${var.spectrumscale_rpms_path}\""
   }
-  depends_on = [time_sleep.wait_60_seconds, null_resource.wait_for_ssh_availability, null_resource.prepare_ansible_inventory, null_resource.prepare_ansible_inventory_using_jumphost_connection]
+  depends_on = [null_resource.wait_60_seconds, null_resource.wait_for_ssh_availability, null_resource.prepare_ansible_inventory, null_resource.prepare_ansible_inventory_using_jumphost_connection]
   triggers = {
     build = timestamp()
   }
@@ -124,5 +129,5 @@ resource "null_resource" "perform_scale_deployment" {
 
 output "storage_cluster_create_complete" {
   value      = true
-  depends_on = [time_sleep.wait_60_seconds, null_resource.wait_for_ssh_availability, null_resource.prepare_ansible_inventory, null_resource.prepare_ansible_inventory_using_jumphost_connection, null_resource.perform_scale_deployment]
+  depends_on = [null_resource.wait_60_seconds, null_resource.wait_for_ssh_availability, null_resource.prepare_ansible_inventory, null_resource.prepare_ansible_inventory_using_jumphost_connection, null_resource.perform_scale_deployment]
 }
@@ -27,6 +27,36 @@ variable "storage_cluster_desc_instance_ids" {}
 variable "storage_cluster_desc_instance_private_ips" {}
 variable "storage_cluster_desc_data_volume_mapping" {}
 variable "storage_cluster_desc_instance_private_dns_ip_map" {}
+variable "compute_cluster_instance_az_map" {
+  default = "{}"
+}
+variable "storage_cluster_instance_az_map" {
+  default = "{}"
+}
+variable "compute_cluster_image_manifest_map" {
+  default = "{}"
+}
+variable "storage_cluster_image_manifest_map" {
+  default = "{}"
+}
+variable "compute_cluster_instance_type_map" {
+  default = "{}"
+}
+variable "storage_cluster_instance_type_map" {
+  default = "{}"
+}
+variable "storage_cluster_filesystems" {
+  default = "[]"
+}
+variable "storage_cluster_shared_data_volume_mapping" {
+  default = "{}"
+}
+variable "compute_cluster_secondary_interface_map" {
+  default = "{}"
+}
+variable "storage_cluster_secondary_interface_map" {
+  default = "{}"
+}
 
 resource "local_sensitive_file" "itself" {
   count    = (tobool(var.clone_complete) == true && var.write_inventory == 1) ? 1 : 0
@@ -53,7 +83,17 @@ resource "local_sensitive_file" "itself" {
     "storage_cluster_desc_instance_ids": ${var.storage_cluster_desc_instance_ids},
     "storage_cluster_desc_instance_private_ips": ${var.storage_cluster_desc_instance_private_ips},
     "storage_cluster_desc_data_volume_mapping": ${var.storage_cluster_desc_data_volume_mapping},
-    "storage_cluster_desc_instance_private_dns_ip_map": ${var.storage_cluster_desc_instance_private_dns_ip_map}
+    "storage_cluster_desc_instance_private_dns_ip_map": ${var.storage_cluster_desc_instance_private_dns_ip_map},
+    "compute_cluster_instance_az_map": ${var.compute_cluster_instance_az_map},
+    "storage_cluster_instance_az_map": ${var.storage_cluster_instance_az_map},
+    "compute_cluster_image_manifest_map": ${var.compute_cluster_image_manifest_map},
+    "storage_cluster_image_manifest_map": ${var.storage_cluster_image_manifest_map},
+    "compute_cluster_instance_type_map": ${var.compute_cluster_instance_type_map},
+    "storage_cluster_instance_type_map": ${var.storage_cluster_instance_type_map},
+    "storage_cluster_filesystems": ${var.storage_cluster_filesystems},
+    "storage_cluster_shared_data_volume_mapping": ${var.storage_cluster_shared_data_volume_mapping},
+    "compute_cluster_secondary_interface_map": ${var.compute_cluster_secondary_interface_map},
+    "storage_cluster_secondary_interface_map": ${var.storage_cluster_secondary_interface_map}
 }
 EOT
   filename = var.inventory_path
@@ -38,6 +38,9 @@ locals {
   disk_configuration = flatten(toset([for disk_no in range(local.total_persistent_disks) : flatten([for vm_meta in local.vm_configuration : { vm_name = vm_meta.vm_name, vm_name_suffix = disk_no, vm_zone = vm_meta.zone }])]))
 
   local_ssd_names = [for i in range(var.total_local_ssd_disks) : "/dev/nvme0n${i + 1}"]
+
+  # Local SSDs have a fixed size of 375 GiB
+  local_ssd_size = 375 * 1073741824
 }
 
 data "google_kms_key_ring" "itself" {
@@ -166,7 +169,7 @@ output "data_disk_zone" {
 }
 
 output "disk_device_mapping" {
-  value = (var.total_persistent_disks > 0) && (length(var.block_device_names) >= var.total_persistent_disks) ? { for instances in(google_compute_instance.itself) : (instances.network_interface[0].network_ip) => slice(var.block_device_names, 0, var.total_persistent_disks) } : var.total_local_ssd_disks > 0 ? { for instances in(google_compute_instance.itself) : (instances.network_interface[0].network_ip) => local.local_ssd_names } : {}
+  value = (var.total_persistent_disks > 0) && (length(var.block_device_names) >= var.total_persistent_disks) ? { for instances in(google_compute_instance.itself) : (instances.network_interface[0].network_ip) => [for each_device in slice(var.block_device_names, 0, var.total_persistent_disks) : { device = each_device, size = var.data_disk_size * 1073741824 }] } : var.total_local_ssd_disks > 0 ? { for instances in(google_compute_instance.itself) : (instances.network_interface[0].network_ip) => [for each_device in local.local_ssd_names : { device = each_device, size = local.local_ssd_size }] } : {}
 }
 
 output "dns_hostname" {
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Copyright IBM Corporation 2018
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Offline tests of the RDMA/verbs node class params: run the INI and JSON
+inventory generators on a fixture terraform inventory (two EFA capable
+hpc6a nodes, two TCP only c6i nodes) and check the generated scale_config.
+
+Ex: python3 -m unittest discover -s unittests/scripts
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import yaml
+
+SCRIPTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            "..", "..", "resources", "common", "scripts")
+FIXTURE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            "fixtures", "compute_fabric_inventory.json")
+EFA_SHARD = "computenodegrp_az1_hpc6a48xlarge"
+TCP_SHARD = "computenodegrp_az1_c6i4xlarge"
+
+
+def generate_scale_config(inventory_format, extra_args, inventory_update=None):
+    """ Run a generator on the fixture inventory.
+    :return: scale_config params per node class (dict of class to merged params)
+    """
+    work_dir = tempfile.mkdtemp()
+    try:
+        with open(FIXTURE_PATH) as fixture:
+            tf_inv = json.load(fixture)
+        tf_inv.update(inventory_update or {})
+        tf_inv_path = os.path.join(work_dir, "inventory.json")
+        with open(tf_inv_path, "w") as tf_inv_file:
+            json.dump(tf_inv, tf_inv_file)
+        os.makedirs(os.path.join(work_dir, "ibm-spectrum-scale-install-infra"))
+        subprocess.run([sys.executable,
+                        os.path.join(SCRIPTS_PATH, "prepare_scale_inv_%s.py" % inventory_format),
+                        "--tf_inv_path", tf_inv_path, "--install_infra_path", work_dir,
+                        "--instance_private_key", "/dev/null", "--memory_size", "32768",
+                        "--max_pagepool_gb", "16", "--using_packer_image", "false",
+                        "--using_rest_initialization", "true",
+                        "--gui_username", "admin", "--gui_password", "password"] + extra_args,
+                       check=True, stdout=subprocess.PIPE, cwd=SCRIPTS_PATH)
+        if inventory_format == "ini":
+            with open(os.path.join(work_dir, "ibm-spectrum-scale-install-infra", "group_vars",
+                                   "compute_cluster_config.yaml")) as config_file:
+                scale_config = yaml.safe_load(config_file)["scale_config"]
+        else:
+            with open(os.path.join(work_dir, "ibm-spectrum-scale-install-infra", "vars",
+                                   "scale_clusterdefinition.json")) as config_file:
+                scale_config = json.load(config_file)["scale_config"]
+    finally:
+        shutil.rmtree(work_dir)
+
+    nodeclass_params = {}
+    for each_config in scale_config:
+        params = nodeclass_params.setdefault(each_config["nodeclass"], {})
+        for each_param in each_config["params"]:
+            params.update(each_param)
+    return nodeclass_params
+
+
+class TestFabricConfig(unittest.TestCase):
+
+    def test_verbs_on_fabric_shard_only(self):
+        for each_format in ["ini", "json"]:
+            params = generate_scale_config(each_format, ["--nodeclass_sharding"])
+            self.assertEqual(params[EFA_SHARD]["verbsRdma"], "enable", each_format)
+            self.assertEqual(params[EFA_SHARD]["verbsPorts"], "efa_0/1", each_format)
+            self.assertNotIn("verbsRdma", params[TCP_SHARD], each_format)
+            self.assertNotIn("verbsPorts", params[TCP_SHARD], each_format)
+
+    def test_mixed_node_class_stays_tcp(self):
+        for each_format in ["ini", "json"]:
+            params = generate_scale_config(each_format, [])
+            self.assertNotIn("verbsRdma", params["computenodegrp"], each_format)
+            self.assertNotIn("verbsPorts", params["computenodegrp"], each_format)
+
+    def test_fabric_map_overrides_ports(self):
+        fabric_map = {"instance_type_fabric_map": {
+            "c6i.4xlarge": {"fabric": "infiniband", "verbs_ports": "mlx5_1/1"}}}
+        for each_format in ["ini", "json"]:
+            params = generate_scale_config(each_format, ["--nodeclass_sharding"], fabric_map)
+            self.assertEqual(params[TCP_SHARD]["verbsRdma"], "enable", each_format)
+            self.assertEqual(params[TCP_SHARD]["verbsPorts"], "mlx5_1/1", each_format)
+            self.assertEqual(params[EFA_SHARD]["verbsPorts"], "efa_0/1", each_format)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Copyright IBM Corporation 2018
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Offline tests of scale_rest_client.py: connection pooling, retry/backoff
+and job polling against stub connections.
+
+Ex: python3 -m unittest discover -s unittests/scripts
+"""
+
+import json
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "..", "resources", "common", "scripts"))
+
+import scale_rest_client  # noqa: E402
+
+
+class StubResponse:
+    """ http.client.HTTPResponse stand-in. """
+
+    def __init__(self, status, body=None, headers=None, will_close=False):
+        self.status = status
+        self.headers = headers or {}
+        self.will_close = will_close
+        self._body = json.dumps(body).encode() if body is not None else b""
+
+    def read(self):
+        return self._body
+
+
+class StubConnection:
+    """ http.client.HTTPConnection stand-in replaying scripted responses.
+    A scripted exception is raised by request() instead of answering.
+    """
+
+    def __init__(self, script, requests):
+        self._script = script
+        self._requests = requests
+        self.closed = False
+
+    def request(self, method, path, body=None, headers=None):
+        self._requests.append((self, method, path))
+        answer = self._script.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        self._answer = answer
+
+    def getresponse(self):
+        return self._answer
+
+    def close(self):
+        self.closed = True
+
+
+class StubClient(scale_rest_client.ScaleRestClient):
+    """ Client whose connections replay the given script. """
+
+    def __init__(self, script, **kwargs):
+        kwargs.setdefault("backoff", 1.0)
+        super().__init__("https://gui:443", "admin", "password", **kwargs)
+        self.script = script
+        self.requests = []
+        self.connections = []
+
+    def _new_connection(self):
+        connection = StubConnection(self.script, self.requests)
+        self.connections.append(connection)
+        return connection
+
+
+@mock.patch("scale_rest_client.time.sleep")
+class TestPooling(unittest.TestCase):
+
+    def test_keep_alive_connection_reused(self, sleep):
+        client = StubClient([StubResponse(200, {}), StubResponse(200, {})])
+        client.get("/scalemgmt/v2/filesystems")
+        client.get("/scalemgmt/v2/nodes")
+        self.assertEqual(len(client.connections), 1)
+
+    def test_closing_connection_not_pooled(self, sleep):
+        client = StubClient([StubResponse(200, {}, will_close=True), StubResponse(200, {})])
+        client.get("/scalemgmt/v2/filesystems")
+        client.get("/scalemgmt/v2/nodes")
+        self.assertEqual(len(client.connections), 2)
+        self.assertTrue(client.connections[0].closed)
+
+    def test_map_concurrent_keeps_order(self, sleep):
+        client = StubClient([StubResponse(200, {"n": each}) for each in range(3)],
+                            pool_size=1)
+        self.assertEqual(client.map_concurrent(
+            lambda each_path: client.get(each_path)["n"], ["/a", "/b", "/c"]), [0, 1, 2])
+
+
+@mock.patch("scale_rest_client.time.sleep")
+class TestRetry(unittest.TestCase):
+
+    def test_get_retried_with_exponential_backoff(self, sleep):
+        client = StubClient([StubResponse(500), StubResponse(502), StubResponse(200, {"ok": 1})])
+        self.assertEqual(client.get("/scalemgmt/v2/filesystems"), {"ok": 1})
+        self.assertEqual([each_call.args[0] for each_call in sleep.call_args_list], [1.0, 2.0])
+
+    def test_get_retried_after_connection_error(self, sleep):
+        client = StubClient([ConnectionResetError(), StubResponse(200, {"ok": 1})])
+        self.assertEqual(client.get("/scalemgmt/v2/filesystems"), {"ok": 1})
+        self.assertEqual(len(client.requests), 2)
+
+    def test_retry_after_header_honored(self, sleep):
+        client = StubClient([StubResponse(429, headers={"Retry-After": "7"}),
+                             StubResponse(200, {})])
+        client.get("/scalemgmt/v2/filesystems")
+        sleep.assert_called_once_with(7.0)
+
+    def test_retries_exhausted(self, sleep):
+        client = StubClient([StubResponse(503) for _ in range(3)], retries=2)
+        with self.assertRaises(scale_rest_client.ScaleRestError) as context:
+            client.get("/scalemgmt/v2/filesystems")
+        self.assertEqual(context.exception.status, 503)
+        self.assertEqual(len(client.requests), 3)
+
+    def test_post_not_retried_on_server_error(self, sleep):
+        client = StubClient([StubResponse(500), StubResponse(200, {})])
+        with self.assertRaises(scale_rest_client.ScaleRestError):
+            client.post("/scalemgmt/v2/remotemount/remoteclusters", {})
+        self.assertEqual(len(client.requests), 1)
+
+    def test_post_not_retried_on_connection_error(self, sleep):
+        client = StubClient([ConnectionResetError(), StubResponse(200, {})])
+        with self.assertRaises(scale_rest_client.ScaleRestError):
+            client.post("/scalemgmt/v2/remotemount/remoteclusters", {})
+        self.assertEqual(len(client.requests), 1)
+
+    def test_post_retried_when_not_processed(self, sleep):
+        client = StubClient([StubResponse(429), StubResponse(503), StubResponse(200, {"ok": 1})])
+        self.assertEqual(client.post("/scalemgmt/v2/remotemount/remoteclusters", {}),
+                         {"ok": 1})
+
+    def test_post_retry_opt_in(self, sleep):
+        client = StubClient([StubResponse(500), StubResponse(200, {"ok": 1})])
+        self.assertEqual(client.post("/scalemgmt/v2/remotemount/remoteclusters", {},
+                                     retry=True), {"ok": 1})
+
+    def test_client_error_not_retried(self, sleep):
+        client = StubClient([StubResponse(404, {"message": "not found"})])
+        with self.assertRaises(scale_rest_client.ScaleRestError) as context:
+            client.get("/scalemgmt/v2/filesystems/fs9")
+        self.assertEqual(context.exception.response, {"message": "not found"})
+
+
+@mock.patch("scale_rest_client.time.sleep")
+class TestJobPolling(unittest.TestCase):
+
+    def test_job_polled_until_completed(self, sleep):
+        client = StubClient([StubResponse(202, {"jobs": [{"jobId": 7}]}),
+                             StubResponse(200, {"jobs": [{"jobId": 7, "status": "RUNNING"}]}),
+                             StubResponse(200, {"jobs": [{"jobId": 7, "status": "COMPLETED"}]})])
+        jobs = client.run_job("POST", "/scalemgmt/v2/remotemount/remoteclusters", {},
+                              poll_interval=3)
+        self.assertEqual(jobs, [{"jobId": 7, "status": "COMPLETED"}])
+        self.assertEqual(client.requests[1][2], "/scalemgmt/v2/jobs/7")
+        sleep.assert_called_once_with(3)
+
+    def test_failed_job_raises(self, sleep):
+        client = StubClient([StubResponse(202, {"jobs": [{"jobId": 8}]}),
+                             StubResponse(200, {"jobs": [{"jobId": 8, "status": "FAILED",
+                                                          "result": {"stderr": "x"}}]})])
+        with self.assertRaises(scale_rest_client.ScaleRestError) as context:
+            client.run_job("POST", "/scalemgmt/v2/remotemount/remoteclusters", {})
+        self.assertEqual(context.exception.response["status"], "FAILED")
+
+    def test_synchronous_response_returned(self, sleep):
+        client = StubClient([StubResponse(200, {"filesystems": []})])
+        self.assertEqual(client.run_job("GET", "/scalemgmt/v2/filesystems"),
+                         {"filesystems": []})
+
+
+if __name__ == "__main__":
+    unittest.main()